@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import math
+import os
+import time
+from collections import Counter as Tally
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, Tuple
+
+from app.metrics import metrics
+from app.ratelimit import TokenBucket
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "100000"))
+ADMISSION_DB_QUEUE_LIMIT = int(os.getenv("ADMISSION_DB_QUEUE_LIMIT", "64"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "1"))
+
+DECISIONS = metrics.counter("admission_decisions_total", "Admission decisions by route group and outcome.", ("group", "outcome"))
+
+
+@dataclass(frozen=True)
+class RouteGroup:
+  name: str
+  # Per-client token bucket.
+  rate: float
+  burst: float
+  # Requests of this group in flight on this worker, across all clients.
+  max_concurrency: int
+
+
+def route_group(name: str, rate: float, burst: float, max_concurrency: int) -> RouteGroup:
+  """A group whose limits can be overridden with `ADMISSION_<NAME>_RATE`, `_BURST` and `_CONCURRENCY`."""
+  prefix = f"ADMISSION_{name.upper()}_"
+  return RouteGroup(
+    name=name,
+    rate=float(os.getenv(prefix + "RATE", str(rate))),
+    burst=float(os.getenv(prefix + "BURST", str(burst))),
+    max_concurrency=int(os.getenv(prefix + "CONCURRENCY", str(max_concurrency))),
+  )
+
+
+class AdmissionRejected(RuntimeError):
+  """Raised by `Admission.acquire`; `status_code` is 429 for the client's own rate, 503 for overload."""
+
+  def __init__(self, status_code: int, message: str, retry_after: int) -> None:
+    super().__init__(message)
+    self.status_code = status_code
+    self.retry_after = retry_after
+
+
+class Admission:
+  """
+  Decides whether a write request may proceed before it touches the database.
+
+  Checks run cheapest first: the client's token bucket for the route group (429), the
+  group's in-flight limit (503), then the DB executor's queue (503). Buckets live in an LRU
+  of `max_clients` entries, so a flood of new addresses cannot grow memory without bound; an
+  evicted client simply starts again with a full bucket.
+  """
+
+  def __init__(
+    self,
+    groups: Iterable[RouteGroup],
+    queue_depth: Callable[[], int],
+    db_queue_limit: int = ADMISSION_DB_QUEUE_LIMIT,
+    max_clients: int = ADMISSION_MAX_CLIENTS,
+    enabled: bool = ADMISSION_ENABLED,
+  ) -> None:
+    self.groups = {group.name: group for group in groups}
+    self.queue_depth = queue_depth
+    self.db_queue_limit = db_queue_limit
+    self.max_clients = max_clients
+    self.enabled = enabled
+    self._buckets: OrderedDict[Tuple[str, str], TokenBucket] = OrderedDict()
+    self.in_flight: Dict[str, int] = {name: 0 for name in self.groups}
+    self.decisions: Tally[Tuple[str, str]] = Tally()
+
+  def reset(self) -> None:
+    self._buckets.clear()
+    self.decisions.clear()
+
+  def acquire(self, group_name: str, client: str, now: float | None = None) -> None:
+    """Admit one request or raise `AdmissionRejected`; admitted requests must call `release`."""
+    if not self.enabled:
+      return
+    group = self.groups[group_name]
+    now = time.monotonic() if now is None else now
+    bucket = self._bucket(group, client, now)
+    if not bucket.take(now):
+      self._decide(group_name, "rate_limited")
+      raise AdmissionRejected(429, "Too many requests, slow down", max(1, math.ceil(bucket.retry_after())))
+    if self.in_flight[group_name] >= group.max_concurrency:
+      self._decide(group_name, "concurrency")
+      raise AdmissionRejected(503, "Server busy, retry shortly", ADMISSION_RETRY_AFTER)
+    if self.queue_depth() >= self.db_queue_limit:
+      self._decide(group_name, "db_saturated")
+      raise AdmissionRejected(503, "Server busy, retry shortly", ADMISSION_RETRY_AFTER)
+    self.in_flight[group_name] += 1
+    self._decide(group_name, "admitted")
+
+  def release(self, group_name: str) -> None:
+    if self.enabled:
+      self.in_flight[group_name] -= 1
+
+  def _bucket(self, group: RouteGroup, client: str, now: float) -> TokenBucket:
+    key = (group.name, client)
+    bucket = self._buckets.get(key)
+    if bucket is None:
+      bucket = self._buckets[key] = TokenBucket(group.rate, group.burst, now)
+      if len(self._buckets) > self.max_clients:
+        self._buckets.popitem(last=False)
+    else:
+      self._buckets.move_to_end(key)
+    return bucket
+
+  def _decide(self, group_name: str, outcome: str) -> None:
+    self.decisions[(group_name, outcome)] += 1
+    DECISIONS.inc(group_name, outcome)
+
+  def stats(self) -> Dict[str, object]:
+    decisions: Dict[str, Dict[str, int]] = {name: {} for name in self.groups}
+    for (group_name, outcome), count in self.decisions.items():
+      decisions[group_name][outcome] = count
+    return {
+      "enabled": self.enabled,
+      "clients": len(self._buckets),
+      "inFlight": dict(self.in_flight),
+      "decisions": decisions,
+    }
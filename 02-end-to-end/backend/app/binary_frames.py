@@ -0,0 +1,268 @@
+"""
+Compact binary form of spectator frames for `/spectator/ws`.
+
+A message is a header followed by one record per game:
+
+  header   version u8 | kind u8 (0 keyframe, 1 delta) | seq u64 | records u16
+  full     0 | id | player | mode u8 (0 pass-through, 1 walls) | grid u8 | score u32
+           | food cell | snake length u16 | snake cells, head first
+  move     1 | id | flags u8 | [head cell, drop u16 if flags & 1] | [food cell if flags & 2]
+           | [score u32 if flags & 4]
+  removed  2 | id
+
+Strings are a u8 byte length then UTF-8. A cell is `y * grid + x` in one byte when the grid
+has at most 256 cells and two otherwise; `move` records use the grid of the game's last
+`full` record. All integers are big-endian. A keyframe replaces the viewer's whole state; a
+delta applies to the state left by the previous sequence number.
+"""
+
+from __future__ import annotations
+
+import struct
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, List, Tuple
+
+from app.broadcast import Frame, SpectatorBroadcaster
+from app.encoding import adapter
+from app.frames import DeltaEncoder
+from app.schemas import SpectatorSnapshot
+
+VERSION = 1
+KEYFRAME = 0
+DELTA = 1
+FULL_RECORD = 0
+MOVE_RECORD = 1
+REMOVED_RECORD = 2
+HAS_HEAD = 1
+HAS_FOOD = 2
+HAS_SCORE = 4
+MODES = ("pass-through", "walls")
+
+_HEADER = struct.Struct(">BBQH")
+_GAME = struct.Struct(">BBI")
+_U16 = struct.Struct(">H")
+_U32 = struct.Struct(">I")
+_HISTORY = 16
+
+
+def _text(value: str) -> bytes:
+  # Cut on a character boundary so long names still decode.
+  raw = value.encode()[:255].decode(errors="ignore").encode()
+  return bytes((len(raw),)) + raw
+
+
+def _cell_width(grid: int) -> int:
+  return 1 if grid * grid <= 256 else 2
+
+
+def _cells(points: List[Tuple[int, int]], grid: int) -> bytes:
+  values = [y * grid + x for x, y in points]
+  return bytes(values) if _cell_width(grid) == 1 else struct.pack(f">{len(values)}H", *values)
+
+
+def full_record(game: Dict[str, Any]) -> bytes:
+  grid = game["gridSize"]
+  snake = [(point["x"], point["y"]) for point in game["snake"]]
+  food = game["food"]
+  return b"".join(
+    (
+      bytes((FULL_RECORD,)),
+      _text(game["id"]),
+      _text(game["player"]),
+      _GAME.pack(MODES.index(game["mode"]), grid, game["score"]),
+      _cells([(food["x"], food["y"])], grid),
+      _U16.pack(len(snake)),
+      _cells(snake, grid),
+    )
+  )
+
+
+def move_record(game_id: str, change: Dict[str, Any], grid: int) -> bytes:
+  flags = (HAS_HEAD if "head" in change else 0) | (HAS_FOOD if "food" in change else 0) | (HAS_SCORE if "score" in change else 0)
+  parts = [bytes((MOVE_RECORD,)), _text(game_id), bytes((flags,))]
+  if "head" in change:
+    parts += [_cells([tuple(cell) for cell in change["head"]], grid), _U16.pack(change["drop"])]
+  if "food" in change:
+    parts.append(_cells([tuple(change["food"])], grid))
+  if "score" in change:
+    parts.append(_U32.pack(change["score"]))
+  return b"".join(parts)
+
+
+def removed_record(game_id: str) -> bytes:
+  return bytes((REMOVED_RECORD,)) + _text(game_id)
+
+
+def message(kind: int, seq: int, records: Collection[bytes]) -> bytes:
+  return _HEADER.pack(VERSION, kind, seq, len(records)) + b"".join(records)
+
+
+@dataclass(frozen=True)
+class EncodedFrame:
+  seq: int
+  # Records by game id, in frame order; a delta also has `removed` records for vanished games.
+  keyframe: Dict[str, bytes]
+  delta: Dict[str, bytes] | None
+  keyframe_message: bytes
+  delta_message: bytes | None
+
+  def for_games(self, games: Collection[str] | None, resync: bool) -> bytes | None:
+    """The message for a viewer subscribed to `games` (None means all), or None if nothing changed."""
+    kind = KEYFRAME if resync or self.delta is None else DELTA
+    if games is None:
+      return self.keyframe_message if kind == KEYFRAME else self.delta_message
+    records = self.keyframe if kind == KEYFRAME else self.delta
+    selected = [records[game_id] for game_id in games if game_id in records]
+    if kind == DELTA and not selected:
+      return None
+    return message(kind, self.seq, selected)
+
+
+def encode_frame(seq: int, payload: bytes, encoder: DeltaEncoder | None, with_delta: bool) -> EncodedFrame:
+  """
+  Encode one frame's JSON payload. `encoder` carries the previous frame between calls; without
+  one, or without `with_delta`, only the keyframe is built.
+  """
+  snapshots = adapter(List[SpectatorSnapshot]).validate_json(payload)
+  games = [snapshot.model_dump() for snapshot in snapshots]
+  keyframe = {game["id"]: full_record(game) for game in games}
+  delta = None
+  if encoder is not None:
+    changes, removed = encoder.encode(snapshots)
+    if with_delta:
+      grids = {game["id"]: game["gridSize"] for game in games}
+      delta = {}
+      for change in changes:
+        game_id = change["id"]
+        # Moves are only emitted when the grid is unchanged, so the current grid applies.
+        delta[game_id] = keyframe[game_id] if "full" in change else move_record(game_id, change, grids[game_id])
+      for game_id in removed:
+        delta[game_id] = removed_record(game_id)
+  return EncodedFrame(
+    seq=seq,
+    keyframe=keyframe,
+    delta=delta,
+    keyframe_message=message(KEYFRAME, seq, list(keyframe.values())),
+    delta_message=message(DELTA, seq, list(delta.values())) if delta is not None else None,
+  )
+
+
+class BinaryFrames:
+  """
+  Binary encodings of recent spectator frames, shared by every WebSocket viewer of a worker.
+
+  While any viewer is attached it is subscribed to the broadcaster like a viewer queue, so each
+  frame is decoded and encoded once, in order, however many viewers there are. It starts from
+  the JSON payload, so followers relaying another worker's frames encode them the same way.
+  """
+
+  def __init__(self, broadcaster: SpectatorBroadcaster) -> None:
+    self.broadcaster = broadcaster
+    self._encoder = DeltaEncoder()
+    self._history: OrderedDict[int, EncodedFrame] = OrderedDict()
+    self._last_seq: int | None = None
+    self.viewers = 0
+    self.encoded = 0
+
+  def attach(self) -> None:
+    self.viewers += 1
+    if self.viewers == 1:
+      self.broadcaster.subscribe(self)
+      # Start from the current frame so the next broadcast can already be a delta.
+      self.put_nowait(self.broadcaster.latest())
+
+  def detach(self) -> None:
+    self.viewers -= 1
+    if self.viewers == 0:
+      self.broadcaster.unsubscribe(self)
+      self._history.clear()
+      self._last_seq = None
+
+  def full(self) -> bool:
+    return False
+
+  def put_nowait(self, frame: Frame) -> None:
+    """Encode `frame` as it is broadcast; called by the broadcaster's fan-out."""
+    if self._last_seq is None or frame.seq != self._last_seq + 1:
+      # A gap, or a new producer: diffs against what we saw last would be wrong.
+      self._encoder.reset()
+      encoded = self._encode(frame, with_delta=False)
+    else:
+      encoded = self._encode(frame, with_delta=True)
+    self._last_seq = frame.seq
+    self._history[frame.seq] = encoded
+    while len(self._history) > _HISTORY:
+      self._history.popitem(last=False)
+
+  def get(self, frame: Frame) -> EncodedFrame:
+    encoded = self._history.get(frame.seq)
+    if encoded is None:
+      # Older than the history, or not broadcast while anyone was watching.
+      encoded = self._encode(frame, with_delta=False, track=False)
+    return encoded
+
+  def _encode(self, frame: Frame, with_delta: bool, track: bool = True) -> EncodedFrame:
+    self.encoded += 1
+    return encode_frame(frame.seq, frame.payload, self._encoder if track else None, with_delta)
+
+
+def decode(data: bytes, grids: Dict[str, int]) -> Dict[str, Any]:
+  """
+  Reference decoder, mirroring what a client does; returns the header and records as dicts.
+
+  `grids` carries each game's grid size between messages, as `move` records need it; it is
+  updated from `full` records and pruned by `removed` ones.
+  """
+  version, kind, seq, count = _HEADER.unpack_from(data)
+  offset = _HEADER.size
+  records: List[Dict[str, Any]] = []
+
+  def text() -> str:
+    nonlocal offset
+    length = data[offset]
+    value = data[offset + 1 : offset + 1 + length].decode()
+    offset += 1 + length
+    return value
+
+  def cells(count: int, grid: int) -> List[List[int]]:
+    nonlocal offset
+    width = _cell_width(grid)
+    raw = data[offset : offset + count * width]
+    offset += count * width
+    values = list(raw) if width == 1 else list(struct.unpack(f">{count}H", raw))
+    return [[value % grid, value // grid] for value in values]
+
+  for _ in range(count):
+    tag = data[offset]
+    offset += 1
+    game_id = text()
+    if tag == FULL_RECORD:
+      player = text()
+      mode, grid, score = _GAME.unpack_from(data, offset)
+      offset += _GAME.size
+      grids[game_id] = grid
+      (food,) = cells(1, grid)
+      (length,) = _U16.unpack_from(data, offset)
+      offset += _U16.size
+      snake = cells(length, grid)
+      records.append({"type": "full", "id": game_id, "player": player, "mode": MODES[mode], "gridSize": grid, "score": score, "food": food, "snake": snake})
+    elif tag == MOVE_RECORD:
+      flags = data[offset]
+      offset += 1
+      record: Dict[str, Any] = {"type": "move", "id": game_id}
+      grid = grids[game_id]
+      if flags & HAS_HEAD:
+        record["head"] = cells(1, grid)[0]
+        (record["drop"],) = _U16.unpack_from(data, offset)
+        offset += _U16.size
+      if flags & HAS_FOOD:
+        record["food"] = cells(1, grid)[0]
+      if flags & HAS_SCORE:
+        (record["score"],) = _U32.unpack_from(data, offset)
+        offset += _U32.size
+      records.append(record)
+    else:
+      grids.pop(game_id, None)
+      records.append({"type": "removed", "id": game_id})
+  return {"version": version, "kind": "keyframe" if kind == KEYFRAME else "delta", "seq": seq, "records": records}
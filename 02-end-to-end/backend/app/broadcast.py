@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import struct
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, List, Set, Tuple
+
+from app.encoding import dump_json
+from app.frames import DeltaEncoder
+from app.live import LiveGames
+from app.metrics import metrics
+from app.schemas import SpectatorSnapshot
+from app.spectator import SpectatorEngine
+from app.spectator_backend import LocalBackend, SpectatorBackend
+from app.spectator_batch import BatchSpectatorEngine
+
+TICK_INTERVAL_SECONDS = 1.5
+SUBSCRIBER_QUEUE_SIZE = 8
+KEYFRAME_INTERVAL = 20
+RESUME_BUFFER_SIZE = 64
+
+TICK_SECONDS = metrics.histogram("spectator_tick_seconds", "Engine tick plus frame encoding time.")
+DROPPED_FRAMES = metrics.counter("spectator_dropped_frames_total", "Frames discarded from full subscriber queues.")
+_FRAME_HEADER = struct.Struct(">Q5I")
+
+
+@dataclass(frozen=True)
+class Frame:
+  seq: int
+  payload: bytes
+  # Legacy stream event: the full snapshot array.
+  event: bytes
+  # Delta stream events: what was broadcast for this tick, and a self-contained fallback.
+  delta_event: bytes
+  keyframe_event: bytes
+  etag: str
+
+  def to_bytes(self) -> bytes:
+    """Wire form for shipping an encoded frame to other workers."""
+    parts = (self.etag.encode(), self.payload, self.event, self.delta_event, self.keyframe_event)
+    return _FRAME_HEADER.pack(self.seq, *(len(part) for part in parts)) + b"".join(parts)
+
+  @classmethod
+  def from_bytes(cls, data: bytes) -> Frame:
+    seq, *lengths = _FRAME_HEADER.unpack_from(data)
+    parts, offset = [], _FRAME_HEADER.size
+    for length in lengths:
+      parts.append(data[offset : offset + length])
+      offset += length
+    etag, payload, event, delta_event, keyframe_event = parts
+    return cls(
+      seq=seq,
+      payload=payload,
+      event=event,
+      delta_event=delta_event,
+      keyframe_event=keyframe_event,
+      etag=etag.decode(),
+    )
+
+
+class SpectatorBroadcaster:
+  """
+  Owns the single simulation clock for spectators.
+
+  Each tick advances the engine once, serializes the frame once and hands the same bytes to
+  every subscriber queue, so adding viewers costs a queue put rather than a tick and a dump.
+  With a shared `backend`, only the elected producer ticks; other workers `ingest` its frames.
+  Games pushed by real players through `live` are merged into every frame next to the bots.
+  """
+
+  def __init__(
+    self,
+    engine: SpectatorEngine | BatchSpectatorEngine,
+    interval: float = TICK_INTERVAL_SECONDS,
+    queue_size: int = SUBSCRIBER_QUEUE_SIZE,
+    keyframe_interval: int = KEYFRAME_INTERVAL,
+    resume_buffer_size: int = RESUME_BUFFER_SIZE,
+    backend: SpectatorBackend | None = None,
+    live: LiveGames | None = None,
+  ) -> None:
+    self.backend = backend or LocalBackend()
+    self.live = live
+    self._engine = engine
+    self._interval = interval
+    self._queue_size = queue_size
+    self._keyframe_interval = keyframe_interval
+    self._delta_encoder = DeltaEncoder()
+    self._history: Deque[Tuple[int, bytes]] = deque(maxlen=resume_buffer_size)
+    self._subscribers: Set[asyncio.Queue[Frame]] = set()
+    self._latest: Frame | None = None
+    self._task: asyncio.Task | None = None
+    self._seq = 0
+    self._force_keyframe = False
+    # Distinguishes frame numbers across restarts and workers in ETags.
+    self._epoch = uuid.uuid4().hex[:8]
+    self.ticks = 0
+    self.encodes = 0
+    self.dropped = 0
+    self.tick_seconds = 0.0
+    self.frames_received = 0
+
+  @property
+  def subscriber_count(self) -> int:
+    return len(self._subscribers)
+
+  def reset(self) -> None:
+    self._latest = None
+    self._seq = 0
+    # Frame numbers restart, so ETags handed out before the reset must not match new frames.
+    self._epoch = uuid.uuid4().hex[:8]
+    self._delta_encoder.reset()
+    self._history.clear()
+
+  def latest(self) -> Frame:
+    if self._latest is None:
+      if not self.backend.is_producer:
+        # A follower's engine never ticks; until the producer's first frame arrives, serve no
+        # games rather than a local simulation no other worker agrees with.
+        return self._empty_frame()
+      self._latest = self._encode()
+    return self._latest
+
+  def _empty_frame(self) -> Frame:
+    keyframe_event = b'id: 0\ndata: {"type":"keyframe","seq":0,"games":[]}\n\n'
+    return Frame(
+      seq=0,
+      payload=b"[]",
+      event=b"id: 0\ndata: []\n\n",
+      delta_event=keyframe_event,
+      keyframe_event=keyframe_event,
+      etag=f'"{self._epoch}-0"',
+    )
+
+  def _encode(self) -> Frame:
+    self._seq += 1
+    self.encodes += 1
+    snapshots = self._engine.snapshots()
+    if self.live is not None:
+      snapshots.extend(self.live.snapshots())
+    payload = dump_json(List[SpectatorSnapshot], snapshots)
+    event_id = b"id: %d\n" % self._seq
+    keyframe = b'{"type":"keyframe","seq":%d,"games":%s}' % (self._seq, payload)
+    keyframe_event = event_id + b"data: " + keyframe + b"\n\n"
+    games, removed = self._delta_encoder.encode(snapshots)
+    if self._force_keyframe or (self._seq - 1) % self._keyframe_interval == 0:
+      self._force_keyframe = False
+      delta_event = keyframe_event
+    else:
+      delta = {
+        "type": "delta",
+        "seq": self._seq,
+        "updatedAt": snapshots[0].updatedAt if snapshots else int(time.time() * 1000),
+        "games": games,
+        "removed": removed,
+      }
+      delta_event = event_id + b"data: " + dump_json(Dict[str, Any], delta) + b"\n\n"
+    self._history.append((self._seq, delta_event))
+    return Frame(
+      seq=self._seq,
+      payload=payload,
+      event=event_id + b"data: " + payload + b"\n\n",
+      delta_event=delta_event,
+      keyframe_event=keyframe_event,
+      etag=f'"{self._epoch}-{self._seq}"',
+    )
+
+  def replay_since(self, last_seq: int) -> List[bytes] | None:
+    """Delta events after `last_seq`, or None when the gap is no longer buffered."""
+    if not self._history or last_seq < self._history[0][0] - 1 or last_seq > self._history[-1][0]:
+      return None
+    return [event for seq, event in self._history if seq > last_seq]
+
+  def step(self) -> Frame:
+    started = time.perf_counter()
+    self._engine.tick()
+    self.ticks += 1
+    frame = self._encode()
+    self._latest = frame
+    elapsed = time.perf_counter() - started
+    self.tick_seconds += elapsed
+    TICK_SECONDS.observe(elapsed)
+    self._fan_out(frame)
+    return frame
+
+  def receive(self, data: bytes) -> None:
+    self.ingest(Frame.from_bytes(data))
+
+  def ingest(self, frame: Frame) -> None:
+    """Adopt a frame produced by another worker as if this broadcaster had encoded it."""
+    self.frames_received += 1
+    if self._history and frame.seq != self._history[-1][0] + 1:
+      # A dropped message or a new producer: deltas on either side of the gap do not chain, so
+      # resumes from before it must fall back to a keyframe.
+      self._history.clear()
+    self._seq = frame.seq
+    self._latest = frame
+    self._history.append((frame.seq, frame.delta_event))
+    self._fan_out(frame)
+
+  def _fan_out(self, frame: Frame) -> None:
+    for queue in self._subscribers:
+      if queue.full():
+        # Slow viewers skip stale frames instead of growing an unbounded backlog.
+        queue.get_nowait()
+        self.dropped += 1
+        DROPPED_FRAMES.inc()
+      queue.put_nowait(frame)
+
+  def subscribe(self, queue: asyncio.Queue[Frame] | None = None) -> asyncio.Queue[Frame]:
+    """Register a queue for new frames; by default one holding `queue_size` frames."""
+    if queue is None:
+      queue = asyncio.Queue(maxsize=self._queue_size)
+    self._subscribers.add(queue)
+    return queue
+
+  def unsubscribe(self, queue: asyncio.Queue[Frame]) -> None:
+    self._subscribers.discard(queue)
+
+  async def _run(self) -> None:
+    producing = False
+    while True:
+      await asyncio.sleep(self._interval)
+      if not self.backend.is_producer:
+        producing = False
+        continue
+      if not producing:
+        # Taking over from another producer: viewers' delta chains refer to its state, not ours.
+        producing = True
+        self._delta_encoder.reset()
+        self._force_keyframe = True
+      frame = self.step()
+      await self.backend.publish(frame.to_bytes())
+
+  def start(self) -> None:
+    if self._task is None or self._task.done():
+      self.backend.start(self.receive)
+      self._task = asyncio.create_task(self._run())
+
+  async def stop(self) -> None:
+    if self._task is None:
+      return
+    self._task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+      await self._task
+    self._task = None
+    await self.backend.stop()
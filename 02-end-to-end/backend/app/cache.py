@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Hashable, List, Tuple
+
+from app.encoding import dump_json
+from app.schemas import LeaderboardEntry, UserProfile
+
+
+@dataclass
+class CachedLeaderboard:
+  entries: List[LeaderboardEntry]
+  expires_at: float
+  _body: bytes | None = field(default=None, repr=False)
+  _etag: str | None = field(default=None, repr=False)
+
+  @property
+  def body(self) -> bytes:
+    if self._body is None:
+      self._body = dump_json(List[LeaderboardEntry], self.entries)
+    return self._body
+
+  @property
+  def etag(self) -> str:
+    if self._etag is None:
+      self._etag = f'"{hashlib.blake2b(self.body, digest_size=12).hexdigest()}"'
+    return self._etag
+
+
+class LeaderboardCache:
+  """
+  Ranked leaderboard pages keyed by query, invalidated on every committed write.
+
+  Readers capture `version` before querying and `put` refuses results that raced with a write,
+  so a slow read can never repopulate the cache with pre-commit data. The TTL only bounds
+  staleness from writes made by other processes.
+
+  Page ETags hash the query together with a data token read from the shared database (see
+  `Database.leaderboard_token`) rather than the body, so every worker computes the same ETag
+  for the same data, and a poll whose If-None-Match is still current is answered without
+  loading the page. The token is kept like a page: dropped on local writes, and re-read after
+  the TTL to notice other workers' writes. With the cache disabled, ETags are body hashes.
+  """
+
+  def __init__(self, ttl_seconds: float, max_entries: int = 256) -> None:
+    self._ttl = ttl_seconds
+    self._max_entries = max_entries
+    self._entries: Dict[Hashable, CachedLeaderboard] = {}
+    self._lock = threading.Lock()
+    self._token: Tuple[str, float] | None = None
+    self.version = 0
+    self.hits = 0
+    self.misses = 0
+    self.invalidations = 0
+
+  def get(self, key: Hashable) -> CachedLeaderboard | None:
+    cached = self._entries.get(key)
+    if cached is None or cached.expires_at < time.monotonic():
+      self.misses += 1
+      return None
+    self.hits += 1
+    return cached
+
+  @property
+  def enabled(self) -> bool:
+    return self._ttl > 0
+
+  def token(self) -> str | None:
+    """The data token if one was read within the TTL and no local write happened since."""
+    token = self._token
+    if token is None or token[1] < time.monotonic():
+      return None
+    return token[0]
+
+  def put_token(self, token: str, version: int) -> None:
+    with self._lock:
+      if self.enabled and version == self.version:
+        self._token = (token, time.monotonic() + self._ttl)
+
+  @staticmethod
+  def etag(key: Hashable, token: str) -> str:
+    return f'"{hashlib.blake2b(f"{key!r}|{token}".encode(), digest_size=12).hexdigest()}"'
+
+  def put(self, key: Hashable, entries: List[LeaderboardEntry], version: int, token: str | None = None) -> CachedLeaderboard:
+    etag = self.etag(key, token) if token is not None else None
+    cached = CachedLeaderboard(entries=entries, expires_at=time.monotonic() + self._ttl, _etag=etag)
+    if self._ttl <= 0:
+      return cached
+    with self._lock:
+      if version != self.version:
+        return cached
+      if len(self._entries) >= self._max_entries:
+        self._entries.pop(next(iter(self._entries)))
+      self._entries[key] = cached
+    return cached
+
+  def invalidate(self) -> None:
+    with self._lock:
+      self.version += 1
+      self._entries = {}
+      self._token = None
+      self.invalidations += 1
+
+  def stats(self) -> Dict[str, float]:
+    lookups = self.hits + self.misses
+    return {
+      "size": len(self._entries),
+      "version": self.version,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hitRate": self.hits / lookups if lookups else 0.0,
+      "invalidations": self.invalidations,
+    }
+
+
+class SessionCache:
+  """
+  LRU of validated session tokens in front of the sessions table.
+
+  Entries expire at the earlier of the session's own expiry and `ttl_seconds` after caching, so
+  a session revoked in another process is trusted here for at most one TTL.
+  """
+
+  def __init__(self, max_entries: int, ttl_seconds: float) -> None:
+    self._max_entries = max_entries
+    self._ttl = ttl_seconds
+    self._entries: OrderedDict[str, Tuple[UserProfile, float]] = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, token: str) -> UserProfile | None:
+    cached = self._entries.get(token)
+    if cached is None:
+      self.misses += 1
+      return None
+    profile, expires_at = cached
+    if expires_at < time.time():
+      self.misses += 1
+      with self._lock:
+        self._entries.pop(token, None)
+      return None
+    self.hits += 1
+    with self._lock:
+      if token in self._entries:
+        self._entries.move_to_end(token)
+    return profile
+
+  def put(self, token: str, profile: UserProfile, session_expires_at: float) -> None:
+    if self._max_entries <= 0:
+      return
+    with self._lock:
+      self._entries[token] = (profile, min(session_expires_at, time.time() + self._ttl))
+      self._entries.move_to_end(token)
+      while len(self._entries) > self._max_entries:
+        self._entries.popitem(last=False)
+
+  def discard(self, token: str) -> None:
+    with self._lock:
+      self._entries.pop(token, None)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+
+  def stats(self) -> Dict[str, float]:
+    lookups = self.hits + self.misses
+    return {
+      "size": len(self._entries),
+      "hits": self.hits,
+      "misses": self.misses,
+      "hitRate": self.hits / lookups if lookups else 0.0,
+    }
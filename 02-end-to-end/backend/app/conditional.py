@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from fastapi import status
+from fastapi.responses import Response
+
+CACHE_CONTROL = "no-cache"
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+  if not if_none_match:
+    return False
+  if if_none_match.strip() == "*":
+    return True
+  # If-None-Match uses weak comparison, so W/ prefixes are ignored.
+  candidates = (candidate.strip().removeprefix("W/") for candidate in if_none_match.split(","))
+  return etag in candidates
+
+
+def conditional_response(body: bytes, etag: str, if_none_match: str | None, media_type: str = "application/json") -> Response:
+  headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+  if etag_matches(if_none_match, etag):
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+  return Response(content=body, media_type=media_type, headers=headers)
@@ -1,21 +1,72 @@
 from __future__ import annotations
 
+import functools
 import os
 import uuid
 from contextlib import AbstractContextManager, contextmanager
-from typing import Callable, Dict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Mapping, Tuple
 
-from sqlalchemy import CheckConstraint, Engine, String, create_engine, func, select
+from sqlalchemy import (
+  CheckConstraint,
+  DateTime,
+  Engine,
+  ForeignKey,
+  Index,
+  String,
+  PrimaryKeyConstraint,
+  and_,
+  bindparam,
+  case,
+  delete,
+  func,
+  insert,
+  or_,
+  select,
+  update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column, sessionmaker
 
-from app.schemas import GameMode, LeaderboardEntry, Session as SessionSchema, UserProfile
+from app.cache import CachedLeaderboard, LeaderboardCache, SessionCache
+from app.engines import build_engine
+from app.metrics import instrument_engine
+from app.passwords import hash_password
+from app.schemas import (
+  GameMode,
+  LeaderboardEntry,
+  LeaderboardWindow,
+  RankedLeaderboardEntry,
+  Session as SessionSchema,
+  UserProfile,
+)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./snake_ops.db")
+DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+DEFAULT_LEADERBOARD_LIMIT = 50
+MAX_LEADERBOARD_LIMIT = 500
+MAX_AROUND_RADIUS = 50
+LEADERBOARD_CACHE_TTL = float(os.getenv("LEADERBOARD_CACHE_TTL", "30"))
+ROLLUP_RETENTION_DAYS = int(os.getenv("ROLLUP_RETENTION_DAYS", "14"))
+ROLLUP_RETENTION_WEEKS = int(os.getenv("ROLLUP_RETENTION_WEEKS", "8"))
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600)))
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "10000"))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", "60"))
+ALL_MODES = "all"
+ALL_TIME_BUCKET = "all"
 
-_is_sqlite = DATABASE_URL.startswith("sqlite")
-connect_args = {"check_same_thread": False} if _is_sqlite else {}
-engine: Engine = create_engine(DATABASE_URL, connect_args=connect_args, future=True)
+engine: Engine = build_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+read_engine: Engine | None = build_engine(DATABASE_READ_URL) if DATABASE_READ_URL else None
+ReadSessionLocal = (
+  sessionmaker(bind=read_engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+  if read_engine is not None
+  else None
+)
+for _engine in (engine, read_engine):
+  if _engine is not None:
+    instrument_engine(_engine)
 
 
 class Base(DeclarativeBase):
@@ -45,6 +96,175 @@ class User(Base):
     return {"pass-through": self.pass_through_runs, "walls": self.walls_runs}
 
 
+class Run(Base):
+  """Append-only history of submitted runs."""
+
+  __tablename__ = "runs"
+
+  id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+  user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+  score: Mapped[int] = mapped_column(nullable=False)
+  mode: Mapped[str] = mapped_column(String(32), nullable=False)
+  created_at: Mapped[datetime] = mapped_column(
+    DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), nullable=False
+  )
+
+  __table_args__ = (CheckConstraint("score >= 0"),)
+
+
+class SessionToken(Base):
+  __tablename__ = "sessions"
+
+  token: Mapped[str] = mapped_column(String(64), primary_key=True)
+  user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True, nullable=False)
+  created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+  expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True, nullable=False)
+
+
+def _as_utc(value: datetime) -> datetime:
+  # SQLite hands timezone-aware columns back naive; values are always written in UTC.
+  return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+class LeaderboardRollup(Base):
+  """
+  Per-player best score and run counts for one (period, bucket, mode) board.
+
+  Maintained incrementally on score ingest so windowed and per-mode leaderboards never read `runs`.
+  `mode` is a `GameMode` or "all"; the all-time/all-modes board is the `users` table itself.
+  """
+
+  __tablename__ = "leaderboard_rollups"
+
+  period: Mapped[str] = mapped_column(String(16))
+  bucket: Mapped[str] = mapped_column(String(10))
+  mode: Mapped[str] = mapped_column(String(32))
+  user_id: Mapped[str] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+  best_score: Mapped[int] = mapped_column(default=0)
+  pass_through_runs: Mapped[int] = mapped_column(default=0)
+  walls_runs: Mapped[int] = mapped_column(default=0)
+
+  __table_args__ = (
+    PrimaryKeyConstraint("period", "bucket", "mode", "user_id"),
+    CheckConstraint("best_score >= 0"),
+  )
+
+
+Index(
+  "ix_leaderboard_rollups_board",
+  LeaderboardRollup.period,
+  LeaderboardRollup.bucket,
+  LeaderboardRollup.mode,
+  LeaderboardRollup.best_score.desc(),
+  LeaderboardRollup.user_id,
+)
+
+
+def rollup_bucket(window: LeaderboardWindow, at: datetime) -> str:
+  if window == "daily":
+    return at.date().isoformat()
+  if window == "weekly":
+    return (at.date() - timedelta(days=at.weekday())).isoformat()
+  return ALL_TIME_BUCKET
+
+
+def _rollup_rows(user_id: str, runs: Iterable[Tuple[int, GameMode, datetime]]) -> List[Dict[str, object]]:
+  rows: Dict[Tuple[str, str, str], Dict[str, object]] = {}
+  for score, mode, at in runs:
+    for window in ("daily", "weekly", "all-time"):
+      for board_mode in (mode, ALL_MODES):
+        if window == "all-time" and board_mode == ALL_MODES:
+          continue
+        key = (window, rollup_bucket(window, at), board_mode)
+        row = rows.get(key)
+        if row is None:
+          row = rows[key] = {
+            "period": window,
+            "bucket": key[1],
+            "mode": board_mode,
+            "user_id": user_id,
+            "best_score": 0,
+            "pass_through_runs": 0,
+            "walls_runs": 0,
+          }
+        row["best_score"] = max(row["best_score"], score)
+        row["pass_through_runs" if mode == "pass-through" else "walls_runs"] += 1
+  return list(rows.values())
+
+
+# Rollups are maintained with INSERT ... ON CONFLICT, which these dialects support.
+_ROLLUP_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+ROLLUP_BACKFILL_BATCH = int(os.getenv("ROLLUP_BACKFILL_BATCH", "5000"))
+
+
+def _check_rollup_dialect(dialect_name: str) -> None:
+  if dialect_name not in _ROLLUP_INSERTS:
+    supported = ", ".join(sorted(_ROLLUP_INSERTS))
+    raise RuntimeError(f"Leaderboard rollups need INSERT ... ON CONFLICT ({supported}); unsupported dialect {dialect_name}")
+
+
+@functools.lru_cache(maxsize=None)
+def _seed_password_hash(password: str) -> str:
+  # Hashed once per process; `reset` reseeds on every test and scrypt is deliberately slow.
+  return hash_password(password)
+
+
+def _rollup_upsert(dialect_name: str):
+  _check_rollup_dialect(dialect_name)
+  statement = _ROLLUP_INSERTS[dialect_name](LeaderboardRollup.__table__)
+  table, excluded = LeaderboardRollup.__table__.c, statement.excluded
+  return statement.on_conflict_do_update(
+    index_elements=[table.period, table.bucket, table.mode, table.user_id],
+    set_={
+      "best_score": case((excluded.best_score > table.best_score, excluded.best_score), else_=table.best_score),
+      "pass_through_runs": table.pass_through_runs + excluded.pass_through_runs,
+      "walls_runs": table.walls_runs + excluded.walls_runs,
+    },
+  )
+
+
+# Serves the leaderboard ordering (best score first, id as a stable tie-breaker) straight from the index.
+Index("ix_users_leaderboard", User.best_score.desc(), User.id)
+
+
+@dataclass
+class ScoreTotals:
+  """Coalesced score updates for one player: summed run counts, max score and the raw runs."""
+
+  username: str
+  pass_through_runs: int = 0
+  walls_runs: int = 0
+  best_score: int = 0
+  runs: List[Tuple[int, GameMode, datetime]] = field(default_factory=list)
+
+  def add(self, score: int, mode: GameMode, at: datetime | None = None) -> None:
+    if mode == "pass-through":
+      self.pass_through_runs += 1
+    else:
+      self.walls_runs += 1
+    self.best_score = max(self.best_score, score)
+    self.runs.append((score, mode, at or datetime.now(timezone.utc)))
+
+  def merge(self, other: ScoreTotals) -> None:
+    self.pass_through_runs += other.pass_through_runs
+    self.walls_runs += other.walls_runs
+    self.best_score = max(self.best_score, other.best_score)
+    self.runs.extend(other.runs)
+
+
+_users = User.__table__
+_BULK_SCORE_UPDATE = (
+  update(_users)
+  .where(_users.c.normalized_username == bindparam("target"))
+  .values(
+    total_runs=_users.c.total_runs + bindparam("add_pass_through") + bindparam("add_walls"),
+    pass_through_runs=_users.c.pass_through_runs + bindparam("add_pass_through"),
+    walls_runs=_users.c.walls_runs + bindparam("add_walls"),
+    best_score=case((_users.c.best_score < bindparam("new_best"), bindparam("new_best")), else_=_users.c.best_score),
+  )
+)
+
+
 @contextmanager
 def session_scope(session_factory: Callable[[], Session]) -> AbstractContextManager[Session]:
   session = session_factory()
@@ -59,13 +279,59 @@ def session_scope(session_factory: Callable[[], Session]) -> AbstractContextMana
 
 
 class Database:
-  def __init__(self, session_factory: Callable[[], Session], engine: Engine):
+  def __init__(
+    self,
+    session_factory: Callable[[], Session],
+    engine: Engine,
+    cache_ttl: float = LEADERBOARD_CACHE_TTL,
+    session_cache_size: int = SESSION_CACHE_SIZE,
+    read_session_factory: Callable[[], Session] | None = None,
+  ):
     self._session_factory = session_factory
+    # Leaderboard and rank reads go here; a replica adds its lag on top of the cache TTL.
+    self._read_session_factory = read_session_factory or session_factory
     self.engine = engine
+    self.leaderboard_cache = LeaderboardCache(cache_ttl)
+    self.session_cache = SessionCache(session_cache_size, SESSION_CACHE_TTL)
 
   def init_db(self) -> None:
+    # Fail at startup rather than on the first score submission.
+    _check_rollup_dialect(self.engine.dialect.name)
     Base.metadata.create_all(bind=self.engine)
     self._seed_if_empty()
+    self._backfill_rollups()
+
+  def _backfill_rollups(self) -> int:
+    """
+    Build `leaderboard_rollups` from `runs` when the table is empty but runs exist, as after
+    upgrading a database recorded before rollups. Returns the number of runs folded in; buckets
+    past retention are dropped by the next compaction.
+    """
+    with session_scope(self._session_factory) as session:
+      if session.scalar(select(LeaderboardRollup.user_id).limit(1)) is not None:
+        return 0
+      runs = session.execute(
+        select(Run.user_id, Run.score, Run.mode, Run.created_at)
+        .order_by(Run.user_id)
+        .execution_options(yield_per=ROLLUP_BACKFILL_BATCH)
+      )
+      folded, user_id, pending, rows = 0, None, [], []
+      for run_user_id, score, mode, created_at in runs:
+        if run_user_id != user_id and pending:
+          rows.extend(_rollup_rows(user_id, pending))
+          pending = []
+          if len(rows) >= ROLLUP_BACKFILL_BATCH:
+            self._upsert_rollups(session, rows)
+            rows = []
+        user_id = run_user_id
+        pending.append((score, mode, _as_utc(created_at)))
+        folded += 1
+      if pending:
+        rows.extend(_rollup_rows(user_id, pending))
+      self._upsert_rollups(session, rows)
+    if folded:
+      self.leaderboard_cache.invalidate()
+    return folded
 
   def _seed_if_empty(self) -> None:
     with session_scope(self._session_factory) as session:
@@ -78,7 +344,7 @@ class Database:
           id=f"seed-{index}",
           username=username,
           normalized_username=username.lower(),
-          password=password,
+          password=_seed_password_hash(password),
           best_score=5 + index * 3,
           total_runs=4 + index,
           pass_through_runs=2,
@@ -90,6 +356,8 @@ class Database:
     Base.metadata.drop_all(bind=self.engine)
     Base.metadata.create_all(bind=self.engine)
     self._seed_if_empty()
+    self.leaderboard_cache.invalidate()
+    self.session_cache.clear()
 
   @staticmethod
   def _normalize_username(username: str) -> str:
@@ -99,7 +367,7 @@ class Database:
   def _create_token() -> str:
     return f"session-{uuid.uuid4()}"
 
-  def sign_up(self, username: str, password: str) -> SessionSchema:
+  def sign_up(self, username: str, password_hash: str) -> SessionSchema:
     normalized = self._normalize_username(username)
     with session_scope(self._session_factory) as session:
       existing = session.scalar(select(User).where(User.normalized_username == normalized))
@@ -109,41 +377,307 @@ class Database:
         id=f"user-{uuid.uuid4()}",
         username=username.strip(),
         normalized_username=normalized,
-        password=password,
+        password=password_hash,
       )
       session.add(user)
       session.flush()
-      token = self._create_token()
-      return SessionSchema(token=token, user=UserProfile(id=user.id, username=user.username))
+      created, expires_at = self._open_session(session, user)
+    self.session_cache.put(created.token, created.user, expires_at)
+    self.leaderboard_cache.invalidate()
+    return created
 
-  def login(self, username: str, password: str) -> SessionSchema:
-    normalized = self._normalize_username(username)
+  def username_taken(self, username: str) -> bool:
+    """Cheap pre-check so a duplicate signup is refused before paying for a password hash."""
+    with session_scope(self._session_factory) as session:
+      normalized = self._normalize_username(username)
+      return session.scalar(select(User.id).where(User.normalized_username == normalized)) is not None
+
+  def credentials(self, username: str) -> Tuple[str, str] | None:
+    """Return `(user_id, stored_password)` so the caller can verify it off the DB workers."""
+    with session_scope(self._session_factory) as session:
+      row = session.execute(
+        select(User.id, User.password).where(User.normalized_username == self._normalize_username(username))
+      ).first()
+    return (row.id, row.password) if row is not None else None
+
+  def login(self, user_id: str, password_hash: str | None = None) -> SessionSchema:
+    """Open a session for an already verified user, replacing the stored hash when given one."""
     with session_scope(self._session_factory) as session:
-      user = session.scalar(select(User).where(User.normalized_username == normalized))
-      if not user or user.password != password:
+      user = session.get(User, user_id)
+      if user is None:
         raise ValueError("Invalid credentials")
-      token = self._create_token()
-      return SessionSchema(token=token, user=UserProfile(id=user.id, username=user.username))
+      if password_hash is not None:
+        user.password = password_hash
+      created, expires_at = self._open_session(session, user)
+    self.session_cache.put(created.token, created.user, expires_at)
+    return created
+
+  def _open_session(self, session: Session, user: User) -> Tuple[SessionSchema, float]:
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=SESSION_TTL_SECONDS)
+    token = self._create_token()
+    session.add(SessionToken(token=token, user_id=user.id, created_at=now, expires_at=expires_at))
+    return SessionSchema(token=token, user=UserProfile(id=user.id, username=user.username)), expires_at.timestamp()
+
+  def cached_session(self, token: str) -> UserProfile | None:
+    """Cache-only token check, cheap enough to call from the event loop."""
+    return self.session_cache.get(token)
+
+  def authenticate(self, token: str) -> UserProfile | None:
+    with session_scope(self._session_factory) as session:
+      row = session.execute(
+        select(User.id, User.username, SessionToken.expires_at)
+        .join(User, User.id == SessionToken.user_id)
+        .where(SessionToken.token == token, SessionToken.expires_at > datetime.now(timezone.utc))
+      ).first()
+    if row is None:
+      return None
+    profile = UserProfile(id=row.id, username=row.username)
+    self.session_cache.put(token, profile, _as_utc(row.expires_at).timestamp())
+    return profile
+
+  def sweep_sessions(self, now: datetime | None = None) -> int:
+    """Delete expired sessions in one statement; returns the number removed."""
+    with session_scope(self._session_factory) as session:
+      result = session.execute(
+        delete(SessionToken)
+        .where(SessionToken.expires_at <= (now or datetime.now(timezone.utc)))
+        .execution_options(synchronize_session=False)
+      )
+      return result.rowcount
 
   def record_score(self, username: str, score: int, mode: GameMode) -> None:
-    normalized = self._normalize_username(username)
+    mode_column = User.pass_through_runs if mode == "pass-through" else User.walls_runs
+    # One conditional UPDATE instead of read-modify-write, so concurrent submissions never lose counts.
+    statement = (
+      update(User)
+      .where(User.normalized_username == self._normalize_username(username))
+      .values(
+        {
+          User.total_runs: User.total_runs + 1,
+          mode_column: mode_column + 1,
+          User.best_score: case((User.best_score < score, score), else_=User.best_score),
+        }
+      )
+      .returning(User.id)
+      .execution_options(synchronize_session=False)
+    )
     with session_scope(self._session_factory) as session:
-      user = session.scalar(select(User).where(User.normalized_username == normalized))
-      if not user:
+      user_id = session.scalar(statement)
+      if user_id is None:
         raise KeyError("Player not found")
-      user.total_runs += 1
-      if mode == "pass-through":
-        user.pass_through_runs += 1
-      else:
-        user.walls_runs += 1
-      if score > user.best_score:
-        user.best_score = score
-      session.add(user)
+      at = datetime.now(timezone.utc)
+      session.execute(insert(Run).values(user_id=user_id, score=score, mode=mode, created_at=at))
+      self._upsert_rollups(session, _rollup_rows(user_id, [(score, mode, at)]))
+    self.leaderboard_cache.invalidate()
+
+  @staticmethod
+  def _upsert_rollups(session: Session, rows: List[Dict[str, object]]) -> None:
+    if rows:
+      connection = session.connection()
+      connection.execute(_rollup_upsert(connection.dialect.name), rows)
 
-  def leaderboard(self) -> list[LeaderboardEntry]:
+  def record_scores(self, scores: Iterable[Tuple[str, int, GameMode]]) -> List[str]:
+    totals: Dict[str, ScoreTotals] = {}
+    for username, score, mode in scores:
+      normalized = self._normalize_username(username)
+      totals.setdefault(normalized, ScoreTotals(username=username)).add(score, mode)
+    return self.apply_score_totals(totals)
+
+  def apply_score_totals(self, totals: Mapping[str, ScoreTotals]) -> List[str]:
+    """Apply per-player totals keyed by normalized username in one transaction; returns unknown players."""
+    if not totals:
+      return []
     with session_scope(self._session_factory) as session:
-      rows = session.scalars(select(User)).all()
-      entries = [
+      user_ids = dict(
+        session.execute(
+          select(User.normalized_username, User.id).where(User.normalized_username.in_(list(totals)))
+        ).all()
+      )
+      known = [normalized for normalized in totals if normalized in user_ids]
+      if known:
+        session.connection().execute(
+          _BULK_SCORE_UPDATE,
+          [
+            {
+              "target": normalized,
+              "add_pass_through": totals[normalized].pass_through_runs,
+              "add_walls": totals[normalized].walls_runs,
+              "new_best": totals[normalized].best_score,
+            }
+            for normalized in known
+          ],
+        )
+        session.execute(
+          insert(Run),
+          [
+            {"user_id": user_ids[normalized], "score": score, "mode": mode, "created_at": at}
+            for normalized in known
+            for score, mode, at in totals[normalized].runs
+          ],
+        )
+        self._upsert_rollups(
+          session,
+          [row for normalized in known for row in _rollup_rows(user_ids[normalized], totals[normalized].runs)],
+        )
+    if known:
+      self.leaderboard_cache.invalidate()
+    return [totals[normalized].username for normalized in totals if normalized not in user_ids]
+
+  def _leaderboard_key(
+    self, limit: int, after: str | None, mode: GameMode | None, window: LeaderboardWindow
+  ) -> Tuple[object, ...]:
+    normalized_after = self._normalize_username(after) if after is not None else None
+    return (limit, normalized_after, mode, window, rollup_bucket(window, datetime.now(timezone.utc)))
+
+  def cached_leaderboard(
+    self,
+    limit: int = DEFAULT_LEADERBOARD_LIMIT,
+    after: str | None = None,
+    mode: GameMode | None = None,
+    window: LeaderboardWindow = "all-time",
+  ) -> CachedLeaderboard | None:
+    """Cache-only lookup, cheap enough to call from the event loop."""
+    return self.leaderboard_cache.get(self._leaderboard_key(limit, after, mode, window))
+
+  def leaderboard_token(self) -> str | None:
+    """
+    Token that changes whenever any leaderboard can: every score inserts a run, and every
+    signup adds a user. Read from the database, so all workers agree on it; cached for the
+    leaderboard TTL. None when the cache is disabled.
+    """
+    cache = self.leaderboard_cache
+    if not cache.enabled:
+      return None
+    token = cache.token()
+    if token is None:
+      version = cache.version
+      with session_scope(self._read_session_factory) as session:
+        last_run = session.scalar(select(func.max(Run.id)))
+        users = session.scalar(select(func.count()).select_from(User))
+      token = f"{last_run or 0}-{users}"
+      cache.put_token(token, version)
+    return token
+
+  def cached_leaderboard_etag(
+    self,
+    limit: int = DEFAULT_LEADERBOARD_LIMIT,
+    after: str | None = None,
+    mode: GameMode | None = None,
+    window: LeaderboardWindow = "all-time",
+  ) -> str | None:
+    """The page's current ETag if the data token is cached; cheap enough for the event loop."""
+    token = self.leaderboard_cache.token()
+    return LeaderboardCache.etag(self._leaderboard_key(limit, after, mode, window), token) if token is not None else None
+
+  def leaderboard_etag(
+    self,
+    limit: int = DEFAULT_LEADERBOARD_LIMIT,
+    after: str | None = None,
+    mode: GameMode | None = None,
+    window: LeaderboardWindow = "all-time",
+  ) -> str | None:
+    """The page's current ETag without loading the page; None when the cache is disabled."""
+    token = self.leaderboard_token()
+    return LeaderboardCache.etag(self._leaderboard_key(limit, after, mode, window), token) if token is not None else None
+
+  def load_leaderboard(
+    self,
+    limit: int = DEFAULT_LEADERBOARD_LIMIT,
+    after: str | None = None,
+    mode: GameMode | None = None,
+    window: LeaderboardWindow = "all-time",
+  ) -> CachedLeaderboard:
+    """Query the page and populate the cache."""
+    key = self._leaderboard_key(limit, after, mode, window)
+    _, normalized_after, _, _, bucket = key
+    version = self.leaderboard_cache.version
+    # Read before the page, so the ETag is never newer than the data it labels.
+    token = self.leaderboard_token()
+    if mode is None and window == "all-time":
+      entries = self._query_leaderboard(limit, normalized_after)
+    else:
+      entries = self._query_rollup_leaderboard(limit, normalized_after, mode or ALL_MODES, window, bucket)
+    return self.leaderboard_cache.put(key, entries, version, token)
+
+  def leaderboard(
+    self,
+    limit: int = DEFAULT_LEADERBOARD_LIMIT,
+    after: str | None = None,
+    mode: GameMode | None = None,
+    window: LeaderboardWindow = "all-time",
+  ) -> list[LeaderboardEntry]:
+    page = self.cached_leaderboard(limit, after, mode, window) or self.load_leaderboard(limit, after, mode, window)
+    return list(page.entries)
+
+  def _query_rollup_leaderboard(
+    self, limit: int, normalized_after: str | None, mode: str, window: LeaderboardWindow, bucket: str
+  ) -> list[LeaderboardEntry]:
+    board = and_(LeaderboardRollup.period == window, LeaderboardRollup.bucket == bucket, LeaderboardRollup.mode == mode)
+    query = (
+      select(User.username, LeaderboardRollup.best_score, LeaderboardRollup.pass_through_runs, LeaderboardRollup.walls_runs)
+      .join(User, User.id == LeaderboardRollup.user_id)
+      .where(board)
+      .order_by(LeaderboardRollup.best_score.desc(), LeaderboardRollup.user_id)
+      .limit(limit)
+    )
+    with session_scope(self._read_session_factory) as session:
+      if normalized_after is not None:
+        cursor = session.execute(
+          select(LeaderboardRollup.best_score, LeaderboardRollup.user_id)
+          .join(User, User.id == LeaderboardRollup.user_id)
+          .where(board, User.normalized_username == normalized_after)
+        ).first()
+        if cursor is None:
+          raise KeyError("Player not found")
+        best_score, user_id = cursor
+        query = query.where(
+          or_(
+            LeaderboardRollup.best_score < best_score,
+            and_(LeaderboardRollup.best_score == best_score, LeaderboardRollup.user_id > user_id),
+          )
+        )
+      return [
+        LeaderboardEntry(
+          player=username,
+          bestScore=best_score,
+          totalRuns=pass_through_runs + walls_runs,
+          modeBreakdown={"pass-through": pass_through_runs, "walls": walls_runs},
+        )
+        for username, best_score, pass_through_runs, walls_runs in session.execute(query)
+      ]
+
+  def compact_rollups(self, now: datetime | None = None) -> int:
+    """Drop daily and weekly buckets past their retention; returns the number of rows removed."""
+    today = (now or datetime.now(timezone.utc)).date()
+    oldest_day = today - timedelta(days=ROLLUP_RETENTION_DAYS)
+    oldest_week = today - timedelta(days=today.weekday()) - timedelta(weeks=ROLLUP_RETENTION_WEEKS)
+    with session_scope(self._session_factory) as session:
+      removed = 0
+      for window, oldest in (("daily", oldest_day), ("weekly", oldest_week)):
+        result = session.execute(
+          delete(LeaderboardRollup)
+          .where(LeaderboardRollup.period == window, LeaderboardRollup.bucket < oldest.isoformat())
+          .execution_options(synchronize_session=False)
+        )
+        removed += result.rowcount
+    if removed:
+      self.leaderboard_cache.invalidate()
+    return removed
+
+  def _query_leaderboard(self, limit: int, normalized_after: str | None) -> list[LeaderboardEntry]:
+    query = select(User).order_by(User.best_score.desc(), User.id).limit(limit)
+    with session_scope(self._read_session_factory) as session:
+      if normalized_after is not None:
+        cursor = session.execute(
+          select(User.best_score, User.id).where(User.normalized_username == normalized_after)
+        ).first()
+        if cursor is None:
+          raise KeyError("Player not found")
+        best_score, user_id = cursor
+        query = query.where(or_(User.best_score < best_score, and_(User.best_score == best_score, User.id > user_id)))
+      rows = session.scalars(query).all()
+      return [
         LeaderboardEntry(
           player=row.username,
           bestScore=row.best_score,
@@ -152,7 +686,62 @@ class Database:
         )
         for row in rows
       ]
-    return sorted(entries, key=lambda entry: entry.bestScore, reverse=True)
+
+  @staticmethod
+  def _ranked(row: User, rank: int) -> RankedLeaderboardEntry:
+    return RankedLeaderboardEntry(
+      player=row.username,
+      bestScore=row.best_score,
+      totalRuns=row.total_runs,
+      modeBreakdown=row.mode_breakdown(),
+      rank=rank,
+    )
+
+  @staticmethod
+  def _rank_of(session: Session, best_score: int) -> int:
+    # Competition ranking: ties share a rank. Range count on ix_users_leaderboard.
+    return 1 + session.scalar(select(func.count()).select_from(User).where(User.best_score > best_score))
+
+  def _player_row(self, session: Session, player: str) -> User:
+    row = session.scalar(select(User).where(User.normalized_username == self._normalize_username(player)))
+    if row is None:
+      raise KeyError("Player not found")
+    return row
+
+  def player_rank(self, player: str) -> RankedLeaderboardEntry:
+    with session_scope(self._read_session_factory) as session:
+      row = self._player_row(session, player)
+      return self._ranked(row, self._rank_of(session, row.best_score))
+
+  def leaderboard_around(self, player: str, radius: int) -> list[RankedLeaderboardEntry]:
+    with session_scope(self._read_session_factory) as session:
+      row = self._player_row(session, player)
+      ahead_of_player = or_(User.best_score > row.best_score, and_(User.best_score == row.best_score, User.id < row.id))
+      behind_player = or_(User.best_score < row.best_score, and_(User.best_score == row.best_score, User.id > row.id))
+      above = session.scalars(
+        select(User).where(ahead_of_player).order_by(User.best_score.asc(), User.id.desc()).limit(radius)
+      ).all()
+      below = session.scalars(
+        select(User).where(behind_player).order_by(User.best_score.desc(), User.id).limit(radius)
+      ).all()
+      rows = [*reversed(above), row, *below]
+      # Position of the first row in leaderboard order; later rows either tie their predecessor or take their position.
+      player_rank = self._rank_of(session, row.best_score)
+      tied_ahead = session.scalar(
+        select(func.count()).select_from(User).where(User.best_score == row.best_score, User.id < row.id)
+      )
+      position = player_rank + tied_ahead - len(above)
+      top_score = rows[0].best_score
+      # Rank of the first row, derived from the player's rank with a narrow range count instead of a second full one.
+      rank = player_rank - session.scalar(
+        select(func.count()).select_from(User).where(User.best_score > row.best_score, User.best_score <= top_score)
+      )
+      entries = [self._ranked(rows[0], rank)]
+      for offset, current in enumerate(rows[1:], start=1):
+        if current.best_score != rows[offset - 1].best_score:
+          rank = position + offset
+        entries.append(self._ranked(current, rank))
+      return entries
 
 
-db = Database(SessionLocal, engine)
+db = Database(SessionLocal, engine, read_session_factory=ReadSessionLocal)
@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import Any, Mapping
+
+from fastapi import status
+from fastapi.responses import Response
+from pydantic import TypeAdapter
+
+
+@lru_cache(maxsize=None)
+def adapter(type_: Any) -> TypeAdapter:
+  """One compiled `TypeAdapter` per response type, built on first use and reused."""
+  return TypeAdapter(type_)
+
+
+def dump_json(type_: Any, value: Any) -> bytes:
+  """
+  Serialize `value` as `type_` straight to JSON bytes in pydantic-core.
+
+  Values are not validated: callers pass models they built themselves, so this skips the
+  re-validation FastAPI applies to a returned `response_model`.
+  """
+  return adapter(type_).dump_json(value)
+
+
+def json_response(
+  type_: Any,
+  value: Any,
+  status_code: int = status.HTTP_200_OK,
+  headers: Mapping[str, str] | None = None,
+) -> Response:
+  """
+  Already-encoded JSON response for an endpoint that declares `response_model=type_`.
+
+  FastAPI passes returned `Response`s through untouched, so `response_model` only documents
+  the schema and the generated OpenAPI is unchanged.
+  """
+  return Response(content=dump_json(type_, value), status_code=status_code, media_type="application/json", headers=headers)
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Dict
+
+from sqlalchemy import Engine, create_engine, event, make_url
+
+from app.executor import DB_WORKERS
+
+DB_PROFILE = os.getenv("DB_PROFILE", "tuned")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", str(DB_WORKERS)))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "4"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+PG_PREPARE_THRESHOLD = int(os.getenv("PG_PREPARE_THRESHOLD", "5"))
+PROFILES = ("basic", "tuned")
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+  return {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": SQLITE_BUSY_TIMEOUT_MS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    # Negative cache_size is in KiB rather than pages.
+    "cache_size": -SQLITE_CACHE_SIZE_KB,
+    "temp_store": "MEMORY",
+  }
+
+
+def _install_pragmas(engine: Engine, pragmas: Dict[str, Any]) -> None:
+  @event.listens_for(engine, "connect")
+  def apply_pragmas(dbapi_connection, _connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+      for name, value in pragmas.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+      cursor.close()
+
+
+def build_engine(url: str, profile: str = DB_PROFILE) -> Engine:
+  """
+  Create an engine for `url` using a named profile.
+
+  `basic` keeps SQLAlchemy's defaults. `tuned` sizes the pool to the DB executor and, per
+  dialect, enables WAL and friends on SQLite or pre-ping, recycling and server-side prepared
+  statements on Postgres.
+  """
+  if profile not in PROFILES:
+    raise ValueError(f"Unknown DB_PROFILE {profile!r}; expected one of {', '.join(PROFILES)}")
+  parsed = make_url(url)
+  is_sqlite = parsed.get_backend_name() == "sqlite"
+  connect_args: Dict[str, Any] = {"check_same_thread": False} if is_sqlite else {}
+  if profile == "basic":
+    return create_engine(url, connect_args=connect_args, future=True)
+
+  options: Dict[str, Any] = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+  }
+  if is_sqlite:
+    if parsed.database in (None, "", ":memory:"):
+      # Each in-memory connection is its own database, so pool settings and WAL do not apply.
+      engine = create_engine(url, connect_args=connect_args, future=True)
+    else:
+      engine = create_engine(url, connect_args=connect_args, future=True, **options)
+      _install_pragmas(engine, sqlite_pragmas())
+    return engine
+  if parsed.get_driver_name() == "psycopg":
+    connect_args["prepare_threshold"] = PG_PREPARE_THRESHOLD
+  return create_engine(
+    url,
+    connect_args=connect_args,
+    future=True,
+    pool_pre_ping=True,
+    pool_recycle=DB_POOL_RECYCLE,
+    **options,
+  )
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+from app.profiling import run_profiled
+
+T = TypeVar("T")
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "8"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+HASH_MAX_QUEUE = int(os.getenv("HASH_MAX_QUEUE", "32"))
+
+
+class ExecutorSaturated(RuntimeError):
+  """Raised by `BoundedExecutor.run` when the queue is already `max_queue` deep."""
+
+
+class BoundedExecutor:
+  """
+  Fixed-size thread pool for blocking work called from async handlers.
+
+  Keeps queue depth and wait/run timings so saturation is visible instead of silently
+  stalling the event loop. With `max_queue` set, work beyond that many queued calls is rejected
+  with `ExecutorSaturated` instead of waiting.
+  """
+
+  def __init__(self, max_workers: int, name: str, max_queue: int | None = None) -> None:
+    self.max_workers = max_workers
+    self.name = name
+    self.max_queue = max_queue
+    self._executor: ThreadPoolExecutor | None = None
+    self._lock = threading.Lock()
+    self._submitted = 0
+    self._started = 0
+    self._completed = 0
+    self._failed = 0
+    self._rejected = 0
+    self._wait_seconds = 0.0
+    self._run_seconds = 0.0
+
+  def _pool(self) -> ThreadPoolExecutor:
+    if self._executor is None:
+      self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+    return self._executor
+
+  @property
+  def queue_depth(self) -> int:
+    return self._submitted - self._started
+
+  @property
+  def active(self) -> int:
+    return self._started - self._completed - self._failed
+
+  async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    # run_profiled is a contextvar lookup unless this request is being profiled.
+    call = functools.partial(context.run, run_profiled, functools.partial(fn, *args, **kwargs))
+    submitted_at = time.perf_counter()
+    with self._lock:
+      if self.max_queue is not None and self._submitted - self._started >= self.max_queue:
+        self._rejected += 1
+        raise ExecutorSaturated(f"{self.name} executor queue is full")
+      self._submitted += 1
+
+    def execute() -> T:
+      started_at = time.perf_counter()
+      with self._lock:
+        self._started += 1
+        self._wait_seconds += started_at - submitted_at
+      try:
+        result = call()
+      except BaseException:
+        with self._lock:
+          self._failed += 1
+          self._run_seconds += time.perf_counter() - started_at
+        raise
+      with self._lock:
+        self._completed += 1
+        self._run_seconds += time.perf_counter() - started_at
+      return result
+
+    return await loop.run_in_executor(self._pool(), execute)
+
+  def stats(self) -> Dict[str, float]:
+    with self._lock:
+      started = self._started
+      return {
+        "maxWorkers": self.max_workers,
+        "queueDepth": self._submitted - started,
+        "active": started - self._completed - self._failed,
+        "submitted": self._submitted,
+        "completed": self._completed,
+        "failed": self._failed,
+        "rejected": self._rejected,
+        "avgWaitMs": (self._wait_seconds / started * 1000) if started else 0.0,
+        "avgRunMs": (self._run_seconds / started * 1000) if started else 0.0,
+      }
+
+  def shutdown(self) -> None:
+    if self._executor is not None:
+      self._executor.shutdown(wait=True)
+      self._executor = None
+
+
+db_executor = BoundedExecutor(DB_WORKERS, "db")
+hash_executor = BoundedExecutor(HASH_WORKERS, "hash", max_queue=HASH_MAX_QUEUE)
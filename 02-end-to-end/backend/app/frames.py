@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from app.schemas import SpectatorSnapshot
+
+Cell = Tuple[int, int]
+
+
+class GameView(NamedTuple):
+  player: str
+  mode: str
+  grid_size: int
+  snake: Tuple[Cell, ...]
+  food: Cell
+  score: int
+
+
+def _view(snapshot: SpectatorSnapshot) -> GameView:
+  return GameView(
+    player=snapshot.player,
+    mode=snapshot.mode,
+    grid_size=snapshot.gridSize,
+    snake=tuple((point.x, point.y) for point in snapshot.snake),
+    food=(snapshot.food.x, snapshot.food.y),
+    score=snapshot.score,
+  )
+
+
+class DeltaEncoder:
+  """
+  Diffs consecutive spectator frames per game.
+
+  A regular move becomes `{"id", "head", "drop"}`: cells to prepend and how many tail cells to
+  remove. Games that are new, respawned or otherwise not a shift of the previous snake are sent
+  in full under `"full"`. `score` and `food` are only included when they change.
+  """
+
+  def __init__(self) -> None:
+    self._previous: Dict[str, GameView] = {}
+
+  def reset(self) -> None:
+    self._previous = {}
+
+  def encode(self, snapshots: List[SpectatorSnapshot]) -> Tuple[List[Dict[str, Any]], List[str]]:
+    current: Dict[str, GameView] = {}
+    games: List[Dict[str, Any]] = []
+    for snapshot in snapshots:
+      view = _view(snapshot)
+      current[snapshot.id] = view
+      previous = self._previous.get(snapshot.id)
+      change = self._diff(previous, view) if previous is not None else None
+      if change is None:
+        games.append({"id": snapshot.id, "full": snapshot.model_dump()})
+      elif change:
+        games.append({"id": snapshot.id, **change})
+    removed = [game_id for game_id in self._previous if game_id not in current]
+    self._previous = current
+    return games, removed
+
+  @staticmethod
+  def _diff(previous: GameView, view: GameView) -> Dict[str, Any] | None:
+    if (previous.player, previous.mode, previous.grid_size) != (view.player, view.mode, view.grid_size):
+      return None
+    change: Dict[str, Any] = {}
+    if view.snake != previous.snake:
+      snake, old = view.snake, previous.snake
+      # A tick prepends one head and drops zero or more tail cells.
+      if len(snake) < 1 or len(snake) - 1 > len(old) or snake[1:] != old[: len(snake) - 1]:
+        return None
+      change["head"] = [list(snake[0])]
+      change["drop"] = len(old) - (len(snake) - 1)
+    if view.food != previous.food:
+      change["food"] = list(view.food)
+    if view.score != previous.score:
+      change["score"] = view.score
+    return change
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from typing import Dict
+
+from app.db import Database, ScoreTotals
+from app.executor import BoundedExecutor
+from app.schemas import GameMode
+
+logger = logging.getLogger(__name__)
+
+SCORES_WRITE_BEHIND = os.getenv("SCORES_WRITE_BEHIND", "").lower() in {"1", "true", "yes"}
+SCORES_FLUSH_SIZE = int(os.getenv("SCORES_FLUSH_SIZE", "500"))
+SCORES_FLUSH_INTERVAL = float(os.getenv("SCORES_FLUSH_INTERVAL", "0.5"))
+SCORES_MAX_PENDING = int(os.getenv("SCORES_MAX_PENDING", "50000"))
+SCORES_RETRY_AFTER = os.getenv("SCORES_RETRY_AFTER", "1")
+
+
+class ScoreQueueFull(RuntimeError):
+  """Raised by `ScoreWriteBehind.submit` when `max_pending` runs are already buffered."""
+
+
+class ScoreWriteBehind:
+  """
+  In-process queue that coalesces single score submissions per player.
+
+  Pending runs are flushed through `Database.apply_score_totals` once `flush_size` runs are
+  buffered or `flush_interval` seconds pass, whichever comes first. Accepted runs are never
+  dropped: a failed flush is requeued, and `submit` refuses new runs while `max_pending` are
+  buffered or being flushed, so an unreachable database cannot grow the queue without bound.
+  """
+
+  def __init__(
+    self,
+    database: Database,
+    executor: BoundedExecutor,
+    flush_size: int = SCORES_FLUSH_SIZE,
+    flush_interval: float = SCORES_FLUSH_INTERVAL,
+    max_pending: int = SCORES_MAX_PENDING,
+  ) -> None:
+    self._database = database
+    self._executor = executor
+    self._flush_size = flush_size
+    self._flush_interval = flush_interval
+    self._max_pending = max_pending
+    self._pending: Dict[str, ScoreTotals] = {}
+    self._pending_runs = 0
+    self._flushing_runs = 0
+    self._wakeup: asyncio.Event | None = None
+    self._task: asyncio.Task | None = None
+    self._flush_lock: asyncio.Lock | None = None
+    self._stopping = False
+    self.submitted = 0
+    self.flushed_runs = 0
+    self.flushes = 0
+    self.failed_flushes = 0
+    self.rejected_runs = 0
+    self.shed_runs = 0
+    self.last_flush_ms = 0.0
+    self.max_flush_ms = 0.0
+    self._flush_seconds = 0.0
+
+  @property
+  def queue_depth(self) -> int:
+    return self._pending_runs
+
+  def submit(self, username: str, score: int, mode: GameMode) -> None:
+    # Runs out for flushing count too: a failed flush puts them back.
+    if self._pending_runs + self._flushing_runs >= self._max_pending:
+      self.shed_runs += 1
+      raise ScoreQueueFull("Score queue is full, retry shortly")
+    normalized = username.strip().lower()
+    totals = self._pending.get(normalized)
+    if totals is None:
+      totals = self._pending[normalized] = ScoreTotals(username=username)
+    totals.add(score, mode)
+    self._pending_runs += 1
+    self.submitted += 1
+    if self._pending_runs >= self._flush_size and self._wakeup is not None:
+      self._wakeup.set()
+
+  async def flush(self) -> None:
+    if self._flush_lock is None:
+      self._flush_lock = asyncio.Lock()
+    async with self._flush_lock:
+      if not self._pending:
+        return
+      batch, runs = self._pending, self._pending_runs
+      self._pending, self._pending_runs = {}, 0
+      self._flushing_runs = runs
+      started = time.perf_counter()
+      try:
+        unknown = await self._executor.run(self._database.apply_score_totals, batch)
+      except Exception:
+        logger.exception("Score flush failed; requeueing %d runs", runs)
+        self.failed_flushes += 1
+        for normalized, totals in batch.items():
+          pending = self._pending.get(normalized)
+          if pending is None:
+            self._pending[normalized] = totals
+          else:
+            pending.merge(totals)
+        self._pending_runs += runs
+        return
+      finally:
+        self._flushing_runs = 0
+      elapsed_ms = (time.perf_counter() - started) * 1000
+      self.flushes += 1
+      self.flushed_runs += runs
+      self.rejected_runs += sum(len(batch[name.strip().lower()].runs) for name in unknown)
+      self.last_flush_ms = elapsed_ms
+      self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+      self._flush_seconds += elapsed_ms / 1000
+
+  async def _run(self) -> None:
+    assert self._wakeup is not None
+    while not self._stopping:
+      with contextlib.suppress(asyncio.TimeoutError):
+        await asyncio.wait_for(self._wakeup.wait(), timeout=self._flush_interval)
+      self._wakeup.clear()
+      await self.flush()
+
+  def start(self) -> None:
+    self._wakeup = asyncio.Event()
+    self._flush_lock = asyncio.Lock()
+    self._stopping = False
+    if self._task is None or self._task.done():
+      self._task = asyncio.create_task(self._run())
+
+  async def stop(self) -> None:
+    if self._task is not None:
+      # Let an in-flight flush finish rather than cancelling it halfway through a transaction.
+      self._stopping = True
+      assert self._wakeup is not None
+      self._wakeup.set()
+      await self._task
+      self._task = None
+    # Drain whatever is still buffered so shutdown never drops accepted scores.
+    await self.flush()
+
+  def stats(self) -> Dict[str, float]:
+    return {
+      "queueDepth": self._pending_runs,
+      "pendingPlayers": len(self._pending),
+      "submitted": self.submitted,
+      "flushedRuns": self.flushed_runs,
+      "rejectedRuns": self.rejected_runs,
+      "shedRuns": self.shed_runs,
+      "flushes": self.flushes,
+      "failedFlushes": self.failed_flushes,
+      "lastFlushMs": self.last_flush_ms,
+      "maxFlushMs": self.max_flush_ms,
+      "avgFlushMs": (self._flush_seconds / self.flushes * 1000) if self.flushes else 0.0,
+    }
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Literal
+
+from pydantic import ValidationError
+
+from app.ratelimit import TokenBucket
+from app.schemas import LiveGameUpdate, SpectatorSnapshot, UserProfile
+
+LIVE_UPDATES_PER_SECOND = float(os.getenv("LIVE_UPDATES_PER_SECOND", "15"))
+LIVE_BURST = float(os.getenv("LIVE_BURST", "30"))
+LIVE_IDLE_SECONDS = float(os.getenv("LIVE_IDLE_SECONDS", "10"))
+LIVE_MAX_GAMES = int(os.getenv("LIVE_MAX_GAMES", "10000"))
+LIVE_RETRY_AFTER = os.getenv("LIVE_RETRY_AFTER", "1")
+MAX_LIVE_LINE_BYTES = 64 * 1024
+
+Outcome = Literal["accepted", "throttled", "rejected"]
+
+
+@dataclass
+class _LiveGame:
+  snapshot: SpectatorSnapshot
+  bucket: TokenBucket
+  last_seen: float
+
+
+class LiveGames:
+  """
+  Latest pushed state of each real player's game, merged into spectator frames on every tick.
+
+  Updates only overwrite the stored snapshot, so however often clients push, each game costs
+  one entry per broadcast frame. Each player gets a token bucket, and games that stop pushing
+  for `idle_seconds` are dropped at the next tick, or when a new player needs their slot.
+  Games are kept in least-recently-updated order, so eviction only looks at the idle front.
+  """
+
+  def __init__(
+    self,
+    rate: float = LIVE_UPDATES_PER_SECOND,
+    burst: float = LIVE_BURST,
+    idle_seconds: float = LIVE_IDLE_SECONDS,
+    max_games: int = LIVE_MAX_GAMES,
+  ) -> None:
+    self._rate = rate
+    self._burst = burst
+    self._idle_seconds = idle_seconds
+    self._max_games = max_games
+    self._games: OrderedDict[str, _LiveGame] = OrderedDict()
+    self.accepted = 0
+    self.throttled = 0
+    self.rejected = 0
+    self.evicted = 0
+
+  def __len__(self) -> int:
+    return len(self._games)
+
+  def reset(self) -> None:
+    self._games = OrderedDict()
+
+  def apply_line(self, user: UserProfile, line: bytes, now: float | None = None) -> Outcome:
+    try:
+      update = LiveGameUpdate.model_validate_json(line)
+    except ValidationError:
+      self.rejected += 1
+      return "rejected"
+    return self.apply(user, update, now)
+
+  def apply(self, user: UserProfile, update: LiveGameUpdate, now: float | None = None) -> Outcome:
+    now = time.monotonic() if now is None else now
+    grid = update.gridSize
+    cells = [*update.snake, update.food]
+    if any(not (0 <= point.x < grid and 0 <= point.y < grid) for point in cells):
+      self.rejected += 1
+      return "rejected"
+    game = self._games.get(user.id)
+    if game is None and len(self._games) >= self._max_games:
+      # Ticks normally sweep idle games; this keeps the cap honest between them.
+      self.evict_idle(now)
+      if len(self._games) >= self._max_games:
+        self.rejected += 1
+        return "rejected"
+    if game is None:
+      game = _LiveGame(snapshot=None, bucket=TokenBucket(self._rate, self._burst, now), last_seen=now)
+    if not game.bucket.take(now):
+      self.throttled += 1
+      return "throttled"
+    game.snapshot = SpectatorSnapshot.model_construct(
+      id=f"live-{user.id}",
+      player=user.username,
+      mode=update.mode,
+      snake=update.snake,
+      food=update.food,
+      score=update.score,
+      gridSize=grid,
+      updatedAt=int(time.time() * 1000),
+    )
+    game.last_seen = now
+    self._games[user.id] = game
+    self._games.move_to_end(user.id)
+    self.accepted += 1
+    return "accepted"
+
+  def evict_idle(self, now: float | None = None) -> int:
+    now = time.monotonic() if now is None else now
+    evicted = 0
+    while self._games:
+      game = next(iter(self._games.values()))
+      if now - game.last_seen <= self._idle_seconds:
+        break
+      self._games.popitem(last=False)
+      evicted += 1
+    self.evicted += evicted
+    return evicted
+
+  def snapshots(self, now: float | None = None) -> List[SpectatorSnapshot]:
+    self.evict_idle(now)
+    return [game.snapshot for game in self._games.values()]
+
+  def stats(self) -> Dict[str, int]:
+    return {
+      "games": len(self._games),
+      "accepted": self.accepted,
+      "throttled": self.throttled,
+      "rejected": self.rejected,
+      "evicted": self.evicted,
+    }
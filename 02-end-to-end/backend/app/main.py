@@ -1,23 +1,125 @@
 import asyncio
-import json
+import contextlib
+import logging
+import os
 from contextlib import asynccontextmanager
+from typing import Literal
 
-from fastapi import FastAPI, status
+from fastapi import Depends, FastAPI, Header, Path, Query, Request, WebSocket, WebSocketDisconnect, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 
-from app.db import db as database
-from app.schemas import AuthRequest, ErrorResponse, LeaderboardEntry, ScoreRequest, Session, SpectatorSnapshot
-from app.spectator import SpectatorEngine
+from app.admission import Admission, AdmissionRejected, route_group
+from app.binary_frames import BinaryFrames
+from app.broadcast import SpectatorBroadcaster
+from app.conditional import conditional_response, etag_matches
+from app.db import DEFAULT_LEADERBOARD_LIMIT, MAX_AROUND_RADIUS, MAX_LEADERBOARD_LIMIT, db as database
+from app.encoding import dump_json, json_response
+from app.executor import ExecutorSaturated, db_executor, hash_executor
+from app.ingest import SCORES_RETRY_AFTER, SCORES_WRITE_BEHIND, ScoreQueueFull, ScoreWriteBehind
+from app.live import LIVE_RETRY_AFTER, MAX_LIVE_LINE_BYTES, LiveGames
+from app.metrics import METRICS_ENABLED, MetricsMiddleware, metrics
+from app.passwords import check_password, hash_password
+from app.profiling import ProfilingMiddleware, profiler
+from app.replays import REPLAY_ENABLED, ReplayStore
+from app.schemas import (
+  AuthRequest,
+  ErrorResponse,
+  GameMode,
+  LeaderboardEntry,
+  LeaderboardWindow,
+  LiveIngestResult,
+  RankedLeaderboardEntry,
+  ScoreBatchRequest,
+  ScoreBatchResult,
+  ScoreRequest,
+  Session,
+  SpectatorSnapshot,
+  SpectatorSubscription,
+  UserProfile,
+)
+from app.spectator import build_spectator_engine
+from app.spectator_backend import build_spectator_backend
+from app.streams import HEARTBEAT_EVENT, SSE_RETRY_AFTER, ManagedStreamResponse, StreamManager, StreamRejected
+
+logger = logging.getLogger(__name__)
 
-spectator_engine = SpectatorEngine()
+spectator_engine = build_spectator_engine()
+live_games = LiveGames()
+broadcaster = SpectatorBroadcaster(spectator_engine, backend=build_spectator_backend(), live=live_games)
+streams = StreamManager(broadcaster)
+binary_frames = BinaryFrames(broadcaster)
+replays = ReplayStore()
 db = database
+GZIP_MINIMUM_SIZE = int(os.getenv("GZIP_MINIMUM_SIZE", "1024"))
+ROLLUP_COMPACTION_INTERVAL = float(os.getenv("ROLLUP_COMPACTION_INTERVAL", "3600"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "600"))
+HASH_RETRY_AFTER = os.getenv("HASH_RETRY_AFTER", "1")
+score_queue = ScoreWriteBehind(database, db_executor) if SCORES_WRITE_BEHIND else None
+admission = Admission(
+  [
+    route_group("auth", rate=5, burst=20, max_concurrency=32),
+    route_group("scores", rate=10, burst=50, max_concurrency=64),
+  ],
+  queue_depth=lambda: db_executor.queue_depth,
+)
+
+metrics.gauge("spectator_subscribers", "Connected spectator stream viewers.", lambda: broadcaster.subscriber_count)
+metrics.gauge("stream_connections", "Open spectator streams on this worker.", lambda: streams.connections)
+metrics.gauge("spectator_live_games", "Player games currently pushing live state.", lambda: len(live_games))
+metrics.gauge("spectator_producer", "1 when this worker runs the shared simulation.", lambda: int(broadcaster.backend.is_producer))
+metrics.gauge(
+  "executor_queue_depth",
+  "Calls waiting for a worker thread.",
+  lambda: {(pool.name,): pool.queue_depth for pool in (db_executor, hash_executor)},
+  ("pool",),
+)
+metrics.gauge(
+  "admission_in_flight",
+  "Admitted requests in flight per route group.",
+  lambda: {(name,): count for name, count in admission.in_flight.items()},
+  ("group",),
+)
+metrics.gauge(
+  "score_queue_depth",
+  "Runs buffered by the score write-behind queue.",
+  lambda: score_queue.queue_depth if score_queue is not None else 0,
+)
+
+
+async def run_periodically(name: str, job, interval: float) -> None:
+  while True:
+    try:
+      await db_executor.run(job)
+    except Exception:
+      logger.exception("Periodic job %s failed", name)
+    await asyncio.sleep(interval)
 
 
 @asynccontextmanager
 async def lifespan(_app):
-  database.init_db()
+  await db_executor.run(database.init_db)
+  broadcaster.start()
+  if REPLAY_ENABLED and not replays.start(broadcaster):
+    logger.info("Another process is recording replays in %s", replays.directory)
+  if score_queue is not None:
+    score_queue.start()
+  periodic = [
+    asyncio.create_task(run_periodically("rollup-compaction", database.compact_rollups, ROLLUP_COMPACTION_INTERVAL)),
+    asyncio.create_task(run_periodically("session-sweep", database.sweep_sessions, SESSION_SWEEP_INTERVAL)),
+  ]
   yield
+  for task in periodic:
+    task.cancel()
+    with contextlib.suppress(asyncio.CancelledError):
+      await task
+  if score_queue is not None:
+    await score_queue.stop()
+  replays.stop()
+  await broadcaster.stop()
+  hash_executor.shutdown()
+  db_executor.shutdown()
 
 
 app = FastAPI(title="Snake Ops API", version="1.0.0", lifespan=lifespan)
@@ -27,38 +129,172 @@ app.add_middleware(
   allow_origins=["*"],
   allow_methods=["*"],
   allow_headers=["*"],
+  expose_headers=["ETag"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+if METRICS_ENABLED:
+  # Added last so it is outermost and times the whole stack.
+  app.add_middleware(MetricsMiddleware)
+
+
+class ApiError(Exception):
+  def __init__(self, status_code: int, message: str, headers: dict[str, str] | None = None) -> None:
+    super().__init__(message)
+    self.status_code = status_code
+    self.message = message
+    self.headers = headers
+
+
+@app.exception_handler(ApiError)
+async def api_error_handler(_request: Request, exc: ApiError):
+  return JSONResponse(status_code=exc.status_code, content={"message": exc.message}, headers=exc.headers)
+
+
+async def require_session(authorization: str | None = Header(default=None)) -> UserProfile:
+  scheme, _, token = (authorization or "").partition(" ")
+  if scheme.lower() != "bearer" or not token:
+    raise ApiError(status.HTTP_401_UNAUTHORIZED, "Missing bearer token", {"WWW-Authenticate": "Bearer"})
+  profile = database.cached_session(token)
+  if profile is None:
+    profile = await db_executor.run(database.authenticate, token)
+  if profile is None:
+    raise ApiError(status.HTTP_401_UNAUTHORIZED, "Invalid or expired session", {"WWW-Authenticate": "Bearer"})
+  return profile
+
+
+def admit(group: str):
+  """Route dependency that runs `admission` for `group` before the handler touches the database."""
+
+  async def dependency(request: Request):
+    try:
+      admission.acquire(group, request.client.host if request.client else "unknown")
+    except AdmissionRejected as exc:
+      raise ApiError(exc.status_code, str(exc), {"Retry-After": str(exc.retry_after)}) from None
+    try:
+      yield
+    finally:
+      admission.release(group)
+
+  return dependency
+
+
+def _ensure_own_scores(user: UserProfile, usernames: list[str]) -> None:
+  owner = user.username.lower()
+  if any(username.strip().lower() != owner for username in usernames):
+    raise ApiError(status.HTTP_403_FORBIDDEN, "Cannot record scores for another player")
+
+
+async def run_hash(fn, *args):
+  """Run password hashing on its own pool so login storms cannot tie up DB workers or the loop."""
+  try:
+    return await hash_executor.run(fn, *args)
+  except ExecutorSaturated:
+    raise ApiError(
+      status.HTTP_503_SERVICE_UNAVAILABLE,
+      "Too many sign-ins in progress, retry shortly",
+      {"Retry-After": HASH_RETRY_AFTER},
+    ) from None
 
 
 @app.post(
   "/auth/signup",
   response_model=Session,
   status_code=status.HTTP_201_CREATED,
-  responses={status.HTTP_409_CONFLICT: {"model": ErrorResponse}},
+  dependencies=[Depends(admit("auth"))],
+  responses={
+    status.HTTP_409_CONFLICT: {"model": ErrorResponse},
+    status.HTTP_429_TOO_MANY_REQUESTS: {"model": ErrorResponse},
+    status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse},
+  },
 )
 async def sign_up(payload: AuthRequest):
+  # sign_up checks again inside its transaction; this only spares a scrypt run on the common 409.
+  if await db_executor.run(database.username_taken, payload.username):
+    return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": "User already exists"})
+  password_hash = await run_hash(hash_password, payload.password)
   try:
-    return database.sign_up(payload.username, payload.password)
+    created = await db_executor.run(database.sign_up, payload.username, password_hash)
   except ValueError as exc:
     return JSONResponse(status_code=status.HTTP_409_CONFLICT, content={"message": str(exc)})
+  return json_response(Session, created, status.HTTP_201_CREATED)
 
 
 @app.post(
   "/auth/login",
   response_model=Session,
   status_code=status.HTTP_200_OK,
-  responses={status.HTTP_401_UNAUTHORIZED: {"model": ErrorResponse}},
+  dependencies=[Depends(admit("auth"))],
+  responses={
+    status.HTTP_401_UNAUTHORIZED: {"model": ErrorResponse},
+    status.HTTP_429_TOO_MANY_REQUESTS: {"model": ErrorResponse},
+    status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse},
+  },
 )
 async def login(payload: AuthRequest):
+  credentials = await db_executor.run(database.credentials, payload.username)
+  user_id, stored = credentials if credentials is not None else (None, None)
+  valid, rehashed = await run_hash(check_password, payload.password, stored)
   try:
-    return database.login(payload.username, payload.password)
+    if not valid:
+      raise ValueError("Invalid credentials")
+    session = await db_executor.run(database.login, user_id, rehashed)
   except ValueError as exc:
     return JSONResponse(status_code=status.HTTP_401_UNAUTHORIZED, content={"message": str(exc)})
+  return json_response(Session, session)
+
+
+@app.get(
+  "/leaderboard",
+  response_model=list[LeaderboardEntry],
+  responses={status.HTTP_404_NOT_FOUND: {"model": ErrorResponse}},
+)
+async def leaderboard(
+  limit: int = Query(default=DEFAULT_LEADERBOARD_LIMIT, ge=1, le=MAX_LEADERBOARD_LIMIT),
+  after: str | None = None,
+  mode: GameMode | None = None,
+  window: LeaderboardWindow = "all-time",
+  if_none_match: str | None = Header(default=None),
+):
+  if if_none_match:
+    etag = database.cached_leaderboard_etag(limit, after, mode, window)
+    if etag is None:
+      etag = await db_executor.run(database.leaderboard_etag, limit, after, mode, window)
+    if etag is not None and etag_matches(if_none_match, etag):
+      return conditional_response(b"", etag, if_none_match)
+  page = database.cached_leaderboard(limit, after, mode, window)
+  if page is None:
+    try:
+      page = await db_executor.run(database.load_leaderboard, limit, after, mode, window)
+    except KeyError as exc:
+      return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": str(exc)})
+  return conditional_response(page.body, page.etag, if_none_match)
+
+
+@app.get(
+  "/leaderboard/rank/{player}",
+  response_model=RankedLeaderboardEntry,
+  responses={status.HTTP_404_NOT_FOUND: {"model": ErrorResponse}},
+)
+async def leaderboard_rank(player: str):
+  try:
+    entry = await db_executor.run(database.player_rank, player)
+  except KeyError as exc:
+    return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": str(exc)})
+  return json_response(RankedLeaderboardEntry, entry)
 
 
-@app.get("/leaderboard", response_model=list[LeaderboardEntry])
-async def leaderboard():
-  return database.leaderboard()
+@app.get(
+  "/leaderboard/around/{player}",
+  response_model=list[RankedLeaderboardEntry],
+  responses={status.HTTP_404_NOT_FOUND: {"model": ErrorResponse}},
+)
+async def leaderboard_around(player: str, radius: int = Query(default=5, ge=0, le=MAX_AROUND_RADIUS)):
+  try:
+    window = await db_executor.run(database.leaderboard_around, player, radius)
+  except KeyError as exc:
+    return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": str(exc)})
+  return json_response(list[RankedLeaderboardEntry], window)
 
 
 @app.options("/leaderboard")
@@ -76,48 +312,307 @@ async def leaderboard_options():
 @app.post(
   "/scores",
   status_code=status.HTTP_204_NO_CONTENT,
-  responses={status.HTTP_404_NOT_FOUND: {"model": ErrorResponse}},
+  dependencies=[Depends(admit("scores"))],
+  responses={
+    status.HTTP_202_ACCEPTED: {"description": "Queued (write-behind mode)"},
+    status.HTTP_401_UNAUTHORIZED: {"model": ErrorResponse},
+    status.HTTP_403_FORBIDDEN: {"model": ErrorResponse},
+    status.HTTP_404_NOT_FOUND: {"model": ErrorResponse},
+    status.HTTP_429_TOO_MANY_REQUESTS: {"model": ErrorResponse},
+    status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse},
+  },
 )
-async def record_score(payload: ScoreRequest):
+async def record_score(payload: ScoreRequest, user: UserProfile = Depends(require_session)):
+  _ensure_own_scores(user, [payload.username])
+  if score_queue is not None:
+    try:
+      score_queue.submit(payload.username, payload.score, payload.mode)
+    except ScoreQueueFull as exc:
+      raise ApiError(status.HTTP_503_SERVICE_UNAVAILABLE, str(exc), {"Retry-After": SCORES_RETRY_AFTER}) from None
+    return Response(status_code=status.HTTP_202_ACCEPTED)
   try:
-    database.record_score(payload.username, payload.score, payload.mode)
+    await db_executor.run(database.record_score, payload.username, payload.score, payload.mode)
   except KeyError as exc:
     return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": str(exc)})
   return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 
+@app.post(
+  "/scores/batch",
+  response_model=ScoreBatchResult,
+  dependencies=[Depends(admit("scores"))],
+  responses={
+    status.HTTP_401_UNAUTHORIZED: {"model": ErrorResponse},
+    status.HTTP_403_FORBIDDEN: {"model": ErrorResponse},
+    status.HTTP_429_TOO_MANY_REQUESTS: {"model": ErrorResponse},
+    status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse},
+  },
+)
+async def record_scores(payload: ScoreBatchRequest, user: UserProfile = Depends(require_session)):
+  _ensure_own_scores(user, [item.username for item in payload.scores])
+  unknown = await db_executor.run(
+    database.record_scores, [(item.username, item.score, item.mode) for item in payload.scores]
+  )
+  unknown_keys = {name.strip().lower() for name in unknown}
+  accepted = sum(1 for item in payload.scores if item.username.strip().lower() not in unknown_keys)
+  return json_response(ScoreBatchResult, ScoreBatchResult(accepted=accepted, unknownPlayers=unknown))
+
+
+@app.get("/stats", include_in_schema=False)
+async def stats():
+  return {
+    "dbExecutor": db_executor.stats(),
+    "hashExecutor": hash_executor.stats(),
+    "admission": admission.stats(),
+    "leaderboardCache": database.leaderboard_cache.stats(),
+    "sessionCache": database.session_cache.stats(),
+    "scoreQueue": score_queue.stats() if score_queue is not None else None,
+    "spectator": {
+      "subscribers": broadcaster.subscriber_count,
+      "ticks": broadcaster.ticks,
+      "droppedFrames": broadcaster.dropped,
+      "tickSeconds": broadcaster.tick_seconds,
+      "framesReceived": broadcaster.frames_received,
+      "backend": broadcaster.backend.stats(),
+      "live": live_games.stats(),
+      "streams": streams.stats(),
+      "binaryViewers": binary_frames.viewers,
+      "binaryFramesEncoded": binary_frames.encoded,
+      "replays": replays.stats(),
+    },
+  }
+
+
+async def require_profile_token(x_profile_token: str | None = Header(default=None)) -> None:
+  # Without a configured token the admin surface does not exist.
+  if not profiler.token:
+    raise ApiError(status.HTTP_404_NOT_FOUND, "Not Found")
+  if not profiler.authorized(x_profile_token):
+    raise ApiError(status.HTTP_401_UNAUTHORIZED, "Invalid profile token")
+
+
+@app.get("/admin/profiles", include_in_schema=False, dependencies=[Depends(require_profile_token)])
+async def list_profiles():
+  return {
+    "sampleRate": profiler.sample_rate,
+    "profiled": profiler.profiled,
+    "skippedBusy": profiler.skipped_busy,
+    "profiles": profiler.store.list(),
+  }
+
+
+@app.get("/admin/profiles/{profile_id}", include_in_schema=False, dependencies=[Depends(require_profile_token)])
+async def download_profile(profile_id: str):
+  try:
+    path = profiler.store.path(profile_id)
+  except KeyError as exc:
+    return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"message": str(exc)})
+  return FileResponse(path, media_type="application/octet-stream", filename=path.name)
+
+
+@app.put("/admin/profiles/sample-rate", include_in_schema=False, dependencies=[Depends(require_profile_token)])
+async def set_profile_sample_rate(rate: float = Query(ge=0, le=1)):
+  profiler.sample_rate = rate
+  return {"sampleRate": profiler.sample_rate}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+  return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/spectator/snapshots", response_model=list[SpectatorSnapshot])
-async def spectator_snapshots():
-  spectator_engine.tick()
-  return spectator_engine.snapshots()
+async def spectator_snapshots(if_none_match: str | None = Header(default=None)):
+  frame = broadcaster.latest()
+  return conditional_response(frame.payload, frame.etag, if_none_match)
 
 
-def _format_sse(data: list[SpectatorSnapshot]) -> str:
-  return f"data: {json.dumps([snapshot.model_dump() for snapshot in data])}\n\n"
+@app.post(
+  "/spectator/live",
+  response_model=LiveIngestResult,
+  responses={
+    status.HTTP_401_UNAUTHORIZED: {"model": ErrorResponse},
+    status.HTTP_413_CONTENT_TOO_LARGE: {"model": ErrorResponse},
+    status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse},
+  },
+)
+async def spectator_live(request: Request, user: UserProfile = Depends(require_session)):
+  # Lines are applied as they arrive, so a client can hold one chunked request open for a whole run.
+  counts = {"accepted": 0, "throttled": 0, "rejected": 0}
+  buffer = b""
+  async for chunk in request.stream():
+    if not broadcaster.backend.is_producer:
+      # Only the producer's live games reach spectator frames; a follower would drop them silently.
+      raise ApiError(
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        "This worker is not broadcasting spectator frames, retry shortly",
+        {"Retry-After": LIVE_RETRY_AFTER},
+      )
+    buffer += chunk
+    *lines, buffer = buffer.split(b"\n")
+    if len(buffer) > MAX_LIVE_LINE_BYTES:
+      raise ApiError(status.HTTP_413_CONTENT_TOO_LARGE, "Live update line too long")
+    for line in lines:
+      if line.strip():
+        counts[live_games.apply_line(user, line)] += 1
+  if buffer.strip():
+    counts[live_games.apply_line(user, buffer)] += 1
+  return json_response(LiveIngestResult, LiveIngestResult(**counts))
 
 
-@app.get("/spectator/stream")
-async def spectator_stream(limit: int | None = None):
-  sent = 0
+@app.get(
+  "/spectator/stream",
+  responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ErrorResponse}},
+)
+async def spectator_stream(
+  request: Request,
+  limit: int | None = None,
+  encoding: Literal["full", "delta"] = "full",
+  last_event_id: int | None = Header(default=None, alias="Last-Event-ID"),
+):
+  cost = (lambda frame: len(frame.event)) if encoding == "full" else (lambda frame: len(frame.delta_event))
+  try:
+    connection = streams.open(request.client.host if request.client else "unknown", cost)
+  except StreamRejected as exc:
+    raise ApiError(status.HTTP_503_SERVICE_UNAVAILABLE, str(exc), {"Retry-After": SSE_RETRY_AFTER}) from None
 
   async def generator():
-    nonlocal sent
-    try:
-      yield _format_sse(spectator_engine.snapshots())
-      sent += 1
-      if limit and sent >= limit:
-        return
-      while True:
-        await asyncio.sleep(1.5)
-        spectator_engine.tick()
-        yield _format_sse(spectator_engine.snapshots())
+    sent = 0
+    frame = broadcaster.latest()
+    if encoding == "full":
+      events = [frame.event]
+    else:
+      backlog = broadcaster.replay_since(last_event_id) if last_event_id is not None else None
+      events = backlog if backlog is not None else [frame.keyframe_event]
+    last_seq = frame.seq
+    while True:
+      for event in events:
+        yield event
         sent += 1
         if limit and sent >= limit:
           return
-    except asyncio.CancelledError:
-      return
+      frame = await connection.next_frame(streams.heartbeat_seconds)
+      if frame is None:
+        if connection.evicted is not None:
+          return
+        # Comments keep proxies from timing out idle streams and surface dead clients on write.
+        streams.heartbeats += 1
+        yield HEARTBEAT_EVENT
+        events = []
+        continue
+      if encoding == "full":
+        events = [frame.event]
+      else:
+        # A skipped frame breaks the delta chain, so resync with a keyframe.
+        events = [frame.delta_event if frame.seq == last_seq + 1 else frame.keyframe_event]
+      last_seq = frame.seq
+
+  return ManagedStreamResponse(generator(), streams, connection)
+
+
+@app.get(
+  "/spectator/replays/{gameId}",
+  responses={status.HTTP_404_NOT_FOUND: {"model": ErrorResponse}},
+)
+def spectator_replay(
+  game_id: str = Path(alias="gameId"),
+  start: int | None = Query(default=None, alias="from", ge=0),
+  end: int | None = Query(default=None, alias="to", ge=0),
+):
+  # A sync route and iterator, so segment reads and their page faults stay off the event loop.
+  snapshots = replays.replay(game_id, start, end)
+  first = next(snapshots, None)
+  if first is None:
+    raise ApiError(status.HTTP_404_NOT_FOUND, "No recorded frames for this game in that range")
+
+  def lines():
+    batch = [dump_json(SpectatorSnapshot, first)]
+    for snapshot in snapshots:
+      batch.append(dump_json(SpectatorSnapshot, snapshot))
+      if len(batch) == 64:
+        yield b"\n".join(batch) + b"\n"
+        batch = []
+    if batch:
+      yield b"\n".join(batch) + b"\n"
 
-  return StreamingResponse(generator(), media_type="text/event-stream")
+  return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.websocket("/spectator/ws")
+async def spectator_ws(websocket: WebSocket, games: str | None = None):
+  await websocket.accept()
+  try:
+    connection = streams.open(websocket.client.host if websocket.client else "unknown", lambda frame: len(frame.delta_event))
+  except StreamRejected as exc:
+    # 1013 "try again later" is the WebSocket counterpart of 503 with Retry-After.
+    await websocket.close(code=1013, reason=str(exc))
+    return
+  binary_frames.attach()
+  selected = set(games.split(",")) if games else None
+  resync = False
+
+  async def read_subscriptions() -> int | None:
+    nonlocal selected, resync
+    while True:
+      message = await websocket.receive()
+      if message["type"] == "websocket.disconnect":
+        return None
+      if message.get("text") is None:
+        # Subscriptions are JSON text; binary messages are not part of the protocol.
+        return 1003
+      try:
+        request = SpectatorSubscription.model_validate_json(message["text"])
+      except ValueError:
+        return 1007
+      selected = set(request.subscribe) if request.subscribe is not None else None
+      resync = True
+
+  async def write_frames() -> None:
+    nonlocal resync
+    frame, last_seq = broadcaster.latest(), None
+    while True:
+      if frame is not None:
+        # New viewers, new subscriptions and skipped frames all restart from a keyframe.
+        keyframe = resync or last_seq is None or frame.seq != last_seq + 1
+        data = binary_frames.get(frame).for_games(selected, keyframe)
+        resync, last_seq = False, frame.seq
+        if data is not None:
+          try:
+            await asyncio.wait_for(websocket.send_bytes(data), streams.send_timeout)
+          except TimeoutError:
+            connection.evicted = "stalled"
+            return
+          except WebSocketDisconnect:
+            return
+      frame = await connection.next_frame(streams.heartbeat_seconds)
+      if frame is None and connection.evicted is not None:
+        return
+
+  reader = asyncio.create_task(read_subscriptions())
+  writer = asyncio.create_task(write_frames())
+  try:
+    await asyncio.wait((reader, writer), return_when=asyncio.FIRST_COMPLETED)
+  finally:
+    reader.cancel()
+    writer.cancel()
+    # Collected rather than re-raised, so one side failing still releases the connection.
+    outcomes = await asyncio.gather(reader, writer, return_exceptions=True)
+    binary_frames.detach()
+    streams.close(connection)
+  errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+  for error in errors:
+    logger.warning("Spectator WebSocket failed", exc_info=error)
+  if isinstance(outcomes[0], int):
+    close_code = outcomes[0]
+  elif errors:
+    close_code = 1011
+  elif connection.evicted is not None:
+    close_code = 1008
+  else:
+    close_code = None
+  if close_code is not None:
+    with contextlib.suppress(Exception):
+      await websocket.close(code=close_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+from __future__ import annotations
+
+import contextvars
+import os
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from sqlalchemy import Engine, event
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() in {"1", "true", "yes"}
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+Labels = Tuple[str, ...]
+
+
+class MetricsRegistry:
+  """
+  Counters and histograms sharded per thread, rendered in the Prometheus text format.
+
+  Every thread writes only to its own shard, so recording is a dict update with no lock; the
+  lock is taken once per thread to register its shard and by `render`, which sums the shards.
+  Each process exposes its own totals, so scrape every worker.
+  """
+
+  def __init__(self) -> None:
+    self._local = threading.local()
+    self._shards: List[Dict[Tuple[str, Labels], Any]] = []
+    self._lock = threading.Lock()
+    self._families: List[_Family] = []
+
+  def shard(self) -> Dict[Tuple[str, Labels], Any]:
+    try:
+      return self._local.values
+    except AttributeError:
+      values: Dict[Tuple[str, Labels], Any] = {}
+      with self._lock:
+        self._shards.append(values)
+      self._local.values = values
+      return values
+
+  def counter(self, name: str, help_text: str, labelnames: Sequence[str] = ()) -> Counter:
+    return self._register(Counter(self, name, help_text, tuple(labelnames)))
+
+  def histogram(
+    self, name: str, help_text: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+  ) -> Histogram:
+    return self._register(Histogram(self, name, help_text, tuple(labelnames), tuple(buckets)))
+
+  def gauge(self, name: str, help_text: str, read: Callable[[], float | Dict[Labels, float]], labelnames: Sequence[str] = ()) -> Gauge:
+    """Gauges are read from `read` at scrape time rather than recorded."""
+    return self._register(Gauge(self, name, help_text, tuple(labelnames), read))
+
+  def _register(self, family):
+    with self._lock:
+      self._families = [existing for existing in self._families if existing.name != family.name] + [family]
+    return family
+
+  def _merged(self) -> Dict[Tuple[str, Labels], Any]:
+    with self._lock:
+      shards = list(self._shards)
+    merged: Dict[Tuple[str, Labels], Any] = {}
+    for shard in shards:
+      # dict() copies in one step under the GIL, so a concurrent first write cannot break iteration.
+      for key, value in dict(shard).items():
+        if isinstance(value, list):
+          total = merged.get(key)
+          merged[key] = list(value) if total is None else [a + b for a, b in zip(total, value)]
+        else:
+          merged[key] = merged.get(key, 0.0) + value
+    return merged
+
+  def render(self) -> str:
+    merged = self._merged()
+    lines: List[str] = []
+    for family in list(self._families):
+      lines.append(f"# HELP {family.name} {family.help_text}")
+      lines.append(f"# TYPE {family.name} {family.kind}")
+      family.render(merged, lines)
+    return "\n".join(lines) + "\n"
+
+  def reset(self) -> None:
+    with self._lock:
+      for shard in self._shards:
+        shard.clear()
+
+
+def _escape(value: str) -> str:
+  return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+  if extra:
+    pairs.append(extra)
+  return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+  return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Family:
+  kind = "untyped"
+
+  def __init__(self, registry: MetricsRegistry, name: str, help_text: str, labelnames: Labels) -> None:
+    self._registry = registry
+    self.name = name
+    self.help_text = help_text
+    self.labelnames = labelnames
+
+  def _series(self, merged: Dict[Tuple[str, Labels], Any]):
+    return sorted((labels, value) for (name, labels), value in merged.items() if name == self.name)
+
+
+class Counter(_Family):
+  kind = "counter"
+
+  def inc(self, *labels: str, amount: float = 1.0) -> None:
+    shard = self._registry.shard()
+    key = (self.name, labels)
+    shard[key] = shard.get(key, 0.0) + amount
+
+  def render(self, merged, lines: List[str]) -> None:
+    for labels, value in self._series(merged):
+      lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+
+
+class Histogram(_Family):
+  kind = "histogram"
+
+  def __init__(self, registry, name, help_text, labelnames, buckets: Tuple[float, ...]) -> None:
+    super().__init__(registry, name, help_text, labelnames)
+    self.buckets = buckets
+
+  def observe(self, value: float, *labels: str) -> None:
+    shard = self._registry.shard()
+    key = (self.name, labels)
+    cells = shard.get(key)
+    if cells is None:
+      # One slot per bucket plus +Inf, then the running sum; cumulated only when rendered.
+      cells = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+    cells[bisect_left(self.buckets, value)] += 1
+    cells[-1] += value
+
+  def render(self, merged, lines: List[str]) -> None:
+    for labels, cells in self._series(merged):
+      cumulative = 0
+      for bound, count in zip((*self.buckets, float("inf")), cells[:-1]):
+        cumulative += count
+        le = "+Inf" if bound == float("inf") else _format_value(bound)
+        bucket_labels = _format_labels(self.labelnames, labels, f'le="{le}"')
+        lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+      lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(cells[-1])}")
+      lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+
+
+class Gauge(_Family):
+  kind = "gauge"
+
+  def __init__(self, registry, name, help_text, labelnames, read: Callable[[], float | Dict[Labels, float]]) -> None:
+    super().__init__(registry, name, help_text, labelnames)
+    self._read = read
+
+  def render(self, _merged, lines: List[str]) -> None:
+    value = self._read()
+    series = value if isinstance(value, dict) else {(): value}
+    for labels, current in sorted(series.items()):
+      lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(current)}")
+
+
+metrics = MetricsRegistry()
+
+HTTP_REQUESTS = metrics.counter("http_requests_total", "HTTP responses by route and status.", ("method", "route", "status"))
+HTTP_LATENCY = metrics.histogram(
+  "http_request_duration_seconds",
+  "Time until response headers are sent, so streams count their setup only.",
+  ("method", "route"),
+)
+HTTP_DB_QUERIES = metrics.histogram(
+  "http_request_db_queries", "SQL statements executed per request.", ("route",), QUERY_COUNT_BUCKETS
+)
+HTTP_DB_SECONDS = metrics.histogram("http_request_db_seconds", "SQL execution time per request.", ("route",))
+DB_QUERIES = metrics.counter("db_queries_total", "SQL statements executed, including background jobs.")
+DB_QUERY_SECONDS = metrics.counter("db_query_seconds_total", "Time spent executing SQL statements.")
+
+
+@dataclass
+class RequestDbStats:
+  queries: int = 0
+  seconds: float = 0.0
+
+
+# Only touched from the event loop thread.
+_in_flight = 0
+metrics.gauge("http_requests_in_flight", "Requests currently being handled, including open streams.", lambda: _in_flight)
+
+# Executor threads inherit this through the copied context, so their queries count toward the request.
+_request_db_stats: contextvars.ContextVar[RequestDbStats | None] = contextvars.ContextVar("request_db_stats", default=None)
+
+
+def _before_cursor_execute(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+  # One execution context per statement, so a statement that raises leaves nothing behind.
+  context._metrics_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(_conn, _cursor, _statement, _parameters, context, _executemany) -> None:
+  elapsed = time.perf_counter() - context._metrics_query_started
+  DB_QUERIES.inc()
+  DB_QUERY_SECONDS.inc(amount=elapsed)
+  stats = _request_db_stats.get()
+  if stats is not None:
+    stats.queries += 1
+    stats.seconds += elapsed
+
+
+def instrument_engine(engine: Engine) -> None:
+  if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class MetricsMiddleware:
+  """Pure ASGI middleware, so streaming responses pass through untouched."""
+
+  def __init__(self, app) -> None:
+    self.app = app
+
+  async def __call__(self, scope, receive, send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    started = time.perf_counter()
+    stats = RequestDbStats()
+    token = _request_db_stats.set(stats)
+    status_code = 500
+
+    async def send_with_metrics(message) -> None:
+      nonlocal status_code
+      if message["type"] == "http.response.start":
+        status_code = message["status"]
+        HTTP_LATENCY.observe(time.perf_counter() - started, scope["method"], _route(scope))
+      await send(message)
+
+    global _in_flight
+    _in_flight += 1
+    try:
+      await self.app(scope, receive, send_with_metrics)
+    finally:
+      _in_flight -= 1
+      _request_db_stats.reset(token)
+      route = _route(scope)
+      HTTP_REQUESTS.inc(scope["method"], route, str(status_code))
+      HTTP_DB_QUERIES.observe(stats.queries, route)
+      HTTP_DB_SECONDS.observe(stats.seconds, route)
+
+
+def _route(scope) -> str:
+  # Label by route template rather than raw path to keep cardinality bounded.
+  route = scope.get("route")
+  return getattr(route, "path", "unmatched")
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import os
+from typing import Tuple
+
+SCRYPT_N = int(os.getenv("PASSWORD_SCRYPT_N", str(2**14)))
+SCRYPT_R = int(os.getenv("PASSWORD_SCRYPT_R", "8"))
+SCRYPT_P = int(os.getenv("PASSWORD_SCRYPT_P", "1"))
+SALT_BYTES = 16
+KEY_BYTES = 32
+PREFIX = "scrypt$"
+
+
+def _b64encode(raw: bytes) -> str:
+  return base64.b64encode(raw).decode("ascii")
+
+
+def _derive(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+  return hashlib.scrypt(
+    password.encode(),
+    salt=salt,
+    n=n,
+    r=r,
+    p=p,
+    maxmem=256 * n * r * p,
+    dklen=KEY_BYTES,
+  )
+
+
+def hash_password(password: str) -> str:
+  """Salted scrypt hash encoded as `scrypt$n$r$p$salt$key` so parameters can change later."""
+  salt = os.urandom(SALT_BYTES)
+  key = _derive(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+  return f"{PREFIX}{SCRYPT_N}${SCRYPT_R}${SCRYPT_P}${_b64encode(salt)}${_b64encode(key)}"
+
+
+def is_hashed(stored: str) -> bool:
+  return stored.startswith(PREFIX)
+
+
+def needs_rehash(stored: str) -> bool:
+  if not is_hashed(stored):
+    return True
+  n, r, p = stored.split("$")[1:4]
+  return (int(n), int(r), int(p)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P)
+
+
+def verify_password(password: str, stored: str) -> bool:
+  if not is_hashed(stored):
+    # Legacy rows hold the plaintext password; compare in constant time until they are rehashed.
+    return hmac.compare_digest(password.encode(), stored.encode())
+  try:
+    _, n, r, p, salt, key = stored.split("$")
+    expected = base64.b64decode(key)
+    actual = _derive(password, base64.b64decode(salt), int(n), int(r), int(p))
+  except ValueError:
+    return False
+  return hmac.compare_digest(actual, expected)
+
+
+def check_password(password: str, stored: str | None) -> Tuple[bool, str | None]:
+  """
+  Verify `password` and, when the stored value is plaintext or uses old parameters, return a
+  fresh hash to persist. Unknown users (`stored is None`) still pay for one hash so response
+  time does not reveal which usernames exist.
+  """
+  if stored is None:
+    hash_password(password)
+    return False, None
+  if not verify_password(password, stored):
+    return False, None
+  return True, hash_password(password) if needs_rehash(stored) else None
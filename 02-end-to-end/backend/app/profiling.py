@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import cProfile
+import hmac
+import json
+import os
+import pstats
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, TypeVar
+
+T = TypeVar("T")
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", str(Path(tempfile.gettempdir()) / "snake_ops_profiles")))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "20"))
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_HEADER = "x-profile-token"
+_PROFILE_ID = re.compile(r"^[0-9]+-[0-9a-f]{8}$")
+
+
+class ProfileSession:
+  """
+  One profiled request: a cProfile for the event loop thread plus one per executor call.
+
+  The loop-thread profile also sees other tasks that ran while this request awaited, so
+  treat it as "what the loop did during this request".
+  """
+
+  def __init__(self, profile_id: str, method: str, path: str) -> None:
+    self.profile_id = profile_id
+    self.method = method
+    self.path = path
+    self.status = 0
+    self.started = time.perf_counter()
+    self.duration = 0.0
+    self.finished = False
+    self._loop_profile = cProfile.Profile()
+    self._worker_profiles: List[cProfile.Profile] = []
+    self._lock = threading.Lock()
+
+  def start(self) -> None:
+    self._loop_profile.enable()
+
+  def stop(self) -> None:
+    if not self.finished:
+      self._loop_profile.disable()
+      self.duration = time.perf_counter() - self.started
+      self.finished = True
+
+  def run_in_worker(self, fn: Callable[[], T]) -> T:
+    if self.finished:
+      return fn()
+    profile = cProfile.Profile()
+    try:
+      profile.enable()
+    except ValueError:
+      # Another profiler already owns this thread; run unprofiled rather than fail the request.
+      return fn()
+    try:
+      return fn()
+    finally:
+      profile.disable()
+      with self._lock:
+        self._worker_profiles.append(profile)
+
+  def stats(self) -> pstats.Stats:
+    stats = pstats.Stats(self._loop_profile)
+    with self._lock:
+      workers = list(self._worker_profiles)
+    for profile in workers:
+      stats.add(profile)
+    return stats
+
+
+_active_session: contextvars.ContextVar[ProfileSession | None] = contextvars.ContextVar("profile_session", default=None)
+
+
+def run_profiled(fn: Callable[[], T]) -> T:
+  """Run `fn` under the current request's profile, if any. Called inside executor threads."""
+  session = _active_session.get()
+  if session is None:
+    return fn()
+  return session.run_in_worker(fn)
+
+
+class ProfileStore:
+  """Bounded on-disk ring of `.prof` files (pstats format) with JSON sidecars."""
+
+  def __init__(self, directory: Path, keep: int) -> None:
+    self.directory = directory
+    self.keep = keep
+
+  def save(self, session: ProfileSession) -> None:
+    self.directory.mkdir(parents=True, exist_ok=True)
+    session.stats().dump_stats(str(self.directory / f"{session.profile_id}.prof"))
+    meta = {
+      "id": session.profile_id,
+      "method": session.method,
+      "path": session.path,
+      "status": session.status,
+      "durationMs": round(session.duration * 1000, 3),
+      "createdAt": int(time.time() * 1000),
+    }
+    (self.directory / f"{session.profile_id}.json").write_text(json.dumps(meta))
+    ids = self._ids()
+    for stale in ids[: max(0, len(ids) - self.keep)]:
+      for suffix in (".prof", ".json"):
+        (self.directory / f"{stale}{suffix}").unlink(missing_ok=True)
+
+  def _ids(self) -> List[str]:
+    if not self.directory.exists():
+      return []
+    # Ids start with a nanosecond timestamp of equal width, so name order is age order.
+    return sorted(path.stem for path in self.directory.glob("*.prof") if _PROFILE_ID.match(path.stem))
+
+  def list(self) -> List[Dict[str, Any]]:
+    entries = []
+    for profile_id in reversed(self._ids()):
+      meta_path = self.directory / f"{profile_id}.json"
+      meta = json.loads(meta_path.read_text()) if meta_path.exists() else {"id": profile_id}
+      meta["bytes"] = (self.directory / f"{profile_id}.prof").stat().st_size
+      entries.append(meta)
+    return entries
+
+  def path(self, profile_id: str) -> Path:
+    if not _PROFILE_ID.match(profile_id):
+      raise KeyError("Profile not found")
+    path = self.directory / f"{profile_id}.prof"
+    if not path.exists():
+      raise KeyError("Profile not found")
+    return path
+
+
+class Profiler:
+  """Decides which requests to profile and owns the store; only one request is profiled at a time."""
+
+  def __init__(
+    self,
+    store: ProfileStore,
+    token: str = PROFILE_TOKEN,
+    sample_rate: float = PROFILE_SAMPLE_RATE,
+    max_seconds: float = PROFILE_MAX_SECONDS,
+  ) -> None:
+    self.store = store
+    self.token = token
+    self.sample_rate = sample_rate
+    self.max_seconds = max_seconds
+    self._busy = False
+    self.profiled = 0
+    self.skipped_busy = 0
+
+  def authorized(self, presented: str | None) -> bool:
+    # Headers arrive as latin-1 text; compare bytes, since compare_digest rejects non-ASCII str.
+    return bool(self.token) and presented is not None and hmac.compare_digest(presented.encode("latin-1"), self.token.encode())
+
+  def should_profile(self, presented: str | None) -> bool:
+    return self.authorized(presented) or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+  def begin(self, method: str, path: str) -> ProfileSession | None:
+    if self._busy:
+      self.skipped_busy += 1
+      return None
+    session = ProfileSession(f"{time.time_ns()}-{uuid.uuid4().hex[:8]}", method, path)
+    try:
+      session.start()
+    except ValueError:
+      # The process is already running under an external profiler.
+      return None
+    self._busy = True
+    return session
+
+  async def end(self, session: ProfileSession) -> None:
+    session.stop()
+    self._busy = False
+    self.profiled += 1
+    # Merging stats, dump_stats and trimming the ring are file I/O; keep them off the event loop.
+    await asyncio.to_thread(self.store.save, session)
+
+
+class ProfilingMiddleware:
+  """
+  Pure ASGI middleware that wraps a request, including a streaming body, in a `ProfileSession`.
+
+  Streams are profiled until they end or `max_seconds` pass, whichever comes first.
+  """
+
+  def __init__(self, app, profiler: Profiler) -> None:
+    self.app = app
+    self.profiler = profiler
+
+  async def __call__(self, scope, receive, send) -> None:
+    if scope["type"] != "http":
+      await self.app(scope, receive, send)
+      return
+    # Decoded as Starlette decodes headers, so arbitrary bytes cannot fail the request.
+    presented = next((value.decode("latin-1") for key, value in scope["headers"] if key == PROFILE_HEADER.encode()), None)
+    if not self.profiler.should_profile(presented):
+      await self.app(scope, receive, send)
+      return
+    session = self.profiler.begin(scope["method"], scope["path"])
+    if session is None:
+      await self.app(scope, receive, send)
+      return
+
+    async def send_profiled(message) -> None:
+      if message["type"] == "http.response.start":
+        session.status = message["status"]
+        message = {**message, "headers": [*message.get("headers", []), (b"x-profile-id", session.profile_id.encode())]}
+      elif not session.finished and time.perf_counter() - session.started > self.profiler.max_seconds:
+        await self.profiler.end(session)
+      await send(message)
+
+    token = _active_session.set(session)
+    try:
+      await self.app(scope, receive, send_profiled)
+    finally:
+      _active_session.reset(token)
+      if not session.finished:
+        await self.profiler.end(session)
+
+
+profiler = Profiler(ProfileStore(PROFILE_DIR, PROFILE_KEEP))
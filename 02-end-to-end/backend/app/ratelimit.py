@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+import time
+
+
+class TokenBucket:
+  """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+  __slots__ = ("rate", "burst", "tokens", "updated")
+
+  def __init__(self, rate: float, burst: float, now: float | None = None) -> None:
+    self.rate = rate
+    self.burst = burst
+    self.tokens = burst
+    self.updated = time.monotonic() if now is None else now
+
+  def take(self, now: float | None = None, cost: float = 1.0) -> bool:
+    now = time.monotonic() if now is None else now
+    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+    self.updated = now
+    if self.tokens < cost:
+      return False
+    self.tokens -= cost
+    return True
+
+  def retry_after(self, cost: float = 1.0) -> float:
+    """Seconds until `cost` tokens will be available, as of the last `take`."""
+    if self.tokens >= cost or self.rate <= 0:
+      return 0.0
+    return (cost - self.tokens) / self.rate
@@ -0,0 +1,363 @@
+"""
+Append-only recording of spectator frames, for `/spectator/replays/{id}`.
+
+Frames go to segment files named after the wall-clock millisecond they start at:
+
+  <start>.seg  one entry per frame: body length u32 | seq u64 | time ms i64 | kind u8
+               | records u16, then each record as length u32 | record
+  <start>.idx  one entry per keyframe: time ms i64 | offset u64 into the segment
+  <start>.ids  each game id recorded in the segment, once: length u8 | id
+
+Records are those of `app.binary_frames`. Every `index_interval`-th frame, and the first of
+each segment, is a keyframe, so a reader seeks with the sparse index and replays at most
+`index_interval - 1` deltas before reaching the time it wants, and skips segments whose id
+list lacks the game. Readers map segments read-only and stop at a torn last entry, so a crash
+loses at most the frame being written.
+"""
+
+from __future__ import annotations
+
+import bisect
+import fcntl
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Tuple
+
+from app.binary_frames import DELTA, KEYFRAME, decode, encode_frame, message
+from app.broadcast import Frame, SpectatorBroadcaster
+from app.frames import DeltaEncoder
+from app.metrics import metrics
+from app.schemas import Point, SpectatorSnapshot
+
+logger = logging.getLogger(__name__)
+
+REPLAY_DIR = os.getenv("REPLAY_DIR", "./replays")
+REPLAY_ENABLED = os.getenv("REPLAY_ENABLED", "1") == "1"
+REPLAY_SEGMENT_SECONDS = float(os.getenv("REPLAY_SEGMENT_SECONDS", "600"))
+REPLAY_SEGMENT_BYTES = int(os.getenv("REPLAY_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+REPLAY_INDEX_INTERVAL = int(os.getenv("REPLAY_INDEX_INTERVAL", "32"))
+REPLAY_MAX_BYTES = int(os.getenv("REPLAY_MAX_BYTES", str(1024 * 1024 * 1024)))
+REPLAY_MAX_AGE_SECONDS = float(os.getenv("REPLAY_MAX_AGE_SECONDS", str(7 * 24 * 3600)))
+REPLAY_QUEUE_FRAMES = int(os.getenv("REPLAY_QUEUE_FRAMES", "256"))
+
+RECORDED_BYTES = metrics.counter("replay_recorded_bytes_total", "Bytes appended to replay segments.")
+REMOVED_SEGMENTS = metrics.counter("replay_segments_removed_total", "Replay segments deleted by retention.", ("reason",))
+DROPPED_FRAMES = metrics.counter("replay_dropped_frames_total", "Broadcast frames not recorded because the writer fell behind.")
+
+_ENTRY = struct.Struct(">IQqBH")
+_RECORD_LENGTH = struct.Struct(">I")
+_INDEX = struct.Struct(">qQ")
+
+
+class ReplayStore:
+  """
+  Records every broadcast frame of this worker into segments under `directory` and reads
+  single games back out of them.
+
+  Only one process records into a directory: `start` takes an exclusive `flock` on it, and
+  workers that lose the race only serve reads. Broadcast frames are queued to a writer thread,
+  so encoding, writes and retention stay off the event loop; past `queue_frames` pending frames
+  new ones are dropped, and the next recorded frame becomes a keyframe. A segment is closed once it is
+  `segment_seconds` old or `segment_bytes` long; on rotation, closed segments are deleted,
+  oldest first, while the directory holds more than `max_bytes` or they ended more than
+  `max_age_seconds` ago.
+  """
+
+  def __init__(
+    self,
+    directory: str | Path = REPLAY_DIR,
+    segment_seconds: float = REPLAY_SEGMENT_SECONDS,
+    segment_bytes: int = REPLAY_SEGMENT_BYTES,
+    index_interval: int = REPLAY_INDEX_INTERVAL,
+    max_bytes: int = REPLAY_MAX_BYTES,
+    max_age_seconds: float = REPLAY_MAX_AGE_SECONDS,
+    queue_frames: int = REPLAY_QUEUE_FRAMES,
+  ) -> None:
+    self.directory = Path(directory)
+    self.segment_seconds = segment_seconds
+    self.segment_bytes = segment_bytes
+    self.index_interval = index_interval
+    self.max_bytes = max_bytes
+    self.max_age_seconds = max_age_seconds
+    self._broadcaster: SpectatorBroadcaster | None = None
+    self._lock: IO[bytes] | None = None
+    self._segment: IO[bytes] | None = None
+    self._index: IO[bytes] | None = None
+    self._ids: IO[bytes] | None = None
+    self._segment_games: set[str] = set()
+    self._pending: queue.Queue[Tuple[Frame, int] | None] = queue.Queue(maxsize=queue_frames)
+    self._writer: threading.Thread | None = None
+    self._segment_started = 0
+    self._since_keyframe = 0
+    self._last_seq: int | None = None
+    self._encoder = DeltaEncoder()
+    self.frames = 0
+    self.removed = 0
+    self.dropped = 0
+
+  @property
+  def recording(self) -> bool:
+    return self._lock is not None
+
+  def start(self, broadcaster: SpectatorBroadcaster) -> bool:
+    """Record `broadcaster`'s frames, unless another process already records here."""
+    self.directory.mkdir(parents=True, exist_ok=True)
+    lock = open(self.directory / ".lock", "ab")
+    try:
+      fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      lock.close()
+      return False
+    self._lock = lock
+    self._writer = threading.Thread(target=self._write_pending, name="replay-writer", daemon=True)
+    self._writer.start()
+    self._broadcaster = broadcaster
+    broadcaster.subscribe(self)
+    return True
+
+  def stop(self) -> None:
+    if self._broadcaster is not None:
+      self._broadcaster.unsubscribe(self)
+      self._broadcaster = None
+    if self._writer is not None:
+      # Frames already queued are written before the segment closes.
+      self._pending.put(None)
+      self._writer.join()
+      self._writer = None
+    self._close_segment()
+    if self._lock is not None:
+      # Closing the file releases the flock.
+      self._lock.close()
+      self._lock = None
+    self._last_seq = None
+
+  def full(self) -> bool:
+    return False
+
+  def put_nowait(self, frame: Frame) -> None:
+    """Queue `frame` for the writer thread; called by the broadcaster's fan-out."""
+    try:
+      self._pending.put_nowait((frame, int(time.time() * 1000)))
+    except queue.Full:
+      self.dropped += 1
+      DROPPED_FRAMES.inc()
+
+  def _write_pending(self) -> None:
+    while (item := self._pending.get()) is not None:
+      frame, now_ms = item
+      try:
+        self.record(frame, now_ms)
+      except Exception:
+        # A full or failing disk must not end the writer thread; start over in a fresh segment.
+        logger.exception("Recording spectator frame %d failed", frame.seq)
+        self._close_segment()
+        self._last_seq = None
+
+  def record(self, frame: Frame, now_ms: int | None = None) -> None:
+    now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+    if (
+      self._segment is None
+      or now_ms - self._segment_started >= self.segment_seconds * 1000
+      or self._segment.tell() >= self.segment_bytes
+    ):
+      self._rotate(now_ms)
+    assert self._segment is not None and self._index is not None and self._ids is not None
+    if self._last_seq is None or frame.seq != self._last_seq + 1:
+      # A gap, or a new producer: the next entry must not be a diff against what we saw last.
+      self._encoder.reset()
+      self._since_keyframe = self.index_interval
+    keyframe = self._since_keyframe >= self.index_interval
+    encoded = encode_frame(frame.seq, frame.payload, self._encoder, with_delta=not keyframe)
+    records = encoded.keyframe if keyframe else encoded.delta
+    assert records is not None
+    new_games = records.keys() - self._segment_games
+    if new_games:
+      # Listed before the entry is written, so a reader that skips on the list never misses it.
+      # Ids past 255 bytes are cut short in records too, so no replay can ask for them.
+      listed = [game_id.encode() for game_id in sorted(new_games)]
+      self._ids.write(b"".join(bytes((len(raw),)) + raw for raw in listed if len(raw) <= 255))
+      self._ids.flush()
+      self._segment_games |= new_games
+    body = b"".join(_RECORD_LENGTH.pack(len(record)) + record for record in records.values())
+    offset = self._segment.tell()
+    self._segment.write(_ENTRY.pack(len(body), frame.seq, now_ms, KEYFRAME if keyframe else DELTA, len(records)) + body)
+    self._segment.flush()
+    if keyframe:
+      # Indexed only once the entry is complete, so a reader never seeks past the end.
+      self._index.write(_INDEX.pack(now_ms, offset))
+      self._index.flush()
+      self._since_keyframe = 0
+    self._since_keyframe += 1
+    self._last_seq = frame.seq
+    self.frames += 1
+    RECORDED_BYTES.inc(amount=_ENTRY.size + len(body))
+
+  def _rotate(self, now_ms: int) -> None:
+    self._close_segment()
+    self.directory.mkdir(parents=True, exist_ok=True)
+    # A clock that stepped back must not sort the new segment before the current one.
+    segments = self.segments()
+    started = max(now_ms, segments[-1][0] + 1) if segments else now_ms
+    self._segment = open(self.directory / f"{started:013d}.seg", "ab")
+    self._index = open(self.directory / f"{started:013d}.idx", "ab")
+    self._ids = open(self.directory / f"{started:013d}.ids", "ab")
+    self._segment_games = set()
+    self._segment_started = now_ms
+    self._since_keyframe = self.index_interval
+    self._expire(now_ms)
+
+  def _close_segment(self) -> None:
+    for file in (self._segment, self._index, self._ids):
+      if file is not None:
+        file.close()
+    self._segment = self._index = self._ids = None
+
+  def _expire(self, now_ms: int) -> None:
+    segments = self.segments()
+    sizes = [path.stat().st_size + path.with_suffix(".idx").stat().st_size for _, path in segments]
+    total = sum(sizes)
+    # The newest segment is the one being written.
+    for position, (_, path) in enumerate(segments[:-1]):
+      ended = segments[position + 1][0]
+      if total > self.max_bytes:
+        reason = "size"
+      elif now_ms - ended > self.max_age_seconds * 1000:
+        reason = "age"
+      else:
+        break
+      for suffix in (".seg", ".idx", ".ids"):
+        path.with_suffix(suffix).unlink(missing_ok=True)
+      total -= sizes[position]
+      self.removed += 1
+      REMOVED_SEGMENTS.inc(reason)
+
+  def segments(self) -> List[Tuple[int, Path]]:
+    """Segments on disk as `(start ms, path)`, oldest first."""
+    if not self.directory.is_dir():
+      return []
+    return sorted((int(path.stem), path) for path in self.directory.glob("*.seg") if path.stem.isdigit())
+
+  def replay(self, game_id: str, start_ms: int | None = None, end_ms: int | None = None) -> Iterator[SpectatorSnapshot]:
+    """
+    Snapshots of `game_id` between the two times, inclusive, oldest first: one for the first
+    frame in range that has the game, then one per frame that changes it.
+    """
+    wanted = game_id.encode()
+    segments = self.segments()
+    for position, (started, path) in enumerate(segments):
+      ended = segments[position + 1][0] if position + 1 < len(segments) else None
+      if end_ms is not None and started > end_ms:
+        return
+      if start_ms is not None and ended is not None and ended <= start_ms:
+        continue
+      try:
+        if not _lists_game(path.with_suffix(".ids"), wanted):
+          continue
+        yield from self._read_segment(path, wanted, start_ms, end_ms)
+      except FileNotFoundError:
+        # Expired while we were reading older segments.
+        continue
+
+  def _seek(self, index_path: Path, start_ms: int | None) -> int:
+    if start_ms is None:
+      return 0
+    raw = index_path.read_bytes()
+    entries = [_INDEX.unpack_from(raw, offset) for offset in range(0, len(raw) - _INDEX.size + 1, _INDEX.size)]
+    position = bisect.bisect_right([at for at, _ in entries], start_ms) - 1
+    return entries[position][1] if position >= 0 else 0
+
+  def _read_segment(self, path: Path, wanted: bytes, start_ms: int | None, end_ms: int | None) -> Iterator[SpectatorSnapshot]:
+    offset = self._seek(path.with_suffix(".idx"), start_ms)
+    with open(path, "rb") as file:
+      if os.fstat(file.fileno()).st_size == 0:
+        return
+      with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        game: Dict[str, Any] | None = None
+        grids: Dict[str, int] = {}
+        while offset + _ENTRY.size <= len(view):
+          length, seq, at, kind, count = _ENTRY.unpack_from(view, offset)
+          body = offset + _ENTRY.size
+          if body + length > len(view):
+            # Torn write at the end of the log.
+            return
+          offset = body + length
+          if end_ms is not None and at > end_ms:
+            return
+          record = _find_record(view, body, count, wanted)
+          if record is None:
+            if kind == KEYFRAME:
+              game = None
+            continue
+          (decoded,) = decode(message(kind, seq, [record]), grids)["records"]
+          game = _apply(game, decoded)
+          if game is not None and (start_ms is None or at >= start_ms):
+            yield SpectatorSnapshot(
+              id=decoded["id"],
+              player=game["player"],
+              mode=game["mode"],
+              snake=[Point(x=x, y=y) for x, y in game["snake"]],
+              food=Point(x=game["food"][0], y=game["food"][1]),
+              score=game["score"],
+              gridSize=game["gridSize"],
+              updatedAt=at,
+            )
+
+  def stats(self) -> Dict[str, object]:
+    segments = self.segments()
+    return {
+      "recording": self.recording,
+      "segments": len(segments),
+      "bytes": sum(path.stat().st_size for _, path in segments),
+      "frames": self.frames,
+      "removed": self.removed,
+      "dropped": self.dropped,
+      "queueDepth": self._pending.qsize(),
+    }
+
+
+def _lists_game(ids_path: Path, wanted: bytes) -> bool:
+  try:
+    raw = ids_path.read_bytes()
+  except FileNotFoundError:
+    # Segments recorded before id lists existed have to be scanned.
+    return True
+  position = 0
+  while position < len(raw):
+    length = raw[position]
+    if raw[position + 1 : position + 1 + length] == wanted:
+      return True
+    position += 1 + length
+  return False
+
+
+def _find_record(view: mmap.mmap, position: int, count: int, wanted: bytes) -> bytes | None:
+  # Records start with a tag and the length-prefixed game id, so others are skipped unread.
+  for _ in range(count):
+    (length,) = _RECORD_LENGTH.unpack_from(view, position)
+    start = position + _RECORD_LENGTH.size
+    if view[start + 1] == len(wanted) and view[start + 2 : start + 2 + len(wanted)] == wanted:
+      return view[start : start + length]
+    position = start + length
+  return None
+
+
+def _apply(game: Dict[str, Any] | None, record: Dict[str, Any]) -> Dict[str, Any] | None:
+  if record["type"] == "full":
+    return record
+  if record["type"] == "removed" or game is None:
+    return None
+  game = dict(game)
+  if "head" in record:
+    snake = [record["head"], *game["snake"]]
+    game["snake"] = snake[: len(snake) - record["drop"]]
+  if "food" in record:
+    game["food"] = record["food"]
+  if "score" in record:
+    game["score"] = record["score"]
+  return game
@@ -3,6 +3,7 @@ from typing import Dict, List, Literal
 from pydantic import BaseModel, Field
 
 GameMode = Literal["pass-through", "walls"]
+LeaderboardWindow = Literal["daily", "weekly", "all-time"]
 
 
 class Point(BaseModel):
@@ -27,6 +28,10 @@ class LeaderboardEntry(BaseModel):
   modeBreakdown: Dict[GameMode, int]
 
 
+class RankedLeaderboardEntry(LeaderboardEntry):
+  rank: int = Field(ge=1)
+
+
 class SpectatorSnapshot(BaseModel):
   id: str
   player: str
@@ -49,5 +54,33 @@ class ScoreRequest(BaseModel):
   mode: GameMode
 
 
+class ScoreBatchRequest(BaseModel):
+  scores: List[ScoreRequest] = Field(min_length=1, max_length=1000)
+
+
+class ScoreBatchResult(BaseModel):
+  accepted: int = Field(ge=0)
+  unknownPlayers: List[str]
+
+
+class LiveGameUpdate(BaseModel):
+  mode: GameMode
+  snake: List[Point] = Field(min_length=1, max_length=4096)
+  food: Point
+  score: int = Field(ge=0)
+  gridSize: int = Field(ge=1, le=64)
+
+
+class LiveIngestResult(BaseModel):
+  accepted: int = Field(ge=0)
+  throttled: int = Field(ge=0)
+  rejected: int = Field(ge=0)
+
+
+class SpectatorSubscription(BaseModel):
+  # None subscribes to every game.
+  subscribe: List[str] | None = Field(default=None, max_length=1000)
+
+
 class ErrorResponse(BaseModel):
   message: str
@@ -1,11 +1,55 @@
 from __future__ import annotations
 
+import os
 import random
 import time
+from array import array
+from collections import deque
 from dataclasses import dataclass
-from typing import List
+from typing import Deque, List, Sequence
 
 from app.schemas import GameMode, Point, SpectatorSnapshot
+from app.spectator_batch import BatchSpectatorEngine
+
+DEFAULT_PLAYERS = ("Drift", "Echo", "Pulse")
+DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+SPECTATOR_ENGINE = os.getenv("SPECTATOR_ENGINE", "loop")
+SPECTATOR_GAMES = int(os.getenv("SPECTATOR_GAMES", str(len(DEFAULT_PLAYERS))))
+SPECTATOR_SEED = int(os.environ["SPECTATOR_SEED"]) if os.getenv("SPECTATOR_SEED") else None
+
+
+class FreeCells:
+  """Set of unoccupied cells with O(1) add, remove and uniform random pick."""
+
+  def __init__(self, size: int) -> None:
+    self._cells = array("i", range(size))
+    self._positions = array("i", range(size))
+
+  def __len__(self) -> int:
+    return len(self._cells)
+
+  def __contains__(self, cell: int) -> bool:
+    return self._positions[cell] >= 0
+
+  def add(self, cell: int) -> None:
+    if self._positions[cell] >= 0:
+      return
+    self._positions[cell] = len(self._cells)
+    self._cells.append(cell)
+
+  def remove(self, cell: int) -> None:
+    position = self._positions[cell]
+    if position < 0:
+      return
+    last = self._cells.pop()
+    if last != cell:
+      self._cells[position] = last
+      self._positions[last] = position
+    self._positions[cell] = -1
+
+  def choice(self, rng: random.Random) -> int:
+    return self._cells[rng.randrange(len(self._cells))]
 
 
 @dataclass
@@ -14,82 +58,136 @@ class SpectatorState:
   player: str
   mode: GameMode
   grid_size: int
-  snake: List[Point]
-  food: Point
+  # Packed cells (y * grid_size + x), head first.
+  body: Deque[int]
+  # Segments per cell; snakes may cross themselves, so this counts rather than flags.
+  occupancy: array
+  free: FreeCells
+  food: int
   score: int
 
+  def occupy(self, cell: int) -> None:
+    self.occupancy[cell] += 1
+    if self.occupancy[cell] == 1:
+      self.free.remove(cell)
+
+  def release(self, cell: int) -> None:
+    self.occupancy[cell] -= 1
+    if self.occupancy[cell] == 0:
+      self.free.add(cell)
+
 
 class SpectatorEngine:
-  def __init__(self, grid_size: int = 12) -> None:
+  def __init__(self, grid_size: int = 12, players: Sequence[str] = DEFAULT_PLAYERS, seed: int | None = None) -> None:
     self._grid_size = grid_size
+    self._players = tuple(players)
+    self._seed = seed
+    self._random = random.Random(seed)
     self._states: List[SpectatorState] = [
-      self._initial_state(index, name) for index, name in enumerate(["Drift", "Echo", "Pulse"])
+      self._initial_state(index, name) for index, name in enumerate(self._players)
     ]
 
   def reset(self) -> None:
-    self.__init__(grid_size=self._grid_size)
+    self.__init__(grid_size=self._grid_size, players=self._players, seed=self._seed)
+
+  def _pack(self, x: int, y: int) -> int:
+    return y * self._grid_size + x
 
   def _initial_state(self, index: int, player: str) -> SpectatorState:
-    start = (index + 2) % self._grid_size
-    snake = [Point(x=start, y=start), Point(x=start - 1, y=start), Point(x=start - 2, y=start)]
-    food = self._random_food(snake)
     mode: GameMode = "walls" if index % 2 == 0 else "pass-through"
-    return SpectatorState(
+    cells = self._grid_size * self._grid_size
+    state = SpectatorState(
       id=f"spectator-{index}",
       player=player,
       mode=mode,
       grid_size=self._grid_size,
-      snake=snake,
-      food=food,
-      score=random.randint(0, 12),
+      body=deque(),
+      occupancy=array("H", bytes(2 * cells)),
+      free=FreeCells(cells),
+      food=0,
+      score=self._random.randint(0, 12),
     )
+    self._spawn(state, index)
+    return state
 
-  def _random_food(self, snake: List[Point]) -> Point:
-    for _ in range(self._grid_size * 3):
-      candidate = Point(x=random.randrange(self._grid_size), y=random.randrange(self._grid_size))
-      if all(segment.x != candidate.x or segment.y != candidate.y for segment in snake):
-        return candidate
-    return Point(x=0, y=0)
+  def _spawn(self, state: SpectatorState, index: int) -> None:
+    for cell in state.body:
+      state.release(cell)
+    state.body.clear()
+    start = (index + 2) % self._grid_size
+    for offset in range(3):
+      cell = self._pack(self._wrap(start - offset), start)
+      state.body.append(cell)
+      state.occupy(cell)
+    state.food = state.free.choice(self._random)
 
   def _wrap(self, coord: int) -> int:
     return coord % self._grid_size
 
+  def _respawn(self, state: SpectatorState) -> None:
+    # Respawn to keep stream lively.
+    self._spawn(state, 0)
+    state.score = 0
+
   def tick(self) -> None:
-    directions = [(1, 0), (-1, 0), (0, 1), (0, -1)]
+    grid = self._grid_size
     for state in self._states:
-      dx, dy = random.choice(directions)
-      head = state.snake[0]
-      next_head = Point(x=head.x + dx, y=head.y + dy)
+      dx, dy = self._random.choice(DIRECTIONS)
+      head_y, head_x = divmod(state.body[0], grid)
+      x, y = head_x + dx, head_y + dy
       if state.mode == "pass-through":
-        next_head = Point(x=self._wrap(next_head.x), y=self._wrap(next_head.y))
-      else:
-        if next_head.x < 0 or next_head.x >= state.grid_size or next_head.y < 0 or next_head.y >= state.grid_size:
-          # Respawn on wall collision to keep stream lively.
-          state.snake = self._initial_state(0, state.player).snake
-          state.food = self._random_food(state.snake)
-          state.score = 0
-          continue
+        x, y = x % grid, y % grid
+      elif x < 0 or x >= grid or y < 0 or y >= grid:
+        self._respawn(state)
+        continue
 
-      ate_food = next_head.x == state.food.x and next_head.y == state.food.y
+      next_head = y * grid + x
+      ate_food = next_head == state.food
+      if not ate_food:
+        state.release(state.body.pop())
+      state.body.appendleft(next_head)
+      state.occupy(next_head)
       if ate_food:
-        state.snake = [next_head] + state.snake
         state.score += 1
-        state.food = self._random_food(state.snake)
-      else:
-        state.snake = [next_head] + state.snake[:-1]
+        if not state.free:
+          # The snake fills the board; start a fresh round.
+          self._respawn(state)
+          continue
+        state.food = state.free.choice(self._random)
 
   def snapshots(self) -> List[SpectatorSnapshot]:
     now_ms = int(time.time() * 1000)
+    grid = self._grid_size
+    # Engine state is trusted, so models are built without re-validation.
     return [
-      SpectatorSnapshot(
+      SpectatorSnapshot.model_construct(
         id=state.id,
         player=state.player,
         mode=state.mode,
-        snake=state.snake,
-        food=state.food,
+        snake=[Point.model_construct(x=cell % grid, y=cell // grid) for cell in state.body],
+        food=Point.model_construct(x=state.food % grid, y=state.food // grid),
         score=state.score,
         gridSize=state.grid_size,
         updatedAt=now_ms,
       )
       for state in self._states
     ]
+
+
+def default_players(games: int) -> List[str]:
+  if games <= len(DEFAULT_PLAYERS):
+    return list(DEFAULT_PLAYERS[:games])
+  return [f"{DEFAULT_PLAYERS[index % len(DEFAULT_PLAYERS)]}-{index}" for index in range(games)]
+
+
+def build_spectator_engine(
+  kind: str = SPECTATOR_ENGINE,
+  games: int = SPECTATOR_GAMES,
+  seed: int | None = SPECTATOR_SEED,
+) -> SpectatorEngine | BatchSpectatorEngine:
+  players = default_players(games)
+  if kind == "batch":
+    return BatchSpectatorEngine(games, players=players, seed=seed)
+  if kind != "loop":
+    raise ValueError(f"Unknown spectator engine: {kind}")
+  return SpectatorEngine(players=players, seed=seed)
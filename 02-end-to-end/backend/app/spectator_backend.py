@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import fcntl
+import logging
+import os
+import struct
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Protocol, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SPECTATOR_BACKEND = os.getenv("SPECTATOR_BACKEND", "local")
+SPECTATOR_SOCKET_PATH = os.getenv("SPECTATOR_SOCKET_PATH", str(Path(tempfile.gettempdir()) / "snake_ops_spectator.sock"))
+SPECTATOR_LOCK_PATH = os.getenv("SPECTATOR_LOCK_PATH", SPECTATOR_SOCKET_PATH + ".lock")
+SPECTATOR_REDIS_URL = os.getenv("SPECTATOR_REDIS_URL", "redis://localhost:6379/0")
+SPECTATOR_LEASE_SECONDS = float(os.getenv("SPECTATOR_LEASE_SECONDS", "5"))
+# A follower that lets this much frame data pile up is dropped rather than buffered forever.
+MAX_FOLLOWER_BACKLOG = 4 * 1024 * 1024
+_LENGTH = struct.Struct(">I")
+
+OnMessage = Callable[[bytes], None]
+
+
+class SpectatorBackend(Protocol):
+  """
+  How spectator frames are shared between workers.
+
+  Exactly one worker should report `is_producer` at a time; it ticks the engine and calls
+  `publish` with each encoded frame. Every other worker receives those bytes through the
+  `on_message` callback given to `start` and never ticks its own engine.
+  """
+
+  @property
+  def is_producer(self) -> bool: ...
+
+  def start(self, on_message: OnMessage) -> None: ...
+
+  async def publish(self, data: bytes) -> None: ...
+
+  async def stop(self) -> None: ...
+
+  def stats(self) -> Dict[str, object]: ...
+
+
+class LocalBackend:
+  """Single-process default: always the producer, nothing to share."""
+
+  is_producer = True
+
+  def start(self, on_message: OnMessage) -> None:
+    pass
+
+  async def publish(self, data: bytes) -> None:
+    pass
+
+  async def stop(self) -> None:
+    pass
+
+  def stats(self) -> Dict[str, object]:
+    return {"backend": "local", "producer": True}
+
+
+class SocketBackend:
+  """
+  Workers on one host elect a producer with `flock` on `lock_path`.
+
+  The producer serves frames on a Unix socket; followers connect and read length-prefixed
+  frames. The kernel drops the lock when the producer exits, so when a follower loses its
+  connection it tries the lock again and the first to get it takes over.
+  """
+
+  def __init__(self, socket_path: str = SPECTATOR_SOCKET_PATH, lock_path: str = SPECTATOR_LOCK_PATH, retry_interval: float = 0.5) -> None:
+    self.socket_path = socket_path
+    self.lock_path = lock_path
+    self.retry_interval = retry_interval
+    self._lock_fd: int | None = None
+    self._followers: Set[asyncio.StreamWriter] = set()
+    self._latest: bytes | None = None
+    self._task: asyncio.Task | None = None
+    self._server: asyncio.AbstractServer | None = None
+    self.elections_won = 0
+    self.followers_dropped = 0
+
+  @property
+  def is_producer(self) -> bool:
+    return self._server is not None
+
+  def start(self, on_message: OnMessage) -> None:
+    if self._task is None or self._task.done():
+      self._task = asyncio.create_task(self._run(on_message))
+
+  def _try_lock(self) -> bool:
+    fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+      fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      os.close(fd)
+      return False
+    self._lock_fd = fd
+    return True
+
+  async def _run(self, on_message: OnMessage) -> None:
+    while True:
+      if self._try_lock():
+        await self._serve()
+        return
+      await self._follow(on_message)
+      await asyncio.sleep(self.retry_interval)
+
+  async def _serve(self) -> None:
+    with contextlib.suppress(FileNotFoundError):
+      os.unlink(self.socket_path)
+    self._server = await asyncio.start_unix_server(self._accept, path=self.socket_path)
+    self.elections_won += 1
+    logger.info("Spectator producer elected; serving frames on %s", self.socket_path)
+
+  async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    if self._latest is not None:
+      writer.write(self._latest)
+    self._followers.add(writer)
+    try:
+      await reader.read()
+    finally:
+      self._followers.discard(writer)
+      writer.close()
+
+  async def _follow(self, on_message: OnMessage) -> None:
+    try:
+      reader, writer = await asyncio.open_unix_connection(self.socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+      return
+    try:
+      while True:
+        (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+        on_message(await reader.readexactly(length))
+    except (asyncio.IncompleteReadError, ConnectionResetError):
+      logger.info("Lost spectator producer at %s; re-running election", self.socket_path)
+    finally:
+      writer.close()
+
+  async def publish(self, data: bytes) -> None:
+    message = _LENGTH.pack(len(data)) + data
+    self._latest = message
+    for writer in list(self._followers):
+      if writer.transport.get_write_buffer_size() > MAX_FOLLOWER_BACKLOG:
+        # Never block the producer on a stuck worker; it reconnects and resyncs from a keyframe.
+        self.followers_dropped += 1
+        self._followers.discard(writer)
+        writer.close()
+        continue
+      writer.write(message)
+
+  async def stop(self) -> None:
+    if self._task is not None:
+      self._task.cancel()
+      with contextlib.suppress(asyncio.CancelledError):
+        await self._task
+      self._task = None
+    if self._server is not None:
+      self._server.close()
+      for writer in list(self._followers):
+        writer.close()
+      self._followers.clear()
+      self._server = None
+      with contextlib.suppress(FileNotFoundError):
+        os.unlink(self.socket_path)
+    if self._lock_fd is not None:
+      os.close(self._lock_fd)
+      self._lock_fd = None
+
+  def stats(self) -> Dict[str, object]:
+    return {
+      "backend": "socket",
+      "producer": self.is_producer,
+      "followers": len(self._followers),
+      "followersDropped": self.followers_dropped,
+      "electionsWon": self.elections_won,
+    }
+
+
+class Broker(Protocol):
+  """The subset of a Redis-like server the broker backend needs: pub/sub plus an expiring lease."""
+
+  async def publish(self, channel: str, message: bytes) -> None: ...
+
+  def subscribe(self, channel: str) -> AsyncIterator[bytes]: ...
+
+  async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+    """Take `key` if free or expired, or extend it if `owner` already holds it."""
+    ...
+
+
+class InMemoryBroker:
+  """Process-local stand-in for a Redis broker, so the broker backend can be tested without one."""
+
+  def __init__(self) -> None:
+    self._leases: Dict[str, Tuple[str, float]] = {}
+    self._channels: Dict[str, Set[asyncio.Queue[bytes]]] = {}
+
+  async def publish(self, channel: str, message: bytes) -> None:
+    for queue in list(self._channels.get(channel, ())):
+      queue.put_nowait(message)
+
+  async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+    queue: asyncio.Queue[bytes] = asyncio.Queue()
+    self._channels.setdefault(channel, set()).add(queue)
+    try:
+      while True:
+        yield await queue.get()
+    finally:
+      self._channels[channel].discard(queue)
+
+  async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+    now = time.monotonic()
+    holder = self._leases.get(key)
+    if holder is None or holder[0] == owner or holder[1] <= now:
+      self._leases[key] = (owner, now + ttl)
+      return True
+    return False
+
+  def expire(self, key: str) -> None:
+    self._leases.pop(key, None)
+
+
+class RedisBroker:
+  """`Broker` on Redis pub/sub; needs the optional `redis` extra."""
+
+  # Extend the lease only if we still own it, atomically.
+  _REFRESH = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+
+  def __init__(self, url: str = SPECTATOR_REDIS_URL) -> None:
+    import redis.asyncio as redis
+
+    self._client = redis.from_url(url)
+
+  async def publish(self, channel: str, message: bytes) -> None:
+    await self._client.publish(channel, message)
+
+  async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+    pubsub = self._client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+      async for message in pubsub.listen():
+        if message["type"] == "message":
+          yield message["data"]
+    finally:
+      await pubsub.unsubscribe(channel)
+      await pubsub.aclose()
+
+  async def acquire_lease(self, key: str, owner: str, ttl: float) -> bool:
+    ttl_ms = int(ttl * 1000)
+    if await self._client.set(key, owner, nx=True, px=ttl_ms):
+      return True
+    return bool(await self._client.eval(self._REFRESH, 1, key, owner, ttl_ms))
+
+
+class BrokerBackend:
+  """
+  Producer election by lease and frame fan-out by pub/sub on a `Broker`.
+
+  Every worker renews or contests the lease every third of `lease_seconds`; whoever holds it
+  produces. A dead producer stops renewing and another worker takes over within one lease.
+  """
+
+  def __init__(
+    self,
+    broker: Broker,
+    channel: str = "spectator:frames",
+    lease_key: str = "spectator:producer",
+    lease_seconds: float = SPECTATOR_LEASE_SECONDS,
+  ) -> None:
+    self.broker = broker
+    self.channel = channel
+    self.lease_key = lease_key
+    self.lease_seconds = lease_seconds
+    self.owner = uuid.uuid4().hex
+    self._producer = False
+    self._tasks: list[asyncio.Task] = []
+    self.published = 0
+
+  @property
+  def is_producer(self) -> bool:
+    return self._producer
+
+  def start(self, on_message: OnMessage) -> None:
+    if not self._tasks:
+      self._tasks = [asyncio.create_task(self._campaign()), asyncio.create_task(self._listen(on_message))]
+
+  async def _campaign(self) -> None:
+    while True:
+      try:
+        self._producer = await self.broker.acquire_lease(self.lease_key, self.owner, self.lease_seconds)
+      except Exception:
+        logger.exception("Spectator lease renewal failed")
+        self._producer = False
+      await asyncio.sleep(self.lease_seconds / 3)
+
+  async def _listen(self, on_message: OnMessage) -> None:
+    while True:
+      try:
+        async for message in self.broker.subscribe(self.channel):
+          if not self._producer:
+            on_message(message)
+      except Exception:
+        logger.exception("Spectator subscription failed; resubscribing")
+        await asyncio.sleep(1)
+
+  async def publish(self, data: bytes) -> None:
+    await self.broker.publish(self.channel, data)
+    self.published += 1
+
+  async def stop(self) -> None:
+    for task in self._tasks:
+      task.cancel()
+      with contextlib.suppress(asyncio.CancelledError):
+        await task
+    self._tasks = []
+    self._producer = False
+
+  def stats(self) -> Dict[str, object]:
+    return {"backend": "broker", "producer": self._producer, "published": self.published}
+
+
+def build_spectator_backend(kind: str = SPECTATOR_BACKEND) -> SpectatorBackend:
+  if kind == "local":
+    return LocalBackend()
+  if kind == "socket":
+    return SocketBackend()
+  if kind == "redis":
+    return BrokerBackend(RedisBroker())
+  raise ValueError(f"Unknown SPECTATOR_BACKEND {kind!r}; expected local, socket or redis")
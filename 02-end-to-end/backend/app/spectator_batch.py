@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import time
+from typing import List, Sequence
+
+try:
+  import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+  np = None
+
+from app.schemas import GameMode, Point, SpectatorSnapshot
+
+DX = (1, -1, 0, 0)
+DY = (0, 0, 1, -1)
+FOOD_ATTEMPTS = 8
+
+
+class BatchSpectatorEngine:
+  """
+  Spectator engine that holds every game in NumPy arrays and advances them in one step.
+
+  Same rules and interface as `SpectatorEngine`; snakes live in a per-game ring buffer of
+  packed cells with an occupancy count matrix so food placement only ever lands on free cells.
+  """
+
+  def __init__(self, games: int, grid_size: int = 12, players: Sequence[str] | None = None, seed: int | None = None) -> None:
+    if np is None:
+      raise RuntimeError("BatchSpectatorEngine requires numpy; install the 'batch' extra")
+    self._games = games
+    self._grid_size = grid_size
+    self._cells = grid_size * grid_size
+    self._capacity = self._cells + 1
+    self._players = tuple(players) if players is not None else tuple(f"bot-{index}" for index in range(games))
+    self._seed = seed
+    self._rng = np.random.default_rng(seed)
+    self._dx = np.array(DX, dtype=np.int32)
+    self._dy = np.array(DY, dtype=np.int32)
+
+    self.walls = np.arange(games) % 2 == 0
+    self.body = np.zeros((games, self._capacity), dtype=np.int32)
+    self.head_slot = np.zeros(games, dtype=np.int32)
+    self.lengths = np.zeros(games, dtype=np.int32)
+    self.heads = np.zeros(games, dtype=np.int32)
+    self.directions = np.zeros(games, dtype=np.int8)
+    self.food = np.zeros(games, dtype=np.int32)
+    self.scores = self._rng.integers(0, 13, games, dtype=np.int32)
+    self.occupancy = np.zeros((games, self._cells), dtype=np.uint16)
+
+    rows = np.arange(games)
+    self._spawn(rows, (rows + 2) % grid_size)
+
+  def reset(self) -> None:
+    self.__init__(self._games, grid_size=self._grid_size, players=self._players, seed=self._seed)
+
+  def _spawn(self, rows, starts) -> None:
+    grid = self._grid_size
+    self.occupancy[rows] = 0
+    self.lengths[rows] = 3
+    self.head_slot[rows] = 2
+    for offset in range(3):
+      cells = starts * grid + (starts - offset) % grid
+      self.body[rows, 2 - offset] = cells
+      self.occupancy[rows, cells] += 1
+    self.heads[rows] = self.body[rows, 2]
+    self._place_food(rows)
+
+  def _place_food(self, rows) -> None:
+    candidates = self._rng.integers(0, self._cells, len(rows))
+    pending = np.arange(len(rows))
+    for _ in range(FOOD_ATTEMPTS):
+      taken = self.occupancy[rows[pending], candidates[pending]] > 0
+      pending = pending[taken]
+      if not len(pending):
+        break
+      candidates[pending] = self._rng.integers(0, self._cells, len(pending))
+    if len(pending):
+      # Crowded boards: pick uniformly among the remaining free cells.
+      free = self.occupancy[rows[pending]] == 0
+      weights = self._rng.random(free.shape) * free
+      candidates[pending] = weights.argmax(axis=1)
+      full = ~free.any(axis=1)
+      if full.any():
+        # The snake fills the board; start a fresh round.
+        full_rows = rows[pending[full]]
+        self.scores[full_rows] = 0
+        self._spawn(full_rows, np.full(len(full_rows), 2 % self._grid_size))
+        candidates[pending[full]] = self.food[full_rows]
+    self.food[rows] = candidates
+
+  def tick(self) -> None:
+    grid = self._grid_size
+    self.directions = self._rng.integers(0, 4, self._games, dtype=np.int8)
+    x = self.heads % grid + self._dx[self.directions]
+    y = self.heads // grid + self._dy[self.directions]
+    outside = (x < 0) | (x >= grid) | (y < 0) | (y >= grid)
+    crashed = outside & self.walls
+    next_heads = (y % grid) * grid + x % grid
+
+    alive = np.flatnonzero(~crashed)
+    ate = next_heads[alive] == self.food[alive]
+
+    movers = alive[~ate]
+    tail_slots = (self.head_slot[movers] - self.lengths[movers] + 1) % self._capacity
+    self.occupancy[movers, self.body[movers, tail_slots]] -= 1
+
+    slots = (self.head_slot[alive] + 1) % self._capacity
+    self.head_slot[alive] = slots
+    self.body[alive, slots] = next_heads[alive]
+    self.occupancy[alive, next_heads[alive]] += 1
+    self.heads[alive] = next_heads[alive]
+
+    eaters = alive[ate]
+    self.lengths[eaters] += 1
+    self.scores[eaters] += 1
+    # Self-overlapping snakes can outgrow the ring buffer; treat that like a full board.
+    overgrown = self.lengths[eaters] >= self._capacity
+    if len(eaters):
+      self._place_food(eaters[~overgrown])
+
+    respawns = np.concatenate([np.flatnonzero(crashed), eaters[overgrown]])
+    if len(respawns):
+      self.scores[respawns] = 0
+      self._spawn(respawns, np.full(len(respawns), 2 % grid))
+
+  def snapshots(self) -> List[SpectatorSnapshot]:
+    now_ms = int(time.time() * 1000)
+    grid = self._grid_size
+    snapshots = []
+    for index in range(self._games):
+      length = int(self.lengths[index])
+      slots = (self.head_slot[index] - np.arange(length)) % self._capacity
+      cells = self.body[index, slots].tolist()
+      food = int(self.food[index])
+      mode: GameMode = "walls" if self.walls[index] else "pass-through"
+      snapshots.append(
+        SpectatorSnapshot.model_construct(
+          id=f"spectator-{index}",
+          player=self._players[index % len(self._players)],
+          mode=mode,
+          snake=[Point.model_construct(x=cell % grid, y=cell // grid) for cell in cells],
+          food=Point.model_construct(x=food % grid, y=food // grid),
+          score=int(self.scores[index]),
+          gridSize=grid,
+          updatedAt=now_ms,
+        )
+      )
+    return snapshots
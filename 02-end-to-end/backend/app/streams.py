@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import Counter as Tally
+from collections import deque
+from typing import Callable, Deque, Dict
+
+from fastapi.responses import StreamingResponse
+
+from app.broadcast import Frame, SpectatorBroadcaster
+from app.metrics import metrics
+
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "10000"))
+SSE_MAX_PER_CLIENT = int(os.getenv("SSE_MAX_PER_CLIENT", "20"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_MAX_BUFFER_BYTES = int(os.getenv("SSE_MAX_BUFFER_BYTES", str(256 * 1024)))
+SSE_SEND_TIMEOUT = float(os.getenv("SSE_SEND_TIMEOUT", "10"))
+SSE_RETRY_AFTER = os.getenv("SSE_RETRY_AFTER", "5")
+HEARTBEAT_EVENT = b": keepalive\n\n"
+
+REJECTED = metrics.counter("stream_rejected_total", "Stream connections refused by a cap.", ("reason",))
+EVICTED = metrics.counter("stream_evicted_total", "Stream connections closed for falling behind.", ("reason",))
+
+
+class StreamRejected(RuntimeError):
+  """Raised by `StreamManager.open` when a connection cap is reached."""
+
+
+class FrameOutbox:
+  """
+  Frames waiting to be written to one viewer, bounded by encoded size rather than count.
+
+  Once more than `max_bytes` are pending the outbox marks itself overflowed and stops taking
+  frames, so a reader that cannot keep up costs at most one buffer before it is evicted.
+  A single frame is always accepted, however large. It has the slice of the `asyncio.Queue`
+  interface the broadcaster uses, with one reader and a fraction of a queue's footprint.
+  """
+
+  __slots__ = ("cost", "max_bytes", "pending_bytes", "overflowed", "_frames", "_waiter")
+
+  def __init__(self, cost: Callable[[Frame], int], max_bytes: int) -> None:
+    self.cost = cost
+    self.max_bytes = max_bytes
+    self.pending_bytes = 0
+    self.overflowed = False
+    self._frames: Deque[Frame | None] = deque()
+    self._waiter: asyncio.Future | None = None
+
+  def qsize(self) -> int:
+    return len(self._frames)
+
+  def empty(self) -> bool:
+    return not self._frames
+
+  def full(self) -> bool:
+    return False
+
+  def put_nowait(self, frame: Frame) -> None:
+    if self.overflowed:
+      return
+    size = self.cost(frame)
+    if self._frames and self.pending_bytes + size > self.max_bytes:
+      self.overflowed = True
+      self._frames.clear()
+      self.pending_bytes = 0
+      # Wake the reader so it can notice the eviction instead of waiting for a heartbeat.
+      self._frames.append(None)
+    else:
+      self.pending_bytes += size
+      self._frames.append(frame)
+    if self._waiter is not None and not self._waiter.done():
+      self._waiter.set_result(None)
+
+  def get_nowait(self) -> Frame | None:
+    if not self._frames:
+      raise asyncio.QueueEmpty
+    frame = self._frames.popleft()
+    if frame is not None:
+      self.pending_bytes -= self.cost(frame)
+    return frame
+
+  async def get(self) -> Frame | None:
+    while not self._frames:
+      self._waiter = asyncio.get_running_loop().create_future()
+      try:
+        await self._waiter
+      finally:
+        self._waiter = None
+    return self.get_nowait()
+
+
+class StreamConnection:
+  __slots__ = ("client", "outbox", "evicted")
+
+  def __init__(self, client: str, outbox: FrameOutbox) -> None:
+    self.client = client
+    self.outbox = outbox
+    self.evicted: str | None = None
+
+  async def next_frame(self, timeout: float) -> Frame | None:
+    """The next frame, or None when `timeout` passes first or the viewer has been evicted."""
+    try:
+      frame = await asyncio.wait_for(self.outbox.get(), timeout)
+    except TimeoutError:
+      return None
+    if frame is None and self.evicted is None:
+      self.evicted = "buffer"
+    return frame
+
+
+class StreamManager:
+  """
+  Tracks spectator stream connections on this worker and enforces their limits.
+
+  `open` refuses connections beyond `max_connections` per worker or `max_per_client` per
+  client address. Each connection gets a `FrameOutbox` subscribed to the broadcaster;
+  viewers that let more than `max_buffer_bytes` pile up, or whose writes stall for
+  `send_timeout`, are evicted. Idle streams get a comment every `heartbeat_seconds`, which
+  is also how dead clients are noticed between frames.
+  """
+
+  def __init__(
+    self,
+    broadcaster: SpectatorBroadcaster,
+    max_connections: int = SSE_MAX_CONNECTIONS,
+    max_per_client: int = SSE_MAX_PER_CLIENT,
+    heartbeat_seconds: float = SSE_HEARTBEAT_SECONDS,
+    max_buffer_bytes: int = SSE_MAX_BUFFER_BYTES,
+    send_timeout: float = SSE_SEND_TIMEOUT,
+  ) -> None:
+    self.broadcaster = broadcaster
+    self.max_connections = max_connections
+    self.max_per_client = max_per_client
+    self.heartbeat_seconds = heartbeat_seconds
+    self.max_buffer_bytes = max_buffer_bytes
+    self.send_timeout = send_timeout
+    self._per_client: Tally[str] = Tally()
+    self.connections = 0
+    self.opened = 0
+    self.heartbeats = 0
+    self.rejected: Tally[str] = Tally()
+    self.evicted: Tally[str] = Tally()
+
+  def reset(self) -> None:
+    self.heartbeats = 0
+    self.rejected.clear()
+    self.evicted.clear()
+
+  def open(self, client: str, cost: Callable[[Frame], int]) -> StreamConnection:
+    if self.connections >= self.max_connections:
+      self._reject("worker")
+      raise StreamRejected("Too many spectators on this server, retry shortly")
+    if self._per_client[client] >= self.max_per_client:
+      self._reject("client")
+      raise StreamRejected("Too many spectator streams from this client")
+    outbox = FrameOutbox(cost, self.max_buffer_bytes)
+    self.broadcaster.subscribe(outbox)
+    self.connections += 1
+    self.opened += 1
+    self._per_client[client] += 1
+    return StreamConnection(client, outbox)
+
+  def close(self, connection: StreamConnection) -> None:
+    self.broadcaster.unsubscribe(connection.outbox)
+    self.connections -= 1
+    self._per_client[connection.client] -= 1
+    if self._per_client[connection.client] <= 0:
+      del self._per_client[connection.client]
+    if connection.evicted is not None:
+      self.evicted[connection.evicted] += 1
+      EVICTED.inc(connection.evicted)
+
+  def _reject(self, reason: str) -> None:
+    self.rejected[reason] += 1
+    REJECTED.inc(reason)
+
+  def stats(self) -> Dict[str, object]:
+    return {
+      "connections": self.connections,
+      "clients": len(self._per_client),
+      "opened": self.opened,
+      "heartbeats": self.heartbeats,
+      "rejected": dict(self.rejected),
+      "evicted": dict(self.evicted),
+    }
+
+
+class ManagedStreamResponse(StreamingResponse):
+  """
+  `StreamingResponse` that bounds every write by the manager's `send_timeout` and releases the
+  connection however the stream ends, including when the body is never iterated.
+  """
+
+  def __init__(self, content, manager: StreamManager, connection: StreamConnection, media_type: str = "text/event-stream") -> None:
+    super().__init__(content, media_type=media_type, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    self.manager = manager
+    self.connection = connection
+
+  async def stream_response(self, send) -> None:
+    timeout = self.manager.send_timeout
+
+    async def bounded_send(message) -> None:
+      try:
+        await asyncio.wait_for(send(message), timeout)
+      except TimeoutError:
+        self.connection.evicted = "stalled"
+        raise
+
+    try:
+      await super().stream_response(bounded_send)
+    except TimeoutError:
+      # The client stopped reading; give up on it without a closing chunk it would never take.
+      return
+
+  async def __call__(self, scope, receive, send) -> None:
+    try:
+      await super().__call__(scope, receive, send)
+    finally:
+      self.manager.close(self.connection)
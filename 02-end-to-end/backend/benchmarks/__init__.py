@@ -0,0 +1 @@
+"""Snake Ops benchmark scripts."""
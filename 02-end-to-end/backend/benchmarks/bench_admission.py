@@ -0,0 +1,93 @@
+"""
+Latency of a well-behaved player while another client floods the score endpoints.
+
+    uv run python -m benchmarks.bench_admission --seconds 5 --flooders 64
+
+The flooder posts `/scores/batch` from one address with `--flooders` requests in flight. A
+second address submits one `/scores` every `--interval` seconds. Runs with admission
+control off and on and reports the player's latency and both clients' status codes.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.bench_leaderboard import percentile
+
+
+async def drive(app, headers: dict[str, str], seconds: float, flooders: int, interval: float) -> tuple[list[float], Counter, Counter]:
+  import httpx
+
+  flood_statuses: Counter = Counter()
+  player_statuses: Counter = Counter()
+  latencies: list[float] = []
+  deadline = time.perf_counter() + seconds
+  batch = {"scores": [{"username": "flood", "score": index, "mode": "walls"} for index in range(100)]}
+
+  flood_transport = httpx.ASGITransport(app=app, client=("10.0.0.1", 40000))
+  player_transport = httpx.ASGITransport(app=app, client=("10.0.0.2", 40000))
+  async with (
+    httpx.AsyncClient(transport=flood_transport, base_url="http://bench") as flood_client,
+    httpx.AsyncClient(transport=player_transport, base_url="http://bench") as player_client,
+  ):
+
+    async def flood() -> None:
+      while time.perf_counter() < deadline:
+        response = await flood_client.post("/scores/batch", json=batch, headers=headers["flood"])
+        flood_statuses[response.status_code] += 1
+        if response.status_code != 200:
+          # A client that ignores Retry-After but does not spin the loop either.
+          await asyncio.sleep(0.01)
+
+    async def play() -> None:
+      index = 0
+      while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await player_client.post(
+          "/scores", json={"username": "player", "score": index % 50, "mode": "walls"}, headers=headers["player"]
+        )
+        latencies.append((time.perf_counter() - started) * 1000)
+        player_statuses[response.status_code] += 1
+        index += 1
+        await asyncio.sleep(interval)
+
+    await asyncio.gather(play(), *(flood() for _ in range(flooders)))
+  return latencies, player_statuses, flood_statuses
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--seconds", type=float, default=5)
+  parser.add_argument("--flooders", type=int, default=64)
+  parser.add_argument("--interval", type=float, default=0.2)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+    from app.main import admission, app, database, db_executor
+    from app.passwords import hash_password
+
+    database.reset()
+    headers = {
+      name: {"Authorization": f"Bearer {database.sign_up(name, hash_password('pw')).token}"} for name in ("flood", "player")
+    }
+
+    for label, enabled in (("admission off", False), ("admission on", True)):
+      admission.enabled = enabled
+      admission.reset()
+      latencies, player, flood = asyncio.run(drive(app, headers, args.seconds, args.flooders, args.interval))
+      print(
+        f"{label:>14}: player p50 {percentile(latencies, 50):8.2f} ms  p95 {percentile(latencies, 95):8.2f} ms"
+        f"  player {dict(player)}  flooder {dict(flood)}"
+      )
+    db_executor.shutdown()
+    database.engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
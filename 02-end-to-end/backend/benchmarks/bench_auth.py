@@ -0,0 +1,59 @@
+"""
+Authenticated POST /scores throughput with the session validation cache on and off.
+
+    uv run python -m benchmarks.bench_auth --requests 2000 --concurrency 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+
+async def drive(app, headers: dict[str, str], requests: int, concurrency: int) -> float:
+  import httpx
+
+  semaphore = asyncio.Semaphore(concurrency)
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+    async def submit(index: int) -> None:
+      async with semaphore:
+        response = await client.post(
+          "/scores", json={"username": "bench", "score": index % 50, "mode": "walls"}, headers=headers
+        )
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(submit(index) for index in range(requests)))
+    return requests / (time.perf_counter() - started)
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--requests", type=int, default=2000)
+  parser.add_argument("--concurrency", type=int, default=32)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+    from app.cache import SessionCache
+    from app.db import SESSION_CACHE_SIZE, SESSION_CACHE_TTL
+    from app.main import app, database
+
+    database.reset()
+    token = database.sign_up("bench", "pw").token
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for label, size in (("cache on", SESSION_CACHE_SIZE), ("cache off", 0)):
+      database.session_cache = SessionCache(size, SESSION_CACHE_TTL)
+      throughput = asyncio.run(drive(app, headers, args.requests, args.concurrency))
+      print(f"{label:>10}: {throughput:8.1f} req/s  ({database.session_cache.stats()})")
+    database.engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
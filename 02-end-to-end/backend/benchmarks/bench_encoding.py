@@ -0,0 +1,129 @@
+"""
+Per-endpoint response serialization time: FastAPI's response_model path versus app.encoding.
+
+    uv run python -m benchmarks.bench_encoding --iterations 20000
+
+`validate+dict` is FastAPI re-validating the returned value against `response_model`, then
+`JSONResponse` running `json.dumps` on the dict. `validate+json` is the same validation with
+FastAPI's newer `dump_json` fast path. `encoded` is `app.encoding.dump_json` on the value as
+returned. The spectator frame and leaderboard page rows compare the old
+`json.dumps(model_dump())` encoding of the broadcaster and leaderboard cache.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from app.encoding import dump_json
+from app.main import app
+from app.schemas import (
+  LeaderboardEntry,
+  LiveIngestResult,
+  RankedLeaderboardEntry,
+  ScoreBatchResult,
+  Session,
+  SpectatorSnapshot,
+  UserProfile,
+)
+from app.spectator import SpectatorEngine
+from benchmarks.bench_leaderboard import percentile
+
+
+def _ranked(rank: int) -> RankedLeaderboardEntry:
+  return RankedLeaderboardEntry(
+    player=f"player{rank}",
+    bestScore=10_000 - rank,
+    totalRuns=rank * 3,
+    modeBreakdown={"walls": rank, "pass-through": rank * 2},
+    rank=rank,
+  )
+
+
+def _route(path: str, method: str) -> APIRoute:
+  return next(route for route in app.routes if isinstance(route, APIRoute) and route.path == path and method in route.methods)
+
+
+def _fastapi_paths(path: str, method: str, value: Any) -> Dict[str, Callable[[], bytes]]:
+  field = _route(path, method).response_field
+
+  def legacy() -> bytes:
+    validated, _ = field.validate(value, {}, loc=("response",))
+    return JSONResponse(field.serialize(validated)).body
+
+  paths = {"validate+dict": legacy}
+  if hasattr(field, "serialize_json"):
+
+    def fast() -> bytes:
+      validated, _ = field.validate(value, {}, loc=("response",))
+      return field.serialize_json(validated)
+
+    paths["validate+json"] = fast
+  return paths
+
+
+def _cases(games: int) -> Dict[str, Dict[str, Callable[[], bytes]]]:
+  session = Session(token="session-0f8e5c1a", user=UserProfile(id="user-1", username="nova"))
+  around = [_ranked(rank) for rank in range(1, 12)]
+  batch = ScoreBatchResult(accepted=998, unknownPlayers=["ghost", "phantom"])
+  live = LiveIngestResult(accepted=120, throttled=4, rejected=1)
+  page = [LeaderboardEntry(**_ranked(rank).model_dump(exclude={"rank"})) for rank in range(1, 51)]
+  engine = SpectatorEngine(players=[f"bot{index}" for index in range(games)], seed=1)
+  for _ in range(20):
+    engine.tick()
+  snapshots = engine.snapshots()
+
+  endpoint_cases = {
+    "POST /auth/login": ("/auth/login", "POST", session, Session),
+    "GET /leaderboard/rank": ("/leaderboard/rank/{player}", "GET", around[0], RankedLeaderboardEntry),
+    "GET /leaderboard/around": ("/leaderboard/around/{player}", "GET", around, list[RankedLeaderboardEntry]),
+    "POST /scores/batch": ("/scores/batch", "POST", batch, ScoreBatchResult),
+    "POST /spectator/live": ("/spectator/live", "POST", live, LiveIngestResult),
+  }
+  cases = {}
+  for name, (path, method, value, type_) in endpoint_cases.items():
+    cases[name] = {**_fastapi_paths(path, method, value), "encoded": lambda type_=type_, value=value: dump_json(type_, value)}
+  cases["leaderboard page (50)"] = {
+    "json.dumps": lambda: json.dumps([entry.model_dump() for entry in page]).encode(),
+    "encoded": lambda: dump_json(List[LeaderboardEntry], page),
+  }
+  cases[f"spectator frame ({games})"] = {
+    "json.dumps": lambda: json.dumps([snapshot.model_dump() for snapshot in snapshots]).encode(),
+    "encoded": lambda: dump_json(List[SpectatorSnapshot], snapshots),
+  }
+  return cases
+
+
+def measure_us(fn: Callable[[], bytes], iterations: int) -> List[float]:
+  fn()
+  samples = []
+  for _ in range(iterations):
+    started = time.perf_counter()
+    fn()
+    samples.append((time.perf_counter() - started) * 1_000_000)
+  return samples
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--iterations", type=int, default=5000)
+  parser.add_argument("--games", type=int, default=100)
+  args = parser.parse_args()
+
+  print(f"{'case':<28} {'path':<14} {'p50 us':>10} {'p99 us':>10} {'speedup':>8}")
+  for case, paths in _cases(args.games).items():
+    medians = {}
+    for path, fn in paths.items():
+      samples = measure_us(fn, args.iterations)
+      medians[path] = statistics.median(samples)
+      speedup = next(iter(medians.values())) / medians[path]
+      print(f"{case:<28} {path:<14} {medians[path]:>10.2f} {percentile(samples, 99):>10.2f} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+  main()
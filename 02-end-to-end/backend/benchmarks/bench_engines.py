@@ -0,0 +1,135 @@
+"""
+Mixed POST /scores and GET /leaderboard load against each engine profile.
+
+Each configuration runs in a fresh interpreter because engines are built at import time from
+DB_PROFILE / DATABASE_URL / DATABASE_READ_URL. The leaderboard cache is disabled so every
+read reaches the database.
+
+    uv run python -m benchmarks.bench_engines --players 2000 --requests 3000 --concurrency 32
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.bench_leaderboard import percentile
+
+CONFIGS = {
+  "basic": {"DB_PROFILE": "basic"},
+  "tuned": {"DB_PROFILE": "tuned"},
+  "tuned+read": {"DB_PROFILE": "tuned", "read_engine": "1"},
+}
+
+
+async def drive(app, headers: dict[str, str], requests: int, concurrency: int, write_ratio: float) -> dict:
+  import httpx
+
+  rng = random.Random(7)
+  semaphore = asyncio.Semaphore(concurrency)
+  latencies: dict[str, list[float]] = {"scores": [], "leaderboard": []}
+  transport = httpx.ASGITransport(app=app)
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+    async def one(index: int) -> None:
+      write = rng.random() < write_ratio
+      async with semaphore:
+        started = time.perf_counter()
+        if write:
+          response = await client.post(
+            "/scores", json={"username": "bench", "score": index % 500, "mode": "walls"}, headers=headers
+          )
+        else:
+          response = await client.get("/leaderboard", params={"limit": 50})
+        response.raise_for_status()
+        latencies["scores" if write else "leaderboard"].append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(requests)))
+    elapsed = time.perf_counter() - started
+  return {
+    "reqPerSec": requests / elapsed,
+    **{
+      f"{route}P{pct}": percentile(samples, pct)
+      for route, samples in latencies.items()
+      for pct in (50, 95)
+      if samples
+    },
+  }
+
+
+def run_one(args: argparse.Namespace) -> None:
+  from app.db import User, session_scope
+  from app.executor import db_executor
+  from app.main import app, database
+
+  database.reset()
+  token = database.sign_up("bench", "pw").token
+  with session_scope(database._session_factory) as session:
+    session.add_all(
+      User(
+        id=f"bench-{index}",
+        username=f"player-{index}",
+        normalized_username=f"player-{index}",
+        password="pw",
+        best_score=index % 997,
+      )
+      for index in range(args.players)
+    )
+  result = asyncio.run(
+    drive(app, {"Authorization": f"Bearer {token}"}, args.requests, args.concurrency, args.write_ratio)
+  )
+  db_executor.shutdown()
+  print(json.dumps(result))
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--players", type=int, default=2000)
+  parser.add_argument("--requests", type=int, default=3000)
+  parser.add_argument("--concurrency", type=int, default=32)
+  parser.add_argument("--write-ratio", type=float, default=0.2)
+  parser.add_argument("--configs", nargs="+", default=list(CONFIGS), choices=list(CONFIGS))
+  parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+  args = parser.parse_args()
+
+  if args.child:
+    run_one(args)
+    return
+
+  for name in args.configs:
+    with tempfile.TemporaryDirectory() as tmp:
+      path = Path(tmp) / "bench.db"
+      env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "LEADERBOARD_CACHE_TTL": "0"}
+      config = dict(CONFIGS[name])
+      env["DB_PROFILE"] = config.pop("DB_PROFILE")
+      if config.pop("read_engine", None):
+        env["DATABASE_READ_URL"] = f"sqlite:///file:{path}?mode=ro&uri=true"
+      argv = [
+        sys.executable,
+        "-m",
+        "benchmarks.bench_engines",
+        "--child",
+        "--players",
+        str(args.players),
+        "--requests",
+        str(args.requests),
+        "--concurrency",
+        str(args.concurrency),
+        "--write-ratio",
+        str(args.write_ratio),
+      ]
+      output = subprocess.run(argv, env=env, check=True, capture_output=True, text=True).stdout
+      result = json.loads(output.strip().splitlines()[-1])
+      print(f"{name:>11}: " + "  ".join(f"{key} {value:8.2f}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+  main()
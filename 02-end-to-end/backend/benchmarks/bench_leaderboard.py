@@ -0,0 +1,84 @@
+"""
+Leaderboard latency as the users table grows.
+
+    uv run python -m benchmarks.bench_leaderboard --sizes 1000 10000 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base, Database, User
+
+
+def percentile(samples: list[float], pct: float) -> float:
+  ordered = sorted(samples)
+  index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+  return ordered[index]
+
+
+def build_database(path: Path, size: int) -> Database:
+  engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, future=True)
+  Base.metadata.create_all(bind=engine)
+  batch = 50_000
+  with engine.begin() as conn:
+    for start in range(0, size, batch):
+      rows = [
+        {
+          "id": f"user-{index:08d}",
+          "username": f"player{index}",
+          "normalized_username": f"player{index}",
+          "password": "pw",
+          # Coarse scores so there are plenty of ties for the tie-breaker to resolve.
+          "best_score": (index * 7919) % 1000,
+          "total_runs": 1,
+          "pass_through_runs": 1,
+          "walls_runs": 0,
+        }
+        for index in range(start, min(size, start + batch))
+      ]
+      conn.execute(insert(User), rows)
+  session_factory = sessionmaker(bind=engine, autoflush=False, autocommit=False, expire_on_commit=False, future=True)
+  return Database(session_factory, engine)
+
+
+def measure(fn, iterations: int) -> list[float]:
+  samples = []
+  for _ in range(iterations):
+    started = time.perf_counter()
+    fn()
+    samples.append((time.perf_counter() - started) * 1000)
+  return samples
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+  parser.add_argument("--iterations", type=int, default=200)
+  parser.add_argument("--limit", type=int, default=50)
+  args = parser.parse_args()
+
+  print(f"{'users':>10} {'query':>12} {'p50 ms':>10} {'p99 ms':>10}")
+  with tempfile.TemporaryDirectory() as tmp:
+    for size in args.sizes:
+      database = build_database(Path(tmp) / f"bench-{size}.db", size)
+      first_page = database.leaderboard(limit=args.limit)
+      cursor = first_page[-1].player
+      scenarios = {
+        "top": lambda: database.leaderboard(limit=args.limit),
+        "next-page": lambda: database.leaderboard(limit=args.limit, after=cursor),
+      }
+      for name, fn in scenarios.items():
+        samples = measure(fn, args.iterations)
+        print(f"{size:>10} {name:>12} {statistics.median(samples):>10.3f} {percentile(samples, 99):>10.3f}")
+      database.engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,77 @@
+"""
+POST /scores latency while a login storm hammers the scrypt hash pool.
+
+    uv run python -m benchmarks.bench_login --logins 400 --scores 400
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from benchmarks.bench_leaderboard import percentile
+
+
+async def drive(app, headers: dict[str, str], logins: int, scores: int) -> tuple[list[float], Counter]:
+  import httpx
+
+  transport = httpx.ASGITransport(app=app)
+  latencies: list[float] = []
+  statuses: Counter = Counter()
+  async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+    async def login() -> None:
+      response = await client.post("/auth/login", json={"username": "bench", "password": "pw"})
+      statuses[response.status_code] += 1
+
+    async def submit(index: int) -> None:
+      started = time.perf_counter()
+      response = await client.post(
+        "/scores", json={"username": "bench", "score": index % 50, "mode": "walls"}, headers=headers
+      )
+      response.raise_for_status()
+      latencies.append((time.perf_counter() - started) * 1000)
+
+    async def scores_paced() -> None:
+      for index in range(scores):
+        await submit(index)
+
+    await asyncio.gather(scores_paced(), *(login() for _ in range(logins)))
+  return latencies, statuses
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--logins", type=int, default=400)
+  parser.add_argument("--scores", type=int, default=400)
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+    # Measures the hash pool on its own; bench_admission covers per-client limits.
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    from app.executor import hash_executor
+    from app.main import app, database
+    from app.passwords import hash_password
+
+    database.reset()
+    token = database.sign_up("bench", hash_password("pw")).token
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for label, logins in (("idle", 0), ("login storm", args.logins)):
+      latencies, statuses = asyncio.run(drive(app, headers, logins, args.scores))
+      print(
+        f"{label:>12}: scores p50 {percentile(latencies, 50):7.2f} ms  p95 {percentile(latencies, 95):7.2f} ms"
+        f"  logins {dict(statuses)}"
+      )
+    print(f"hash pool: {hash_executor.stats()}")
+    hash_executor.shutdown()
+    database.engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
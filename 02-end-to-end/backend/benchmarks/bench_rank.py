@@ -0,0 +1,42 @@
+"""
+Rank lookup and "around me" window latency at large user counts.
+
+    uv run python -m benchmarks.bench_rank --sizes 100000 1000000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import tempfile
+from pathlib import Path
+
+from benchmarks.bench_leaderboard import build_database, measure, percentile
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+  parser.add_argument("--iterations", type=int, default=200)
+  parser.add_argument("--radius", type=int, default=5)
+  args = parser.parse_args()
+
+  rng = random.Random(7)
+  print(f"{'users':>10} {'query':>10} {'p50 ms':>10} {'p99 ms':>10}")
+  with tempfile.TemporaryDirectory() as tmp:
+    for size in args.sizes:
+      database = build_database(Path(tmp) / f"bench-{size}.db", size)
+      players = [f"player{rng.randrange(size)}" for _ in range(args.iterations)]
+      lookups = iter(players * 2)
+      scenarios = {
+        "rank": lambda: database.player_rank(next(lookups)),
+        "around": lambda: database.leaderboard_around(next(lookups), args.radius),
+      }
+      for name, fn in scenarios.items():
+        samples = measure(fn, args.iterations)
+        print(f"{size:>10} {name:>10} {statistics.median(samples):>10.3f} {percentile(samples, 99):>10.3f}")
+      database.engine.dispose()
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,58 @@
+"""
+Recording cost, disk use and seek latency of the spectator replay store.
+
+    uv run python -m benchmarks.bench_replays --games 50 --hours 2
+
+Records `--hours` of simulated frames at `--interval` seconds per tick into a temporary
+directory, then replays `--range` seconds of one game from the middle of the log, once through
+the segment list and sparse index and once by reading the log from its first frame.
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+
+from app.broadcast import SpectatorBroadcaster
+from app.replays import ReplayStore
+from app.spectator import SpectatorEngine
+
+START = 1_700_000_000_000
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--games", type=int, default=50)
+  parser.add_argument("--hours", type=float, default=2)
+  parser.add_argument("--interval", type=float, default=1.5)
+  parser.add_argument("--range", type=float, default=60)
+  args = parser.parse_args()
+
+  producer = SpectatorBroadcaster(SpectatorEngine(grid_size=16, players=[f"bot-{index}" for index in range(args.games)], seed=1))
+  frames = int(args.hours * 3600 / args.interval)
+  step_ms = int(args.interval * 1000)
+  with tempfile.TemporaryDirectory() as tmp:
+    store = ReplayStore(tmp)
+    record_seconds = 0.0
+    for index in range(frames):
+      frame = producer.step()
+      started = time.perf_counter()
+      store.record(frame, now_ms=START + index * step_ms)
+      record_seconds += time.perf_counter() - started
+    store.stop()
+    stats = store.stats()
+    per_day = stats["bytes"] / frames * (86400 / args.interval)
+    print(f"{frames} frames of {args.games} games: {stats['bytes'] / 1024 / 1024:.1f} MiB in {stats['segments']} segments")
+    print(f"record: {record_seconds / frames * 1000:.3f} ms/frame, {stats['bytes'] / frames:.0f} B/frame, {per_day / 1024 / 1024:.0f} MiB/day")
+
+    game_id = "spectator-0"
+    middle = START + frames * step_ms // 2
+    end = middle + int(args.range * 1000)
+    for label, start in (("indexed seek", middle), ("full scan", None)):
+      started = time.perf_counter()
+      count = sum(1 for snapshot in store.replay(game_id, start, end) if snapshot.updatedAt >= middle)
+      print(f"{label:>13}: {(time.perf_counter() - started) * 1000:7.2f} ms for {count} snapshots")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,41 @@
+"""
+Spectator simulation throughput: per-state loop engine vs NumPy batch engine.
+
+    uv run python -m benchmarks.bench_spectator --games 10 1000 100000
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from app.spectator import build_spectator_engine
+
+
+def ticks_per_second(kind: str, games: int, min_seconds: float) -> float:
+  engine = build_spectator_engine(kind, games=games, seed=1)
+  engine.tick()
+  ticks = 0
+  started = time.perf_counter()
+  while True:
+    engine.tick()
+    ticks += 1
+    elapsed = time.perf_counter() - started
+    if elapsed >= min_seconds and ticks >= 3:
+      return ticks / elapsed
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--games", type=int, nargs="+", default=[10, 1_000, 100_000])
+  parser.add_argument("--seconds", type=float, default=1.0)
+  args = parser.parse_args()
+
+  print(f"{'games':>8} {'loop ticks/s':>14} {'batch ticks/s':>14} {'speedup':>8}")
+  for games in args.games:
+    loop = ticks_per_second("loop", games, args.seconds)
+    batch = ticks_per_second("batch", games, args.seconds)
+    print(f"{games:>8} {loop:>14.1f} {batch:>14.1f} {batch / loop:>7.1f}x")
+
+
+if __name__ == "__main__":
+  main()
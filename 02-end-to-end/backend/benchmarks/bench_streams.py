@@ -0,0 +1,94 @@
+"""
+Memory and tick cost of many idle spectator streams on one worker.
+
+    uv run python -m benchmarks.bench_streams --viewers 1000 10000
+
+Streams are opened against the ASGI app in-process with a transport that accepts every write,
+so the numbers cover the app's own per-connection state: the request task, the outbox and
+the connection record. Kernel socket buffers and the server's protocol objects come on top.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import time
+import tracemalloc
+
+from app.main import app, broadcaster, streams
+
+
+def _scope(index: int) -> dict:
+  return {
+    "type": "http",
+    "asgi": {"version": "3.0", "spec_version": "2.4"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/spectator/stream",
+    "raw_path": b"/spectator/stream",
+    "root_path": "",
+    "query_string": b"encoding=delta",
+    "headers": [],
+    "client": (f"10.{index // 65536 % 256}.{index // 256 % 256}.{index % 256}", 50000),
+    "server": ("bench", 80),
+  }
+
+
+async def _run(viewers: int, ticks: int) -> dict:
+  never = asyncio.Event()
+
+  async def receive() -> dict:
+    await never.wait()
+    return {"type": "http.disconnect"}
+
+  writes = 0
+
+  async def send(message) -> None:
+    nonlocal writes
+    writes += 1
+
+  broadcaster.latest()
+  gc.collect()
+  tracemalloc.start()
+  before = tracemalloc.get_traced_memory()[0]
+  tasks = [asyncio.create_task(app(_scope(index), receive, send)) for index in range(viewers)]
+  while streams.connections < viewers:
+    await asyncio.sleep(0.01)
+  await asyncio.sleep(0.1)
+  gc.collect()
+  idle_bytes = tracemalloc.get_traced_memory()[0] - before
+  tracemalloc.stop()
+
+  tick_ms = []
+  for _ in range(ticks):
+    target = writes + viewers
+    started = time.perf_counter()
+    broadcaster.step()
+    # Time until every viewer has written the frame.
+    while writes < target:
+      await asyncio.sleep(0)
+    tick_ms.append((time.perf_counter() - started) * 1000)
+
+  for task in tasks:
+    task.cancel()
+  await asyncio.gather(*tasks, return_exceptions=True)
+  return {"idle_bytes": idle_bytes, "tick_ms": sorted(tick_ms)[len(tick_ms) // 2]}
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--viewers", type=int, nargs="+", default=[1000, 10000])
+  parser.add_argument("--ticks", type=int, default=20)
+  args = parser.parse_args()
+
+  streams.max_connections = max(args.viewers)
+  print(f"{'viewers':>8} {'KiB/viewer':>11} {'MiB total':>10} {'tick+write p50 ms':>18}")
+  for viewers in args.viewers:
+    result = asyncio.run(_run(viewers, args.ticks))
+    per_viewer = result["idle_bytes"] / viewers / 1024
+    print(f"{viewers:>8} {per_viewer:>11.2f} {result['idle_bytes'] / 1024 / 1024:>10.1f} {result['tick_ms']:>18.2f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,80 @@
+"""
+Bytes per viewer and server CPU per frame for each spectator transport.
+
+    uv run python -m benchmarks.bench_ws --games 3 50 --ticks 40 --interval 1.5
+
+Steps a simulation of `--games` bots and measures what one viewer receives from the SSE
+stream (full and delta encodings) and from `/spectator/ws` (all games, and subscribed to
+`--subscribe` of them), scaled to a minute at `--interval` seconds per tick. CPU is the
+per-frame cost of the JSON frame encoding, the binary encoding on top of it, and picking one
+filtered viewer's message out of it.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from app.binary_frames import BinaryFrames
+from app.broadcast import SpectatorBroadcaster
+from app.spectator import SpectatorEngine
+
+
+async def _run(games: int, ticks: int, subscribe: int) -> dict:
+  producer = SpectatorBroadcaster(SpectatorEngine(grid_size=16, players=[f"bot-{index}" for index in range(games)], seed=1))
+  frames = BinaryFrames(producer)
+  frames.attach()
+  wanted = [game["id"] for game in json.loads(producer.latest().payload)[:subscribe]]
+  totals = {"sse full": 0, "sse delta": 0, "ws all games": 0, f"ws {subscribe} game(s)": 0}
+  json_seconds = binary_seconds = filter_seconds = 0.0
+  for index in range(ticks):
+    # `step` fans out to BinaryFrames, so time the two encodings separately.
+    producer.unsubscribe(frames)
+    started = time.perf_counter()
+    frame = producer.step()
+    json_seconds += time.perf_counter() - started
+    started = time.perf_counter()
+    frames.put_nowait(frame)
+    binary_seconds += time.perf_counter() - started
+    producer.subscribe(frames)
+    encoded = frames.get(frame)
+    started = time.perf_counter()
+    filtered = encoded.for_games(wanted, resync=index == 0)
+    filter_seconds += time.perf_counter() - started
+    totals["sse full"] += len(frame.event)
+    totals["sse delta"] += len(frame.delta_event)
+    totals["ws all games"] += len(encoded.for_games(None, resync=index == 0))
+    totals[f"ws {subscribe} game(s)"] += len(filtered or b"")
+  return {
+    "games": len(json.loads(frame.payload)),
+    "totals": totals,
+    "json_ms": json_seconds / ticks * 1000,
+    "binary_ms": binary_seconds / ticks * 1000,
+    "filter_ms": filter_seconds / ticks * 1000,
+  }
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--games", type=int, nargs="+", default=[3, 50])
+  parser.add_argument("--ticks", type=int, default=40)
+  parser.add_argument("--interval", type=float, default=1.5)
+  parser.add_argument("--subscribe", type=int, default=1)
+  args = parser.parse_args()
+
+  per_minute = 60 / (args.ticks * args.interval)
+  for games in args.games:
+    result = asyncio.run(_run(games, args.ticks, args.subscribe))
+    print(f"{result['games']} games, {args.ticks} ticks at {args.interval}s")
+    print(f"{'transport':>16} {'KiB/viewer/min':>15}")
+    for label, total in result["totals"].items():
+      print(f"{label:>16} {total * per_minute / 1024:>15.1f}")
+    print(
+      f"per frame: json encode {result['json_ms']:.3f} ms, binary encode {result['binary_ms']:.3f} ms,"
+      f" filtered viewer {result['filter_ms'] * 1000:.1f} us\n"
+    )
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,316 @@
+"""
+Scripted end-to-end workloads against the API, with a baseline regression gate.
+
+Drives the app in-process through httpx's ASGITransport (`--target asgi`) or a local uvicorn
+subprocess (`--target uvicorn`). Each workload reports req/s, p50/p95/p99 latency and response
+statuses; results are written as JSON and compared against the stored baseline for the same
+target, failing on a throughput, tail-latency or error-rate regression.
+
+    uv run python -m benchmarks.suite --target asgi --output bench-results.json
+    uv run python -m benchmarks.suite --target uvicorn --update-baseline
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+import httpx
+
+from benchmarks.bench_leaderboard import percentile
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Regressions are judged on throughput and tail latency; p50/p99 are reported but too noisy to gate on.
+GATED_METRICS = {"reqPerSec": "higher", "p95Ms": "lower"}
+SSE_VIEWERS = 100
+
+
+def error_rate(metrics: Dict[str, Any]) -> float:
+  """Share of attempts that failed in transport or got a response other than 2xx or 304."""
+  statuses: Dict[str, int] = metrics.get("statuses", {})
+  errors = int(metrics.get("errors", 0))
+  failed = errors + sum(count for code, count in statuses.items() if not (200 <= int(code) < 300 or int(code) == 304))
+  attempts = errors + sum(statuses.values())
+  return failed / attempts if attempts else 0.0
+
+
+@dataclass
+class Recorder:
+  latencies: List[float] = field(default_factory=list)
+  statuses: Dict[int, int] = field(default_factory=dict)
+  errors: int = 0
+
+  async def time(self, request: Awaitable[httpx.Response]) -> httpx.Response | None:
+    started = time.perf_counter()
+    try:
+      response = await request
+    except httpx.HTTPError:
+      self.errors += 1
+      return None
+    self.latencies.append((time.perf_counter() - started) * 1000)
+    self.statuses[response.status_code] = self.statuses.get(response.status_code, 0) + 1
+    return response
+
+  def summary(self, elapsed: float) -> Dict[str, object]:
+    samples = self.latencies or [0.0]
+    summary: Dict[str, object] = {
+      "requests": len(self.latencies),
+      "reqPerSec": len(self.latencies) / elapsed if elapsed else 0.0,
+      "p50Ms": percentile(samples, 50),
+      "p95Ms": percentile(samples, 95),
+      "p99Ms": percentile(samples, 99),
+      "errors": self.errors,
+      "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+    }
+    summary["errorRate"] = error_rate(summary)
+    return summary
+
+
+async def _gather_bounded(concurrency: int, jobs: List[Callable[[], Awaitable[None]]]) -> float:
+  semaphore = asyncio.Semaphore(concurrency)
+
+  async def bounded(job: Callable[[], Awaitable[None]]) -> None:
+    async with semaphore:
+      await job()
+
+  started = time.perf_counter()
+  await asyncio.gather(*(bounded(job) for job in jobs))
+  return time.perf_counter() - started
+
+
+async def auth_storm(client: httpx.AsyncClient, scale: float) -> Dict[str, object]:
+  """Concurrent signups followed by a login for each new account."""
+  recorder = Recorder()
+  users = max(1, int(40 * scale))
+
+  async def signup_then_login(index: int) -> None:
+    credentials = {"username": f"storm-{index}", "password": "pw"}
+    await recorder.time(client.post("/auth/signup", json=credentials))
+    await recorder.time(client.post("/auth/login", json=credentials))
+
+  elapsed = await _gather_bounded(16, [lambda index=index: signup_then_login(index) for index in range(users)])
+  return recorder.summary(elapsed)
+
+
+async def _players(client: httpx.AsyncClient, count: int) -> List[tuple[str, Dict[str, str]]]:
+  players = []
+  for index in range(count):
+    username = f"bench-{index}"
+    response = await client.post("/auth/signup", json={"username": username, "password": "pw"})
+    response.raise_for_status()
+    players.append((username, {"Authorization": f"Bearer {response.json()['token']}"}))
+  return players
+
+
+async def score_ingest(client: httpx.AsyncClient, scale: float) -> Dict[str, object]:
+  """Authenticated POST /scores from a pool of players."""
+  players = await _players(client, 20)
+  recorder = Recorder()
+  total = max(1, int(2000 * scale))
+
+  async def submit(index: int) -> None:
+    username, headers = players[index % len(players)]
+    body = {"username": username, "score": index % 97, "mode": "walls" if index % 2 else "pass-through"}
+    await recorder.time(client.post("/scores", json=body, headers=headers))
+
+  elapsed = await _gather_bounded(32, [lambda index=index: submit(index) for index in range(total)])
+  return recorder.summary(elapsed)
+
+
+async def leaderboard_poll(client: httpx.AsyncClient, scale: float) -> Dict[str, object]:
+  """Clients polling /leaderboard with If-None-Match, as the frontend does."""
+  recorder = Recorder()
+  clients = 50
+  polls = max(1, int(40 * scale))
+  etags: Dict[int, str] = {}
+
+  async def poll(index: int) -> None:
+    viewer = index % clients
+    headers = {"If-None-Match": etags[viewer]} if viewer in etags else {}
+    response = await recorder.time(client.get("/leaderboard", headers=headers))
+    if response is not None and "etag" in response.headers:
+      etags[viewer] = response.headers["etag"]
+
+  elapsed = await _gather_bounded(clients, [lambda index=index: poll(index) for index in range(clients * polls)])
+  return recorder.summary(elapsed)
+
+
+async def sse_viewers(client: httpx.AsyncClient, scale: float) -> Dict[str, object]:
+  """N concurrent /spectator/stream viewers, each reading a fixed number of frames."""
+  recorder = Recorder()
+  viewers = max(1, int(SSE_VIEWERS * scale))
+  frames = 3
+  first_event: List[float] = []
+
+  async def watch() -> None:
+    started = time.perf_counter()
+    try:
+      async with client.stream("GET", "/spectator/stream", params={"limit": frames}) as response:
+        seen_first = False
+        async for _ in response.aiter_bytes():
+          if not seen_first:
+            seen_first = True
+            first_event.append((time.perf_counter() - started) * 1000)
+    except httpx.HTTPError:
+      recorder.errors += 1
+      return
+    recorder.latencies.append((time.perf_counter() - started) * 1000)
+    recorder.statuses[response.status_code] = recorder.statuses.get(response.status_code, 0) + 1
+
+  elapsed = await _gather_bounded(viewers, [watch for _ in range(viewers)])
+  summary = recorder.summary(elapsed)
+  summary["framesPerSec"] = len(recorder.latencies) * frames / elapsed if elapsed else 0.0
+  summary["firstEventP95Ms"] = percentile(first_event or [0.0], 95)
+  return summary
+
+
+WORKLOADS: Dict[str, Callable[[httpx.AsyncClient, float], Awaitable[Dict[str, object]]]] = {
+  "auth_storm": auth_storm,
+  "score_ingest": score_ingest,
+  "leaderboard_poll": leaderboard_poll,
+  "sse_viewers": sse_viewers,
+}
+
+
+@contextlib.asynccontextmanager
+async def asgi_client() -> AsyncIterator[httpx.AsyncClient]:
+  from app.main import app, database
+
+  database.reset()
+  # ASGITransport does not send lifespan events, so run startup/shutdown around the client.
+  async with app.router.lifespan_context(app):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+      yield client
+
+
+def _free_port() -> int:
+  with socket.socket() as sock:
+    sock.bind(("127.0.0.1", 0))
+    return sock.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_client() -> AsyncIterator[httpx.AsyncClient]:
+  port = _free_port()
+  server = subprocess.Popen(
+    [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+    cwd=Path(__file__).resolve().parents[1],
+    env=os.environ.copy(),
+  )
+  base_url = f"http://127.0.0.1:{port}"
+  try:
+    limits = httpx.Limits(max_connections=200, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+      deadline = time.monotonic() + 30
+      while True:
+        with contextlib.suppress(httpx.TransportError):
+          if (await client.get("/leaderboard", params={"limit": 1})).status_code == 200:
+            break
+        if time.monotonic() > deadline or server.poll() is not None:
+          raise RuntimeError("uvicorn did not start")
+        await asyncio.sleep(0.2)
+      yield client
+  finally:
+    server.terminate()
+    server.wait(timeout=30)
+
+
+async def run_suite(target: str, workloads: List[str], scale: float) -> Dict[str, Dict[str, object]]:
+  factory = asgi_client if target == "asgi" else uvicorn_client
+  results: Dict[str, Dict[str, object]] = {}
+  async with factory() as client:
+    for name in workloads:
+      results[name] = await WORKLOADS[name](client, scale)
+  if target == "asgi" and "sse_viewers" in results:
+    # ASGITransport hands over a streamed body only once it is complete, so the first event
+    # would just repeat the whole stream's latency.
+    del results["sse_viewers"]["firstEventP95Ms"]
+  return results
+
+
+def compare(results: Dict[str, Dict[str, object]], baseline: Dict[str, Dict[str, object]], threshold: float) -> List[str]:
+  """Return human-readable regressions beyond `threshold` (a fraction) relative to `baseline`."""
+  regressions = []
+  for workload, metrics in results.items():
+    reference = baseline.get(workload)
+    if not reference:
+      continue
+    # Any rise in failed requests fails the gate: a workload answered with 503s is fast but not
+    # doing its job, so its latency and throughput alone would read as an improvement.
+    # Baselines recorded before errorRate existed are scored from their statuses.
+    failing, allowed = float(metrics["errorRate"]), float(reference.get("errorRate", error_rate(reference)))
+    if failing > allowed:
+      regressions.append(f"{workload}.errorRate: {failing:.2%} vs baseline {allowed:.2%}")
+    for metric, better in GATED_METRICS.items():
+      current, expected = float(metrics[metric]), float(reference.get(metric, 0.0))
+      if expected <= 0:
+        continue
+      change = (current - expected) / expected
+      if (better == "higher" and change < -threshold) or (better == "lower" and change > threshold):
+        regressions.append(f"{workload}.{metric}: {current:.2f} vs baseline {expected:.2f} ({change:+.0%})")
+  return regressions
+
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--target", choices=["asgi", "uvicorn"], default="asgi")
+  parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+  parser.add_argument("--scale", type=float, default=1.0, help="Multiplier for request counts")
+  parser.add_argument("--output", type=Path, default=Path("bench-results.json"))
+  parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+  parser.add_argument("--threshold", type=float, default=0.25, help="Allowed regression as a fraction")
+  parser.add_argument("--update-baseline", action="store_true")
+  args = parser.parse_args()
+
+  with tempfile.TemporaryDirectory() as tmp:
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp) / 'bench.db'}"
+    os.environ.setdefault("SPECTATOR_SEED", "1")
+    # Every workload comes from one client address, which admission control and the per-client
+    # stream cap would throttle.
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+    os.environ.setdefault("SSE_MAX_PER_CLIENT", str(max(1, int(SSE_VIEWERS * args.scale))))
+    results = asyncio.run(run_suite(args.target, args.workloads, args.scale))
+
+  report = {"target": args.target, "scale": args.scale, "results": results}
+  args.output.write_text(json.dumps(report, indent=2) + "\n")
+  for name, metrics in results.items():
+    print(
+      f"{name:>17}: {metrics['reqPerSec']:9.1f} req/s  p50 {metrics['p50Ms']:8.2f}  "
+      f"p95 {metrics['p95Ms']:8.2f}  p99 {metrics['p99Ms']:8.2f} ms  statuses {metrics['statuses']}"
+    )
+
+  baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+  if args.update_baseline:
+    baselines[args.target] = {"scale": args.scale, "results": results}
+    args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+    print(f"Baseline for {args.target} written to {args.baseline}")
+    return
+  stored = baselines.get(args.target)
+  if stored is None:
+    print(f"No {args.target} baseline in {args.baseline}; run with --update-baseline to create one")
+    return
+  if stored.get("scale") != args.scale:
+    print(f"Baseline was recorded at scale {stored.get('scale')}, not {args.scale}; skipping comparison")
+    return
+  regressions = compare(results, stored["results"], args.threshold)
+  if regressions:
+    print("Regressions beyond {:.0%}:".format(args.threshold))
+    for line in regressions:
+      print(f"  {line}")
+    sys.exit(1)
+  print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+
+
+if __name__ == "__main__":
+  main()
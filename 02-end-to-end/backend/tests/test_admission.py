@@ -0,0 +1,79 @@
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.admission import Admission, AdmissionRejected, RouteGroup
+from app.main import admission, app, broadcaster, db, spectator_engine
+
+client = TestClient(app)
+GROUP = RouteGroup("writes", rate=2, burst=2, max_concurrency=2)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  admission.reset()
+
+
+def _rejection(controller: Admission, client_id: str = "a", now: float = 0.0) -> AdmissionRejected:
+  with pytest.raises(AdmissionRejected) as caught:
+    controller.acquire("writes", client_id, now)
+  return caught.value
+
+
+def test_each_client_has_its_own_bucket():
+  controller = Admission([GROUP], queue_depth=lambda: 0)
+  for _ in range(2):
+    controller.acquire("writes", "a", 0.0)
+    controller.release("writes")
+  rejected = _rejection(controller)
+  assert (rejected.status_code, rejected.retry_after) == (429, 1)
+  controller.acquire("writes", "b", 0.0)
+  controller.release("writes")
+  controller.acquire("writes", "a", 0.5)
+  assert controller.stats()["decisions"]["writes"] == {"admitted": 4, "rate_limited": 1}
+
+
+def test_group_concurrency_and_db_queue_shed_with_503():
+  depth = [0]
+  controller = Admission([GROUP], queue_depth=lambda: depth[0], db_queue_limit=10)
+  controller.acquire("writes", "a", 0.0)
+  controller.acquire("writes", "b", 0.0)
+  assert _rejection(controller, "c").status_code == 503
+  controller.release("writes")
+  depth[0] = 10
+  assert _rejection(controller, "d").status_code == 503
+  depth[0] = 0
+  controller.acquire("writes", "e", 0.0)
+  assert controller.stats()["decisions"]["writes"] == {"admitted": 3, "concurrency": 1, "db_saturated": 1}
+
+
+def test_client_table_is_bounded():
+  controller = Admission([GROUP], queue_depth=lambda: 0, max_clients=3)
+  for index in range(10):
+    controller.acquire("writes", f"client-{index}", 0.0)
+    controller.release("writes")
+  assert controller.stats()["clients"] == 3
+
+
+def test_write_routes_return_429_with_retry_after_and_spare_other_clients(monkeypatch: pytest.MonkeyPatch):
+  monkeypatch.setitem(admission.groups, "auth", RouteGroup("auth", rate=0.5, burst=2, max_concurrency=8))
+  for index in range(2):
+    assert client.post("/auth/signup", json={"username": f"rush{index}", "password": "pw"}).status_code == 201
+  limited = client.post("/auth/login", json={"username": "rush0", "password": "pw"})
+  assert limited.status_code == 429
+  assert limited.headers["retry-after"] == "2"
+
+  other = TestClient(app, client=("10.0.0.7", 50000))
+  assert other.post("/auth/login", json={"username": "rush0", "password": "pw"}).status_code == 200
+  stats = client.get("/stats").json()["admission"]
+  assert stats["decisions"]["auth"] == {"admitted": 3, "rate_limited": 1}
+  assert stats["inFlight"]["auth"] == 0
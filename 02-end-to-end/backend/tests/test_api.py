@@ -1,15 +1,23 @@
+import asyncio
 import json
 import sys
+import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+import httpx
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import select
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
   sys.path.insert(0, str(ROOT_DIR))
 
-from app.main import app, db, spectator_engine
+from app.cache import CachedLeaderboard
+from app.db import LeaderboardRollup, User, session_scope
+import app.main as app_main
+from app.main import admission, app, broadcaster, db, hash_executor, spectator_engine
 
 client = TestClient(app)
 
@@ -18,13 +26,25 @@ client = TestClient(app)
 def reset_state():
   db.reset()
   spectator_engine.reset()
+  broadcaster.reset()
+  admission.reset()
 
 
-def test_signup_and_duplicate_signup():
+def _signup(username: str) -> dict[str, str]:
+  token = client.post("/auth/signup", json={"username": username, "password": "pw"}).json()["token"]
+  return {"Authorization": f"Bearer {token}"}
+
+
+def test_signup_and_duplicate_signup(monkeypatch: pytest.MonkeyPatch):
   response = client.post("/auth/signup", json={"username": "pilot", "password": "pw"})
   assert response.status_code == 201
   body = response.json()
   assert body["user"]["username"] == "pilot"
+
+  def no_hash(*_args):
+    raise AssertionError("duplicate signup paid for a password hash")
+
+  monkeypatch.setattr(app_main, "hash_password", no_hash)
   duplicate = client.post("/auth/signup", json={"username": "pilot", "password": "pw"})
   assert duplicate.status_code == 409
 
@@ -35,9 +55,40 @@ def test_login_invalid_password():
   assert response.status_code == 401
 
 
+def _stored_password(username: str) -> str:
+  with session_scope(db._session_factory) as session:
+    return session.scalar(select(User.password).where(User.normalized_username == username))
+
+
+def test_passwords_are_hashed_and_legacy_rows_rehashed_on_login():
+  client.post("/auth/signup", json={"username": "hashed", "password": "secret"})
+  assert _stored_password("hashed").startswith("scrypt$")
+  assert client.post("/auth/login", json={"username": "hashed", "password": "secret"}).status_code == 200
+
+  # Seed accounts are hashed too; legacy plaintext rows only come from older databases.
+  assert _stored_password("nova").startswith("scrypt$")
+  with session_scope(db._session_factory) as session:
+    session.add(User(id="legacy-0", username="relic", normalized_username="relic", password="relic"))
+  assert client.post("/auth/login", json={"username": "relic", "password": "wrong"}).status_code == 401
+  assert _stored_password("relic") == "relic"
+  assert client.post("/auth/login", json={"username": "relic", "password": "relic"}).status_code == 200
+  rehashed = _stored_password("relic")
+  assert rehashed.startswith("scrypt$")
+  assert client.post("/auth/login", json={"username": "relic", "password": "relic"}).status_code == 200
+  assert _stored_password("relic") == rehashed
+
+
+def test_saturated_hash_pool_returns_503(monkeypatch):
+  monkeypatch.setattr(hash_executor, "max_queue", 0)
+  response = client.post("/auth/login", json={"username": "nova", "password": "nova"})
+  assert response.status_code == 503
+  assert response.headers["Retry-After"] == "1"
+  assert hash_executor.stats()["rejected"] >= 1
+
+
 def test_record_score_updates_leaderboard():
-  client.post("/auth/signup", json={"username": "runner", "password": "pw"})
-  record = client.post("/scores", json={"username": "runner", "score": 9, "mode": "walls"})
+  headers = _signup("runner")
+  record = client.post("/scores", json={"username": "runner", "score": 9, "mode": "walls"}, headers=headers)
   assert record.status_code == 204
   leaderboard = client.get("/leaderboard").json()
   entry = next(row for row in leaderboard if row["player"] == "runner")
@@ -74,3 +125,203 @@ def test_leaderboard_preflight_allowed():
   assert response.status_code == 200
   allow_methods = response.headers.get("access-control-allow-methods", "").lower()
   assert "get" in allow_methods
+
+
+def test_leaderboard_keyset_pagination():
+  for name, score in [("tie-a", 20), ("tie-b", 20), ("solo", 30)]:
+    client.post("/scores", json={"username": name, "score": score, "mode": "walls"}, headers=_signup(name))
+  full = [row["player"] for row in client.get("/leaderboard").json()]
+  assert full[0] == "solo"
+  first_page = client.get("/leaderboard?limit=2").json()
+  assert [row["player"] for row in first_page] == full[:2]
+  second_page = client.get(f"/leaderboard?limit=2&after={first_page[-1]['player']}").json()
+  assert [row["player"] for row in second_page] == full[2:4]
+  assert client.get("/leaderboard?after=ghost").status_code == 404
+
+
+def test_slow_queries_do_not_serialize_requests(monkeypatch: pytest.MonkeyPatch):
+  def slow_leaderboard(*_args):
+    time.sleep(0.3)
+    return CachedLeaderboard(entries=[], expires_at=0)
+
+  monkeypatch.setattr(db, "cached_leaderboard", lambda *_args: None)
+  monkeypatch.setattr(db, "load_leaderboard", slow_leaderboard)
+
+  async def fire_concurrently():
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+      started = time.perf_counter()
+      responses = await asyncio.gather(*(async_client.get("/leaderboard") for _ in range(4)))
+      return time.perf_counter() - started, responses
+
+  elapsed, responses = asyncio.run(fire_concurrently())
+  assert all(response.status_code == 200 for response in responses)
+  assert elapsed < 0.9
+  assert client.get("/stats").json()["dbExecutor"]["completed"] >= 4
+
+
+def _read_events(url: str, headers: dict | None = None) -> list[tuple[int, dict]]:
+  events = []
+  with client.stream("GET", url, headers=headers or {}) as response:
+    event_id = None
+    for line in response.iter_lines():
+      if line.startswith("id: "):
+        event_id = int(line[4:])
+      elif line.startswith("data: "):
+        events.append((event_id, json.loads(line[6:])))
+  return events
+
+
+def test_delta_stream_resumes_from_last_event_id():
+  [(first_id, keyframe)] = _read_events("/spectator/stream?limit=1&encoding=delta")
+  assert keyframe["type"] == "keyframe"
+  assert {game["id"] for game in keyframe["games"]} == {"spectator-0", "spectator-1", "spectator-2"}
+
+  for _ in range(3):
+    broadcaster.step()
+
+  resumed = _read_events("/spectator/stream?limit=3&encoding=delta", headers={"Last-Event-ID": str(first_id)})
+  assert [event_id for event_id, _ in resumed] == [first_id + 1, first_id + 2, first_id + 3]
+  assert all(payload["type"] == "delta" for _, payload in resumed)
+
+  stale = _read_events("/spectator/stream?limit=1&encoding=delta", headers={"Last-Event-ID": "-50"})
+  assert stale[0][1]["type"] == "keyframe"
+
+
+def test_score_batch_applies_all_runs_in_one_request():
+  headers = _signup("batcher")
+  runs = [
+    {"username": "batcher", "score": 4, "mode": "walls"},
+    {"username": "Batcher", "score": 11, "mode": "pass-through"},
+    {"username": "batcher", "score": 7, "mode": "walls"},
+  ]
+  response = client.post("/scores/batch", json={"scores": runs}, headers=headers)
+  assert response.status_code == 200
+  assert response.json() == {"accepted": 3, "unknownPlayers": []}
+  entry = next(row for row in client.get("/leaderboard").json() if row["player"] == "batcher")
+  assert entry["bestScore"] == 11
+  assert entry["totalRuns"] == 3
+  assert entry["modeBreakdown"] == {"pass-through": 1, "walls": 2}
+  assert db.record_scores([("batcher", 1, "walls"), ("ghost", 99, "walls")]) == ["ghost"]
+
+
+def test_scores_require_a_valid_session_for_the_same_player():
+  headers = _signup("owner")
+  _signup("someone-else")
+  body = {"username": "owner", "score": 3, "mode": "walls"}
+  assert client.post("/scores", json=body).status_code == 401
+  assert client.post("/scores", json=body, headers={"Authorization": "Bearer nope"}).status_code == 401
+  assert client.post("/scores", json={**body, "username": "someone-else"}, headers=headers).status_code == 403
+  assert client.post("/scores", json=body, headers=headers).status_code == 204
+
+  login = client.post("/auth/login", json={"username": "owner", "password": "pw"}).json()
+  db.session_cache.clear()
+  fresh = {"Authorization": f"Bearer {login['token']}"}
+  assert client.post("/scores", json=body, headers=fresh).status_code == 204
+  assert db.session_cache.get(login["token"]) is not None
+
+
+def test_expired_sessions_are_swept():
+  headers = _signup("sleeper")
+  assert db.sweep_sessions() == 0
+  assert db.sweep_sessions(now=datetime.now(timezone.utc) + timedelta(days=30)) == 1
+  db.session_cache.clear()
+  response = client.post("/scores", json={"username": "sleeper", "score": 1, "mode": "walls"}, headers=headers)
+  assert response.status_code == 401
+
+
+def test_leaderboard_cache_serves_hits_and_invalidates_on_writes():
+  headers = _signup("cached")
+  cache = db.leaderboard_cache
+  first = client.get("/leaderboard").content
+  hits = cache.hits
+  assert client.get("/leaderboard").content == first
+  assert cache.hits == hits + 1
+
+  client.post("/scores", json={"username": "cached", "score": 50, "mode": "walls"}, headers=headers)
+  refreshed = client.get("/leaderboard").json()
+  assert refreshed[0]["player"] == "cached"
+  assert client.get("/stats").json()["leaderboardCache"]["hitRate"] > 0
+
+
+def _competition_ranks(rows: list[dict]) -> dict[str, int]:
+  ranks = {}
+  for position, row in enumerate(rows, start=1):
+    previous = rows[position - 2] if position > 1 else None
+    ranks[row["player"]] = ranks[previous["player"]] if previous and previous["bestScore"] == row["bestScore"] else position
+  return ranks
+
+
+def test_rank_and_around_handle_ties():
+  scores = {"r-a": 30, "r-b": 20, "r-c": 20, "r-d": 20, "r-e": 8, "r-f": 8, "r-g": 1}
+  for name, score in scores.items():
+    client.post("/scores", json={"username": name, "score": score, "mode": "walls"}, headers=_signup(name))
+  full = client.get("/leaderboard").json()
+  expected = _competition_ranks(full)
+  assert expected["r-b"] == expected["r-c"] == expected["r-d"] == 2
+
+  for name in scores:
+    ranked = client.get(f"/leaderboard/rank/{name}").json()
+    assert ranked["rank"] == expected[name]
+
+  order = [row["player"] for row in full]
+  for name in scores:
+    window = client.get(f"/leaderboard/around/{name}?radius=2").json()
+    index = order.index(name)
+    assert [row["player"] for row in window] == order[max(0, index - 2) : index + 3]
+    assert all(row["rank"] == expected[row["player"]] for row in window)
+
+  assert client.get("/leaderboard/rank/ghost").status_code == 404
+
+
+def test_mode_and_window_leaderboards_use_rollups():
+  headers = {name: _signup(name) for name in ("walker", "wrapper")}
+  client.post("/scores", json={"username": "walker", "score": 12, "mode": "walls"}, headers=headers["walker"])
+  client.post("/scores", json={"username": "wrapper", "score": 30, "mode": "pass-through"}, headers=headers["wrapper"])
+  client.post("/scores", json={"username": "walker", "score": 18, "mode": "walls"}, headers=headers["walker"])
+  client.post("/scores/batch", json={"scores": [{"username": "wrapper", "score": 2, "mode": "walls"}]}, headers=headers["wrapper"])
+
+  walls_today = client.get("/leaderboard?mode=walls&window=daily").json()
+  assert [(row["player"], row["bestScore"], row["totalRuns"]) for row in walls_today] == [
+    ("walker", 18, 2),
+    ("wrapper", 2, 1),
+  ]
+  weekly = client.get("/leaderboard?window=weekly").json()
+  assert [row["player"] for row in weekly] == ["wrapper", "walker"]
+  assert weekly[0]["modeBreakdown"] == {"pass-through": 1, "walls": 1}
+  # Seeded players have lifetime stats but no runs this week.
+  assert {row["player"] for row in client.get("/leaderboard?mode=pass-through").json()} == {"wrapper"}
+  second_page = client.get("/leaderboard?mode=walls&window=daily&limit=1&after=walker").json()
+  assert [row["player"] for row in second_page] == ["wrapper"]
+
+
+def test_init_db_backfills_rollups_from_existing_runs():
+  headers = _signup("returning")
+  client.post("/scores", json={"username": "returning", "score": 9, "mode": "walls"}, headers=headers)
+  client.post("/scores", json={"username": "returning", "score": 4, "mode": "pass-through"}, headers=headers)
+  before = client.get("/leaderboard?window=weekly").json()
+  # A database recorded before rollups existed: runs, but an empty rollup table.
+  with db.engine.begin() as connection:
+    connection.execute(LeaderboardRollup.__table__.delete())
+  db.leaderboard_cache.invalidate()
+  assert client.get("/leaderboard?window=weekly").json() == []
+
+  db.init_db()
+  assert client.get("/leaderboard?window=weekly").json() == before
+  # Rollups already present are not folded in twice.
+  assert db._backfill_rollups() == 0
+
+
+def test_unsupported_dialects_fail_at_startup(monkeypatch: pytest.MonkeyPatch):
+  monkeypatch.setattr(db.engine.dialect, "name", "mysql")
+  with pytest.raises(RuntimeError, match="unsupported dialect mysql"):
+    db.init_db()
+
+
+def test_compaction_drops_expired_buckets():
+  client.post("/scores", json={"username": "veteran", "score": 5, "mode": "walls"}, headers=_signup("veteran"))
+  assert db.compact_rollups() == 0
+  far_future = datetime.now(timezone.utc) + timedelta(days=400)
+  # Daily (walls + all) and weekly (walls + all) buckets expire; all-time per-mode survives.
+  assert db.compact_rollups(now=far_future) == 4
+  assert [row["player"] for row in client.get("/leaderboard?mode=walls").json()] == ["veteran"]
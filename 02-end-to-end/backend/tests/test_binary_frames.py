@@ -0,0 +1,217 @@
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.binary_frames import BinaryFrames, decode, full_record
+from app.broadcast import SpectatorBroadcaster
+from app.main import app, binary_frames, broadcaster, db, spectator_engine, streams
+from app.spectator import SpectatorEngine
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  streams.reset()
+
+
+def _apply(state: dict, grids: dict, data: bytes) -> dict:
+  """Fold one binary message into `state` the way a viewer would."""
+  decoded = decode(data, grids)
+  if decoded["kind"] == "keyframe":
+    state.clear()
+  for record in decoded["records"]:
+    if record["type"] == "full":
+      state[record["id"]] = {key: record[key] for key in ("player", "mode", "gridSize", "score", "food", "snake")}
+    elif record["type"] == "removed":
+      state.pop(record["id"], None)
+    else:
+      game = state[record["id"]]
+      if "head" in record:
+        snake = [record["head"], *game["snake"]]
+        game["snake"] = snake[: len(snake) - record["drop"]]
+      if "food" in record:
+        game["food"] = record["food"]
+      if "score" in record:
+        game["score"] = record["score"]
+  return decoded
+
+
+def _expected(frame, games=None) -> dict:
+  return {
+    game["id"]: {
+      "player": game["player"],
+      "mode": game["mode"],
+      "gridSize": game["gridSize"],
+      "score": game["score"],
+      "food": [game["food"]["x"], game["food"]["y"]],
+      "snake": [[point["x"], point["y"]] for point in game["snake"]],
+    }
+    for game in json.loads(frame.payload)
+    if games is None or game["id"] in games
+  }
+
+
+def test_deltas_rebuild_every_snapshot():
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=3))
+    frames = BinaryFrames(producer)
+    frames.attach()
+    state, grids = {}, {}
+    kinds = []
+    for index in range(60):
+      frame = producer.step()
+      kinds.append(_apply(state, grids, frames.get(frame).for_games(None, resync=index == 0))["kind"])
+      assert state == _expected(frame)
+    assert kinds[0] == "keyframe"
+    assert kinds.count("delta") == 59
+    frames.detach()
+    assert producer.subscriber_count == 0
+
+  asyncio.run(scenario())
+
+
+def test_filtered_viewers_only_receive_their_games():
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=5))
+    frames = BinaryFrames(producer)
+    frames.attach()
+    wanted = {json.loads(producer.latest().payload)[0]["id"]}
+    state, grids = {}, {}
+    everything = filtered = 0
+    for index in range(30):
+      encoded = frames.get(producer.step())
+      data = encoded.for_games(wanted, resync=index == 0)
+      everything += len(encoded.for_games(None, resync=False))
+      if data is not None:
+        filtered += len(data)
+        _apply(state, grids, data)
+      assert set(state) <= wanted
+    assert state == _expected(producer.latest(), wanted)
+    assert filtered * 2 < everything
+
+  asyncio.run(scenario())
+
+
+def test_binary_frames_are_smaller_than_json_deltas():
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=7))
+    frames = BinaryFrames(producer)
+    frames.attach()
+    binary = json_bytes = 0
+    for _ in range(20):
+      frame = producer.step()
+      binary += len(frames.get(frame).for_games(None, resync=False))
+      json_bytes += len(frame.delta_event)
+    assert binary * 2 < json_bytes
+
+  asyncio.run(scenario())
+
+
+def test_large_grids_use_two_byte_cells():
+  game = {
+    "id": "g",
+    "player": "p",
+    "mode": "walls",
+    "gridSize": 64,
+    "score": 3,
+    "food": {"x": 63, "y": 63},
+    "snake": [{"x": 10, "y": 40}, {"x": 9, "y": 40}],
+  }
+  grids = {}
+  record = decode(b"\x01\x00" + (1).to_bytes(8, "big") + (1).to_bytes(2, "big") + full_record(game), grids)["records"][0]
+  assert record["food"] == [63, 63]
+  assert record["snake"] == [[10, 40], [9, 40]]
+  assert grids == {"g": 64}
+
+
+def _ws_scope(query: bytes = b"", host: str = "10.0.0.1") -> dict:
+  return {
+    "type": "websocket",
+    "asgi": {"version": "3.0", "spec_version": "2.4"},
+    "http_version": "1.1",
+    "scheme": "ws",
+    "path": "/spectator/ws",
+    "raw_path": b"/spectator/ws",
+    "root_path": "",
+    "query_string": query,
+    "headers": [],
+    "client": (host, 50000),
+    "server": ("testserver", 80),
+    "subprotocols": [],
+  }
+
+
+def test_websocket_sends_keyframe_then_deltas_and_honours_subscriptions():
+  async def scenario() -> None:
+    incoming: asyncio.Queue = asyncio.Queue()
+    outgoing: asyncio.Queue = asyncio.Queue()
+    await incoming.put({"type": "websocket.connect"})
+    task = asyncio.create_task(app(_ws_scope(), incoming.get, outgoing.put))
+
+    async def next_message() -> dict:
+      message = await asyncio.wait_for(outgoing.get(), 2)
+      while message["type"] == "websocket.accept":
+        message = await asyncio.wait_for(outgoing.get(), 2)
+      return message
+
+    state, grids = {}, {}
+    first = _apply(state, grids, (await next_message())["bytes"])
+    assert first["kind"] == "keyframe"
+    assert binary_frames.viewers == 1
+    assert streams.connections == 1
+
+    broadcaster.step()
+    assert _apply(state, grids, (await next_message())["bytes"])["kind"] == "delta"
+    assert state == _expected(broadcaster.latest())
+
+    wanted = sorted(state)[:1]
+    await incoming.put({"type": "websocket.receive", "text": json.dumps({"subscribe": wanted})})
+    await asyncio.sleep(0.01)
+    broadcaster.step()
+    resynced = _apply(state, grids, (await next_message())["bytes"])
+    assert resynced["kind"] == "keyframe"
+    assert state == _expected(broadcaster.latest(), set(wanted))
+
+    await incoming.put({"type": "websocket.disconnect", "code": 1000})
+    await asyncio.wait_for(task, 2)
+
+  asyncio.run(scenario())
+  assert binary_frames.viewers == 0
+  assert streams.connections == 0
+  assert broadcaster.subscriber_count == 0
+
+
+def test_websocket_rejects_invalid_subscriptions_and_caps(monkeypatch: pytest.MonkeyPatch):
+  async def session(messages: list) -> list:
+    incoming: asyncio.Queue = asyncio.Queue()
+    for message in messages:
+      await incoming.put(message)
+    sent = []
+
+    async def send(message) -> None:
+      sent.append(message)
+
+    await asyncio.wait_for(app(_ws_scope(), incoming.get, send), 2)
+    return sent
+
+  invalid = asyncio.run(session([{"type": "websocket.connect"}, {"type": "websocket.receive", "text": '{"subscribe": 3}'}]))
+  assert invalid[-1] == {"type": "websocket.close", "code": 1007, "reason": ""}
+  binary = asyncio.run(session([{"type": "websocket.connect"}, {"type": "websocket.receive", "bytes": b"\x00"}]))
+  assert binary[-1] == {"type": "websocket.close", "code": 1003, "reason": ""}
+  assert streams.connections == 0
+
+  monkeypatch.setattr(streams, "max_per_client", 0)
+  refused = asyncio.run(session([{"type": "websocket.connect"}]))
+  assert refused[-1]["type"] == "websocket.close"
+  assert refused[-1]["code"] == 1013
+  assert streams.stats()["rejected"] == {"client": 1}
+  assert binary_frames.viewers == 0
@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.broadcast import SpectatorBroadcaster
+from app.spectator import SpectatorEngine
+
+
+class CountingEngine(SpectatorEngine):
+  def __init__(self) -> None:
+    super().__init__()
+    self.tick_calls = 0
+    self.snapshot_calls = 0
+
+  def tick(self) -> None:
+    self.tick_calls += 1
+    super().tick()
+
+  def snapshots(self):
+    self.snapshot_calls += 1
+    return super().snapshots()
+
+
+@pytest.mark.parametrize("subscribers", [1, 5000])
+def test_work_per_tick_is_independent_of_subscribers(subscribers: int):
+  engine = CountingEngine()
+  broadcaster = SpectatorBroadcaster(engine, queue_size=4)
+  queues = [broadcaster.subscribe() for _ in range(subscribers)]
+
+  frames = [broadcaster.step() for _ in range(10)]
+
+  assert engine.tick_calls == 10
+  assert engine.snapshot_calls == 10
+  assert broadcaster.encodes == 10
+  for queue in queues:
+    # Bounded queues keep only the newest frames and share the same serialized bytes.
+    assert queue.qsize() == 4
+    assert queue.get_nowait().payload is frames[-4].payload
+
+
+def test_encodes_per_tick_stay_constant_as_subscribers_join():
+  broadcaster = SpectatorBroadcaster(CountingEngine(), queue_size=1)
+  per_tick = {}
+  for total in (1, 100, 5000):
+    while broadcaster.subscriber_count < total:
+      broadcaster.subscribe()
+    before = broadcaster.encodes
+    for _ in range(5):
+      broadcaster.step()
+    per_tick[total] = (broadcaster.encodes - before) / 5
+  # One shared encode per tick, however many viewers the frame fans out to.
+  assert per_tick == {1: 1, 100: 1, 5000: 1}
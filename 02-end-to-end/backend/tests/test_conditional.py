@@ -0,0 +1,102 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.conditional import etag_matches
+from app.db import Database
+from app.main import app, broadcaster, db
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  broadcaster.reset()
+
+
+def _poll(url: str, etag: str | None = None) -> tuple[int, int, float]:
+  headers = {"If-None-Match": etag} if etag else {}
+  started = time.perf_counter()
+  response = client.get(url, headers=headers)
+  elapsed = time.perf_counter() - started
+  return response.status_code, len(response.content), elapsed
+
+
+def test_etag_matching_rules():
+  assert etag_matches('"a", W/"b"', '"b"')
+  assert etag_matches("*", '"x"')
+  assert not etag_matches(None, '"x"')
+  assert not etag_matches('"a"', '"b"')
+
+
+def test_unchanged_leaderboard_poll_is_304_without_db(monkeypatch: pytest.MonkeyPatch):
+  for index in range(40):
+    db.sign_up(f"poller-{index}", "pw")
+  first = client.get("/leaderboard")
+  etag = first.headers["etag"]
+  assert first.headers["cache-control"] == "no-cache"
+
+  def fail(*_args):
+    raise AssertionError("conditional poll reached the database")
+
+  monkeypatch.setattr(db, "load_leaderboard", fail)
+  status_code, body_bytes, elapsed = _poll("/leaderboard", etag)
+  assert status_code == 304
+  assert body_bytes == 0
+  assert len(first.content) > 1000
+  assert elapsed < 0.5
+
+  # The ETag comes from the cache version, so an evicted page still answers 304 without a query.
+  db.leaderboard_cache._entries = {}
+  assert _poll("/leaderboard", etag)[:2] == (304, 0)
+
+
+def test_workers_sharing_a_database_agree_on_leaderboard_etags():
+  other = Database(db._session_factory, db.engine, cache_ttl=30)
+  etag = client.get("/leaderboard").headers["etag"]
+  assert other.leaderboard_etag() == etag == other.load_leaderboard().etag
+
+  # A write through this worker is seen by the other once its cached token lapses.
+  db.record_score("nova", 99, "walls")
+  assert other.leaderboard_etag() == etag
+  other.leaderboard_cache._token = None
+  assert other.leaderboard_etag() == client.get("/leaderboard").headers["etag"] != etag
+
+
+def test_leaderboard_etag_changes_after_write():
+  etag = client.get("/leaderboard").headers["etag"]
+  db.record_score("nova", 99, "walls")
+  status_code, body_bytes, _ = _poll("/leaderboard", etag)
+  assert status_code == 200
+  assert body_bytes > 0
+
+
+def test_snapshot_etag_follows_frames():
+  etag = client.get("/spectator/snapshots").headers["etag"]
+  assert _poll("/spectator/snapshots", etag)[0] == 304
+  broadcaster.step()
+  assert _poll("/spectator/snapshots", etag)[0] == 200
+
+
+def test_snapshot_etags_do_not_repeat_after_reset():
+  etag = client.get("/spectator/snapshots").headers["etag"]
+  broadcaster.reset()
+  assert _poll("/spectator/snapshots", etag)[0] == 200
+
+
+def test_large_responses_are_gzipped():
+  for index in range(60):
+    db.sign_up(f"gzip-{index}", "pw")
+  raw = client.get("/leaderboard", headers={"Accept-Encoding": "identity"})
+  compressed = client.get("/leaderboard", headers={"Accept-Encoding": "gzip"})
+  assert compressed.headers["content-encoding"] == "gzip"
+  assert int(compressed.headers["content-length"]) < len(raw.content) / 3
+  assert compressed.json() == raw.json()
@@ -0,0 +1,41 @@
+import json
+import re
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.encoding import adapter, dump_json
+from app.main import app
+from app.schemas import RankedLeaderboardEntry, Session, UserProfile
+
+client = TestClient(app)
+
+
+def test_dump_json_matches_pydantic_and_reuses_adapters():
+  session = Session(token="t", user=UserProfile(id="u", username="nova"))
+  assert dump_json(Session, session) == session.model_dump_json().encode()
+  assert adapter(list[RankedLeaderboardEntry]) is adapter(list[RankedLeaderboardEntry])
+
+
+def test_encoded_endpoints_keep_their_documented_response_models():
+  paths = app.openapi()["paths"]
+  login = paths["/auth/login"]["post"]["responses"]["200"]["content"]["application/json"]["schema"]
+  assert login == {"$ref": "#/components/schemas/Session"}
+  around = paths["/leaderboard/around/{player}"]["get"]["responses"]["200"]["content"]["application/json"]["schema"]
+  assert around["items"] == {"$ref": "#/components/schemas/RankedLeaderboardEntry"}
+
+  response = client.post("/auth/signup", json={"username": "encoder", "password": "pw"})
+  assert response.status_code == 201
+  assert response.headers["content-type"] == "application/json"
+  assert json.loads(response.content)["user"]["username"] == "encoder"
+
+
+def test_generated_paths_match_the_checked_in_contract():
+  # Top-level keys under `paths:` in openapi.yaml; hidden routes stay out of both.
+  documented = set(re.findall(r"^  (/\S*):$", (ROOT_DIR / "openapi.yaml").read_text(), re.MULTILINE))
+  assert set(app.openapi()["paths"]) == documented
@@ -0,0 +1,60 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.db import Database
+from app.engines import build_engine
+
+
+def _pragma(engine, name: str):
+  with engine.connect() as connection:
+    return connection.execute(text(f"PRAGMA {name}")).scalar()
+
+
+def test_tuned_sqlite_profile_applies_pragmas(tmp_path: Path):
+  tuned = build_engine(f"sqlite:///{tmp_path / 'tuned.db'}", "tuned")
+  basic = build_engine(f"sqlite:///{tmp_path / 'basic.db'}", "basic")
+  try:
+    assert _pragma(tuned, "journal_mode") == "wal"
+    assert _pragma(tuned, "synchronous") == 1
+    assert _pragma(tuned, "busy_timeout") == 5000
+    assert _pragma(basic, "journal_mode") == "delete"
+  finally:
+    tuned.dispose()
+    basic.dispose()
+
+
+def test_unknown_profile_is_rejected():
+  with pytest.raises(ValueError):
+    build_engine("sqlite://", "turbo")
+
+
+def test_leaderboard_reads_use_the_read_engine(tmp_path: Path):
+  url = f"sqlite:///{tmp_path / 'split.db'}"
+  writer = build_engine(url)
+  reader = build_engine(url)
+  factory = sessionmaker(bind=writer, expire_on_commit=False)
+  read_factory = sessionmaker(bind=reader, expire_on_commit=False)
+  opened = []
+
+  def counting_read_factory():
+    opened.append(1)
+    return read_factory()
+
+  database = Database(factory, writer, cache_ttl=0, read_session_factory=counting_read_factory)
+  try:
+    database.reset()
+    database.sign_up("reader", "pw")
+    assert [entry.player for entry in database.leaderboard(limit=1)] == ["lumen"]
+    assert database.player_rank("reader").rank == 4
+    assert len(opened) == 2
+  finally:
+    writer.dispose()
+    reader.dispose()
@@ -0,0 +1,68 @@
+import json
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.frames import DeltaEncoder
+from app.schemas import Point, SpectatorSnapshot
+from app.spectator import SpectatorEngine
+
+
+def _apply(state: dict, games: list[dict], removed: list[str]) -> None:
+  for game_id in removed:
+    state.pop(game_id)
+  for change in games:
+    if "full" in change:
+      state[change["id"]] = change["full"]
+      continue
+    game = state[change["id"]]
+    if "head" in change:
+      body = game["snake"][: len(game["snake"]) - change["drop"]]
+      game["snake"] = [{"x": x, "y": y} for x, y in change["head"]] + body
+    if "food" in change:
+      game["food"] = {"x": change["food"][0], "y": change["food"][1]}
+    if "score" in change:
+      game["score"] = change["score"]
+
+
+def _long_snake(tick: int, length: int = 200, grid: int = 64) -> SpectatorSnapshot:
+  cells = [((tick - offset) % grid, ((tick - offset) // grid) % grid) for offset in range(length)]
+  return SpectatorSnapshot(
+    id="long",
+    player="Long",
+    mode="pass-through",
+    snake=[Point(x=x, y=y) for x, y in cells],
+    food=Point(x=0, y=0),
+    score=length,
+    gridSize=grid,
+    updatedAt=tick,
+  )
+
+
+def test_deltas_reconstruct_engine_frames():
+  engine = SpectatorEngine(seed=5)
+  encoder = DeltaEncoder()
+  state: dict = {}
+  for _ in range(200):
+    snapshots = engine.snapshots()
+    games, removed = encoder.encode(snapshots)
+    _apply(state, games, removed)
+    for snapshot in snapshots:
+      expected = snapshot.model_dump(exclude={"updatedAt"})
+      assert {key: value for key, value in state[snapshot.id].items() if key != "updatedAt"} == expected
+    engine.tick()
+
+
+def test_deltas_are_an_order_of_magnitude_smaller_on_long_snakes():
+  encoder = DeltaEncoder()
+  encoder.encode([_long_snake(0)])
+  full_bytes = delta_bytes = 0
+  for tick in range(1, 50):
+    snapshot = _long_snake(tick)
+    games, _ = encoder.encode([snapshot])
+    full_bytes += len(json.dumps([snapshot.model_dump()]))
+    delta_bytes += len(json.dumps(games))
+  assert delta_bytes * 10 < full_bytes
@@ -0,0 +1,106 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.executor import BoundedExecutor
+from app.ingest import ScoreQueueFull, ScoreWriteBehind
+from app.main import db
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+
+
+def test_write_behind_coalesces_and_drains_on_stop():
+  db.sign_up("queued", "pw")
+  executor = BoundedExecutor(2, "test-db")
+
+  async def scenario() -> None:
+    queue = ScoreWriteBehind(db, executor, flush_size=1000, flush_interval=60)
+    queue.start()
+    for score in (3, 8, 5):
+      queue.submit("queued", score, "walls")
+    queue.submit("QUEUED", 1, "pass-through")
+    queue.submit("nobody", 1, "walls")
+    assert queue.stats()["pendingPlayers"] == 2
+    assert queue.queue_depth == 5
+    await queue.stop()
+    return queue
+
+  queue = asyncio.run(scenario())
+  executor.shutdown()
+
+  stats = queue.stats()
+  assert stats["queueDepth"] == 0
+  assert stats["flushes"] == 1
+  assert stats["rejectedRuns"] == 1
+  entry = next(row for row in db.leaderboard() if row.player == "queued")
+  assert entry.bestScore == 8
+  assert entry.totalRuns == 4
+  assert entry.modeBreakdown == {"pass-through": 1, "walls": 3}
+
+
+def test_write_behind_flushes_when_size_threshold_is_reached():
+  db.sign_up("burst", "pw")
+  executor = BoundedExecutor(2, "test-db")
+
+  async def scenario() -> None:
+    queue = ScoreWriteBehind(db, executor, flush_size=10, flush_interval=60)
+    queue.start()
+    for score in range(10):
+      queue.submit("burst", score, "walls")
+    for _ in range(50):
+      if queue.flushes:
+        break
+      await asyncio.sleep(0.01)
+    flushes = queue.flushes
+    await queue.stop()
+    assert flushes == 1
+
+  asyncio.run(scenario())
+  executor.shutdown()
+  entry = next(row for row in db.leaderboard() if row.player == "burst")
+  assert entry.totalRuns == 10
+
+
+def test_write_behind_stays_bounded_while_flushes_fail(monkeypatch: pytest.MonkeyPatch):
+  db.sign_up("stuck", "pw")
+  executor = BoundedExecutor(2, "test-db")
+  queue = ScoreWriteBehind(db, executor, flush_size=1000, flush_interval=60, max_pending=5)
+  shed_during_flush = []
+
+  def unavailable(_batch):
+    # Players keep submitting while the flush is out; the runs being flushed count toward the bound.
+    for score in range(3):
+      try:
+        queue.submit("stuck", score, "walls")
+      except ScoreQueueFull:
+        shed_during_flush.append(score)
+    raise ConnectionError("database is down")
+
+  monkeypatch.setattr(db, "apply_score_totals", unavailable)
+
+  async def scenario() -> None:
+    for score in range(3):
+      queue.submit("stuck", score, "walls")
+    await queue.flush()
+    # Nothing accepted is lost: the failed batch is back, next to what arrived meanwhile.
+    assert queue.queue_depth == 5
+    with pytest.raises(ScoreQueueFull):
+      queue.submit("stuck", 9, "walls")
+    await queue.flush()
+    assert queue.queue_depth == 5
+
+  asyncio.run(scenario())
+  executor.shutdown()
+  assert shed_during_flush == [2, 0, 1, 2]
+  stats = queue.stats()
+  assert stats["failedFlushes"] == 2
+  assert stats["shedRuns"] == 5
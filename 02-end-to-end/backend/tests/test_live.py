@@ -0,0 +1,119 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.live import MAX_LIVE_LINE_BYTES, LiveGames
+from app.main import app, broadcaster, db, live_games, spectator_engine
+from app.schemas import LiveGameUpdate, UserProfile
+
+client = TestClient(app)
+PLAYER = UserProfile(id="u-1", username="nova")
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  live_games.reset()
+  yield
+  live_games.reset()
+
+
+def _update(x: int, score: int = 0, grid: int = 12) -> dict:
+  return {"mode": "walls", "snake": [{"x": x, "y": 0}], "food": {"x": 5, "y": 5}, "score": score, "gridSize": grid}
+
+
+def _auth(username: str = "pilot") -> dict[str, str]:
+  token = client.post("/auth/signup", json={"username": username, "password": "pw"}).json()["token"]
+  return {"Authorization": f"Bearer {token}"}
+
+
+def test_chunked_ingest_keeps_only_the_latest_state_per_game():
+  lines = [json.dumps(_update(x, score=x)).encode() + b"\n" for x in range(5)]
+
+  def body():
+    # Split lines across chunk boundaries the way a streaming client would.
+    data = b"".join(lines)
+    for offset in range(0, len(data), 7):
+      yield data[offset : offset + 7]
+
+  response = client.post("/spectator/live", content=body(), headers=_auth())
+  assert response.status_code == 200
+  assert response.json() == {"accepted": 5, "throttled": 0, "rejected": 0}
+
+  frame = broadcaster.step()
+  games = [game for game in json.loads(frame.payload) if game["id"].startswith("live-")]
+  assert len(games) == 1
+  assert games[0]["player"] == "pilot"
+  assert games[0]["score"] == 4
+  assert games[0]["snake"] == [{"x": 4, "y": 0}]
+
+
+def test_ingest_rejects_bad_lines_and_requires_a_session():
+  body = b"not json\n" + json.dumps(_update(40)).encode() + b"\n" + json.dumps(_update(1)).encode()
+  response = client.post("/spectator/live", content=body, headers=_auth())
+  assert response.json() == {"accepted": 1, "throttled": 0, "rejected": 2}
+
+  assert client.post("/spectator/live", content=json.dumps(_update(1))).status_code == 401
+  oversized = client.post("/spectator/live", content=b"x" * (MAX_LIVE_LINE_BYTES + 1), headers=_auth("other"))
+  assert oversized.status_code == 413
+
+
+def test_updates_beyond_the_session_rate_are_throttled():
+  games = LiveGames(rate=10, burst=3)
+  update = LiveGameUpdate.model_validate(_update(1))
+  assert [games.apply(PLAYER, update, now=0.0) for _ in range(4)] == ["accepted"] * 3 + ["throttled"]
+  assert games.apply(PLAYER, update, now=0.1) == "accepted"
+
+
+def test_idle_games_are_evicted_and_reported_as_removed():
+  games = LiveGames(idle_seconds=5)
+  games.apply(PLAYER, LiveGameUpdate.model_validate(_update(1)), now=0.0)
+  assert [snapshot.id for snapshot in games.snapshots(now=4.0)] == ["live-u-1"]
+  assert games.snapshots(now=6.0) == []
+  assert games.stats()["evicted"] == 1
+
+  live_games.apply(PLAYER, LiveGameUpdate.model_validate(_update(1)))
+  broadcaster.step()
+  live_games.reset()
+  delta = broadcaster.step().delta_event
+  assert b'"removed":["live-u-1"]' in delta
+
+
+def test_game_cap_rejects_new_players_until_idle_games_expire():
+  games = LiveGames(max_games=1, idle_seconds=5)
+  update = LiveGameUpdate.model_validate(_update(1))
+  assert games.apply(PLAYER, update, now=0.0) == "accepted"
+  assert games.apply(UserProfile(id="u-2", username="orbit"), update, now=1.0) == "rejected"
+  # No tick ran in between: the ingest path frees the idle slot itself.
+  assert games.apply(UserProfile(id="u-3", username="comet"), update, now=10.0) == "accepted"
+  assert games.stats()["evicted"] == 1
+
+
+def test_eviction_follows_the_most_recent_update_of_each_game():
+  games = LiveGames(idle_seconds=5)
+  update = LiveGameUpdate.model_validate(_update(1))
+  games.apply(PLAYER, update, now=0.0)
+  games.apply(UserProfile(id="u-2", username="orbit"), update, now=1.0)
+  games.apply(PLAYER, update, now=4.0)
+  assert [snapshot.id for snapshot in games.snapshots(now=4.0)] == ["live-u-2", "live-u-1"]
+  assert [snapshot.id for snapshot in games.snapshots(now=7.0)] == ["live-u-1"]
+  assert games.evict_idle(now=9.0) == 0
+  assert games.evict_idle(now=9.5) == 1
+
+
+def test_followers_refuse_live_ingest(monkeypatch: pytest.MonkeyPatch):
+  headers = _auth()
+  monkeypatch.setattr(type(broadcaster.backend), "is_producer", False)
+  response = client.post("/spectator/live", content=json.dumps(_update(1)).encode(), headers=headers)
+  assert response.status_code == 503
+  assert response.headers["retry-after"]
+  assert len(live_games) == 0
@@ -0,0 +1,83 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.main import app, broadcaster, db, spectator_engine
+from app.metrics import MetricsRegistry, metrics
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  metrics.reset()
+
+
+def _sample(body: str, line_prefix: str) -> float:
+  return float(next(line for line in body.splitlines() if line.startswith(line_prefix)).rsplit(" ", 1)[1])
+
+
+def test_registry_merges_thread_shards():
+  registry = MetricsRegistry()
+  hits = registry.counter("hits_total", "Hits.", ("kind",))
+  latency = registry.histogram("work_seconds", "Work.", buckets=(0.1, 1.0))
+
+  def work() -> None:
+    for _ in range(1000):
+      hits.inc("a")
+    latency.observe(0.5)
+
+  threads = [threading.Thread(target=work) for _ in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  body = registry.render()
+  assert 'hits_total{kind="a"} 4000' in body
+  assert 'work_seconds_bucket{le="0.1"} 0' in body
+  assert 'work_seconds_bucket{le="1"} 4' in body
+  assert 'work_seconds_bucket{le="+Inf"} 4' in body
+  assert "work_seconds_sum 2" in body
+  assert "# TYPE work_seconds histogram" in body
+
+
+def test_metrics_endpoint_reports_routes_queries_and_ticks():
+  db.leaderboard_cache.invalidate()
+  client.get("/leaderboard")
+  client.get("/leaderboard/rank/nova")
+  client.get("/leaderboard/rank/nobody")
+  broadcaster.step()
+  body = client.get("/metrics").text
+  assert _sample(body, 'http_requests_total{method="GET",route="/leaderboard",status="200"}') == 1
+  assert _sample(body, 'http_requests_total{method="GET",route="/leaderboard/rank/{player}",status="404"}') == 1
+  assert _sample(body, 'http_request_duration_seconds_count{method="GET",route="/leaderboard"}') == 1
+  assert _sample(body, 'http_request_db_queries_sum{route="/leaderboard"}') >= 1
+  assert _sample(body, 'http_request_db_queries_sum{route="/leaderboard/rank/{player}"}') >= 2
+  assert _sample(body, "db_queries_total") >= 3
+  assert _sample(body, "spectator_tick_seconds_count") == 1
+  assert _sample(body, "spectator_subscribers") == 0
+  assert _sample(body, "http_requests_in_flight") == 1
+
+
+def test_failed_statements_leave_no_timing_state_behind():
+  with db.engine.connect() as connection:
+    for _ in range(3):
+      with pytest.raises(Exception):
+        connection.exec_driver_sql("SELECT * FROM no_such_table")
+      connection.rollback()
+    # Pooled connections live for the whole process; failures must not pile up state on them.
+    assert "metrics_query_started" not in connection.info
+    connection.exec_driver_sql("SELECT 1")
+  body = client.get("/metrics").text
+  assert _sample(body, "db_queries_total") == 1
+  assert 0 <= _sample(body, "db_query_seconds_total") < 0.5
@@ -0,0 +1,97 @@
+import asyncio
+import io
+import pstats
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.main import app, broadcaster, db, spectator_engine
+from app.profiling import profiler
+
+client = TestClient(app)
+TOKEN = {"X-Profile-Token": "let-me-in"}
+
+
+@pytest.fixture(autouse=True)
+def reset_state(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  monkeypatch.setattr(profiler, "token", "let-me-in")
+  monkeypatch.setattr(profiler, "sample_rate", 0.0)
+  monkeypatch.setattr(profiler.store, "directory", tmp_path)
+  monkeypatch.setattr(profiler.store, "keep", 3)
+
+
+def _functions(profile_id: str) -> str:
+  download = client.get(f"/admin/profiles/{profile_id}", headers=TOKEN)
+  assert download.status_code == 200
+  path = profiler.store.directory / "download.prof"
+  path.write_bytes(download.content)
+  out = io.StringIO()
+  pstats.Stats(str(path), stream=out).print_stats()
+  return out.getvalue()
+
+
+def test_profile_header_captures_handler_and_executor_work():
+  db.leaderboard_cache.invalidate()
+  response = client.get("/leaderboard", headers=TOKEN)
+  assert response.status_code == 200
+  profile_id = response.headers["x-profile-id"]
+  listing = client.get("/admin/profiles", headers=TOKEN).json()
+  assert [entry["id"] for entry in listing["profiles"]] == [profile_id]
+  assert listing["profiles"][0]["path"] == "/leaderboard"
+  assert "_query_leaderboard" in _functions(profile_id)
+
+
+def test_streaming_responses_are_profiled_until_they_end():
+  response = client.get("/spectator/stream", params={"limit": 1}, headers=TOKEN)
+  profile_id = response.headers["x-profile-id"]
+  assert "generator" in _functions(profile_id)
+
+
+def test_requests_without_the_token_are_not_profiled():
+  response = client.get("/leaderboard", headers={"X-Profile-Token": "guess"})
+  assert "x-profile-id" not in response.headers
+  assert client.get("/admin/profiles", headers={"X-Profile-Token": "guess"}).status_code == 401
+  assert client.get("/admin/profiles/../../etc", headers=TOKEN).status_code == 404
+
+
+def test_undecodable_profile_tokens_are_ignored():
+  response = client.get("/leaderboard", headers=[(b"x-profile-token", b"\xff\xfe-not-utf8")])
+  assert response.status_code == 200
+  assert "x-profile-id" not in response.headers
+  assert client.get("/admin/profiles", headers=[(b"x-profile-token", b"caf\xe9")]).status_code == 401
+
+
+def test_ring_keeps_only_recent_profiles_and_sample_rate_toggle():
+  ids = [client.get("/leaderboard", headers=TOKEN).headers["x-profile-id"] for _ in range(5)]
+  listed = [entry["id"] for entry in client.get("/admin/profiles", headers=TOKEN).json()["profiles"]]
+  assert listed == list(reversed(ids[-3:]))
+
+  assert client.put("/admin/profiles/sample-rate", params={"rate": 1}, headers=TOKEN).json() == {"sampleRate": 1.0}
+  assert "x-profile-id" in client.get("/leaderboard").headers
+
+
+def test_profiles_are_saved_off_the_event_loop(monkeypatch: pytest.MonkeyPatch):
+  save = profiler.store.save
+  on_loop = []
+
+  def recording(session):
+    try:
+      asyncio.get_running_loop()
+      on_loop.append(True)
+    except RuntimeError:
+      on_loop.append(False)
+    save(session)
+
+  monkeypatch.setattr(profiler.store, "save", recording)
+  profile_id = client.get("/leaderboard", headers=TOKEN).headers["x-profile-id"]
+  assert on_loop == [False]
+  assert [entry["id"] for entry in client.get("/admin/profiles", headers=TOKEN).json()["profiles"]] == [profile_id]
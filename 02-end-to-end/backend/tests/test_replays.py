@@ -0,0 +1,182 @@
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+import app.main as app_main
+from app.broadcast import SpectatorBroadcaster
+from app.replays import ReplayStore
+from app.spectator import SpectatorEngine
+
+client = TestClient(app_main.app)
+START = 1_700_000_000_000
+
+
+def _record(store: ReplayStore, frames: int, seed: int = 1) -> list:
+  """Record `frames` ticks one second apart; returns each frame's games by id."""
+  producer = SpectatorBroadcaster(SpectatorEngine(seed=seed))
+  history = []
+  for index in range(frames):
+    frame = producer.step()
+    store.record(frame, now_ms=START + index * 1000)
+    history.append({game["id"]: game for game in json.loads(frame.payload)})
+  return history
+
+
+def _expected(history: list, game_id: str, first: int = 0, last: int | None = None) -> list:
+  expected, previous = [], None
+  for index, games in enumerate(history[: None if last is None else last + 1]):
+    game = games.get(game_id)
+    view = None if game is None else {key: value for key, value in game.items() if key != "updatedAt"}
+    if index >= first and view is not None and (view != previous or not expected):
+      expected.append({**view, "updatedAt": START + index * 1000})
+    previous = view
+  return expected
+
+
+def _replayed(store: ReplayStore, game_id: str, start=None, end=None) -> list:
+  return [snapshot.model_dump() for snapshot in store.replay(game_id, start, end)]
+
+
+def test_replay_rebuilds_a_game_from_keyframes_and_deltas(tmp_path: Path):
+  store = ReplayStore(tmp_path, index_interval=8)
+  history = _record(store, 60)
+  game_id = next(iter(history[0]))
+  replayed = _replayed(store, game_id)
+  assert replayed == _expected(history, game_id)
+  assert len(replayed) > 30
+  assert len(store.segments()) == 1
+  index_entries = store.segments()[0][1].with_suffix(".idx").stat().st_size // 16
+  assert index_entries == 8
+
+
+def test_replay_seeks_into_the_middle_of_a_segment(tmp_path: Path):
+  store = ReplayStore(tmp_path, index_interval=8)
+  history = _record(store, 60)
+  game_id = next(iter(history[0]))
+  replayed = _replayed(store, game_id, START + 20_500, START + 30_000)
+  assert replayed == _expected(history, game_id, first=21, last=30)
+  assert replayed[0]["updatedAt"] == START + 21_000
+  assert _replayed(store, game_id, START + 120_000) == []
+  assert _replayed(store, "nobody") == []
+
+
+def test_segments_rotate_and_expire_by_age_and_size(tmp_path: Path):
+  store = ReplayStore(tmp_path, segment_seconds=10, index_interval=4, max_age_seconds=25)
+  history = _record(store, 60)
+  starts = [started for started, _ in store.segments()]
+  # Segments ending more than 25 s before the last rotation (at 50 s) are gone.
+  assert starts == [START + 20_000, START + 30_000, START + 40_000, START + 50_000]
+  assert store.removed == 2
+  game_id = next(iter(history[0]))
+  replayed = _replayed(store, game_id, START + 15_000, START + 45_000)
+  assert replayed == _expected(history, game_id, first=20, last=45)
+
+  sized = ReplayStore(tmp_path / "sized", segment_seconds=10, max_bytes=1)
+  _record(sized, 30)
+  assert [started for started, _ in sized.segments()] == [START + 20_000]
+
+
+def test_a_torn_last_entry_is_ignored(tmp_path: Path):
+  store = ReplayStore(tmp_path, index_interval=8)
+  history = _record(store, 10)
+  store.stop()
+  with open(store.segments()[0][1], "ab") as segment:
+    segment.write(b"\x00\x00\x10\x00partial")
+  game_id = next(iter(history[0]))
+  assert _replayed(store, game_id) == _expected(history, game_id)
+
+
+def test_only_one_process_records_a_directory(tmp_path: Path):
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=1))
+    first, second = ReplayStore(tmp_path), ReplayStore(tmp_path)
+    assert first.start(producer)
+    assert not second.start(producer)
+    producer.step()
+    first.stop()
+    # Stopping drains the writer thread, so the frame broadcast before it is on disk.
+    assert first.frames == 1
+    assert producer.subscriber_count == 0
+    assert second.start(producer)
+    second.stop()
+
+  asyncio.run(scenario())
+
+
+def test_unknown_games_skip_segments_without_reading_them(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+  store = ReplayStore(tmp_path, segment_seconds=10)
+  history = _record(store, 40)
+  store.stop()
+  game_id = next(iter(history[0]))
+  read = []
+  original = ReplayStore._read_segment
+
+  def counting(self, path, *args):
+    read.append(path)
+    return original(self, path, *args)
+
+  monkeypatch.setattr(ReplayStore, "_read_segment", counting)
+  assert _replayed(store, "nobody") == []
+  assert read == []
+  assert _replayed(store, game_id) == _expected(history, game_id)
+  assert len(read) == len(store.segments()) == 4
+
+  # Segments written before id lists existed are still scanned.
+  store.segments()[0][1].with_suffix(".ids").unlink()
+  read.clear()
+  assert _replayed(store, "nobody") == []
+  assert read == [store.segments()[0][1]]
+
+
+def test_frames_queued_past_the_writer_are_dropped(tmp_path: Path):
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=1))
+    store = ReplayStore(tmp_path, queue_frames=4)
+    release = threading.Event()
+    record = store.record
+
+    def stalled(frame, now_ms=None):
+      release.wait()
+      record(frame, now_ms)
+
+    # A stalled disk: the writer holds its first frame while the tick loop keeps going.
+    store.record = stalled
+    assert store.start(producer)
+    for _ in range(10):
+      producer.step()
+    release.set()
+    store.stop()
+    assert store.frames + store.dropped == 10
+    assert store.dropped > 0
+    game_id = next(iter(json.loads(producer.latest().payload)))["id"]
+    assert [snapshot.updatedAt for snapshot in store.replay(game_id)]
+
+  asyncio.run(scenario())
+
+
+def test_replay_endpoint_streams_ndjson(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+  store = ReplayStore(tmp_path, index_interval=8)
+  monkeypatch.setattr(app_main, "replays", store)
+  history = _record(store, 100)
+  game_id = next(iter(history[0]))
+
+  response = client.get(f"/spectator/replays/{game_id}", params={"from": START + 10_000, "to": START + 89_000})
+  assert response.status_code == 200
+  assert response.headers["content-type"] == "application/x-ndjson"
+  lines = [json.loads(line) for line in response.text.splitlines()]
+  assert lines == _expected(history, game_id, first=10, last=89)
+  assert len(lines) > 64
+
+  missing = client.get("/spectator/replays/nobody")
+  assert missing.status_code == 404
+  assert missing.json()["message"]
+  assert client.get(f"/spectator/replays/{game_id}", params={"from": -1}).status_code == 422
@@ -0,0 +1,74 @@
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.spectator import FreeCells, SpectatorEngine, build_spectator_engine
+
+
+def test_free_cells_add_remove_choice():
+  free = FreeCells(4)
+  free.remove(1)
+  free.remove(3)
+  free.remove(3)
+  assert len(free) == 2
+  assert 1 not in free and 0 in free
+  rng = random.Random(1)
+  assert {free.choice(rng) for _ in range(50)} == {0, 2}
+  free.add(3)
+  assert 3 in free and len(free) == 3
+
+
+def test_engine_keeps_occupancy_and_food_consistent():
+  engine = SpectatorEngine(grid_size=6, players=[f"bot-{index}" for index in range(50)], seed=7)
+  for _ in range(400):
+    engine.tick()
+    for state in engine._states:
+      counts = Counter(state.body)
+      cells = state.grid_size * state.grid_size
+      assert all(state.occupancy[cell] == counts.get(cell, 0) for cell in range(cells))
+      assert len(state.free) == cells - len(counts)
+      assert state.occupancy[state.food] == 0
+
+
+def test_seeded_engines_are_reproducible():
+  first = SpectatorEngine(seed=42)
+  second = SpectatorEngine(seed=42)
+  for _ in range(25):
+    first.tick()
+    second.tick()
+  assert [snapshot.model_dump(exclude={"updatedAt"}) for snapshot in first.snapshots()] == [
+    snapshot.model_dump(exclude={"updatedAt"}) for snapshot in second.snapshots()
+  ]
+
+
+def test_batch_engine_matches_engine_invariants():
+  pytest.importorskip("numpy")
+  engine = build_spectator_engine("batch", games=200, seed=3)
+  for _ in range(300):
+    engine.tick()
+  snapshots = engine.snapshots()
+  assert len(snapshots) == 200
+  for index, snapshot in enumerate(snapshots):
+    cells = [point.y * snapshot.gridSize + point.x for point in snapshot.snake]
+    assert len(cells) == engine.lengths[index]
+    counts = Counter(cells)
+    assert all(engine.occupancy[index, cell] == counts.get(cell, 0) for cell in range(snapshot.gridSize**2))
+    assert snapshot.food.y * snapshot.gridSize + snapshot.food.x not in counts
+
+
+def test_batch_engine_is_reproducible_with_seed():
+  pytest.importorskip("numpy")
+  first = build_spectator_engine("batch", games=50, seed=11)
+  second = build_spectator_engine("batch", games=50, seed=11)
+  for _ in range(40):
+    first.tick()
+    second.tick()
+  assert (first.body == second.body).all()
+  assert (first.scores == second.scores).all()
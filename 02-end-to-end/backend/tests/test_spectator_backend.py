@@ -0,0 +1,112 @@
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.broadcast import Frame, SpectatorBroadcaster
+from app.spectator import SpectatorEngine
+from app.spectator_backend import BrokerBackend, InMemoryBroker, SocketBackend
+
+
+def test_frame_round_trips_through_wire_format():
+  broadcaster = SpectatorBroadcaster(SpectatorEngine(seed=1))
+  broadcaster.step()
+  frame = broadcaster.step()
+  assert Frame.from_bytes(frame.to_bytes()) == frame
+
+
+def test_follower_history_restarts_after_a_seq_gap():
+  producer = SpectatorBroadcaster(SpectatorEngine(seed=1))
+  follower = SpectatorBroadcaster(SpectatorEngine(seed=2))
+  frames = [producer.step() for _ in range(6)]
+  for frame in frames[:3] + frames[4:]:
+    follower.ingest(frame)
+  # Frame 4 never arrived, so a viewer that saw 2 or 3 cannot be caught up with deltas.
+  assert follower.replay_since(frames[1].seq) is None
+  assert follower.replay_since(frames[2].seq) is None
+  assert follower.replay_since(frames[3].seq) == [frames[4].delta_event, frames[5].delta_event]
+  assert producer.replay_since(frames[1].seq) == [frame.delta_event for frame in frames[2:]]
+
+
+def test_followers_serve_no_games_until_the_producer_frame_arrives():
+  producer = SpectatorBroadcaster(SpectatorEngine(seed=1))
+  follower = SpectatorBroadcaster(SpectatorEngine(seed=2), backend=BrokerBackend(InMemoryBroker()))
+  empty = follower.latest()
+  assert (empty.seq, empty.payload) == (0, b"[]")
+  assert follower.encodes == 0
+
+  frame = producer.step()
+  follower.ingest(frame)
+  assert follower.latest() == frame
+
+
+async def _run_workers(workers: list[SpectatorBroadcaster], seconds: float) -> None:
+  for worker in workers:
+    worker.start()
+  await asyncio.sleep(seconds)
+
+
+async def _stop(workers: list[SpectatorBroadcaster]) -> None:
+  for worker in workers:
+    await worker.stop()
+
+
+def _assert_one_producer_shared_by_all(workers: list[SpectatorBroadcaster]) -> SpectatorBroadcaster:
+  producers = [worker for worker in workers if worker.backend.is_producer]
+  assert len(producers) == 1
+  producer = producers[0]
+  assert producer.ticks > 0
+  for worker in workers:
+    if worker is not producer:
+      # Followers never simulate; they serve the producer's bytes, ETag included.
+      assert worker.ticks == 0
+      assert worker.frames_received > 0
+      # Compare against the producer's recent frames: the newest one may still be in flight.
+      latest = worker.latest()
+      assert (latest.seq, latest.delta_event) in producer._history
+      assert latest.etag == f'"{producer._epoch}-{latest.seq}"'
+  return producer
+
+
+def test_broker_backend_elects_one_producer_and_fails_over():
+  async def scenario() -> None:
+    broker = InMemoryBroker()
+    workers = [
+      SpectatorBroadcaster(SpectatorEngine(seed=index), interval=0.02, backend=BrokerBackend(broker, lease_seconds=0.15))
+      for index in range(3)
+    ]
+    await _run_workers(workers, 0.3)
+    producer = _assert_one_producer_shared_by_all(workers)
+
+    await producer.stop()
+    survivors = [worker for worker in workers if worker is not producer]
+    last_seq = survivors[0].latest().seq
+    await asyncio.sleep(0.4)
+    successor = _assert_one_producer_shared_by_all(survivors)
+    assert successor.latest().seq > last_seq
+    await _stop(survivors)
+
+  asyncio.run(scenario())
+
+
+def test_socket_backend_shares_frames_and_fails_over():
+  async def scenario(directory: Path) -> None:
+    def backend() -> SocketBackend:
+      return SocketBackend(str(directory / "spectator.sock"), str(directory / "spectator.lock"), retry_interval=0.05)
+
+    workers = [SpectatorBroadcaster(SpectatorEngine(seed=index), interval=0.02, backend=backend()) for index in range(3)]
+    await _run_workers(workers, 0.4)
+    producer = _assert_one_producer_shared_by_all(workers)
+
+    await producer.stop()
+    survivors = [worker for worker in workers if worker is not producer]
+    await asyncio.sleep(0.4)
+    _assert_one_producer_shared_by_all(survivors)
+    await _stop(survivors)
+
+  with tempfile.TemporaryDirectory() as directory:
+    asyncio.run(scenario(Path(directory)))
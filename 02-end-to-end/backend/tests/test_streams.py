@@ -0,0 +1,124 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT_DIR = Path(__file__).resolve().parents[1]
+if str(ROOT_DIR) not in sys.path:
+  sys.path.insert(0, str(ROOT_DIR))
+
+from app.broadcast import SpectatorBroadcaster
+from app.main import app, broadcaster, db, spectator_engine, streams
+from app.spectator import SpectatorEngine
+from app.streams import HEARTBEAT_EVENT, FrameOutbox
+
+client = TestClient(app)
+
+
+@pytest.fixture(autouse=True)
+def reset_state():
+  db.reset()
+  spectator_engine.reset()
+  broadcaster.reset()
+  streams.reset()
+
+
+def _scope(host: str = "10.0.0.1") -> dict:
+  return {
+    "type": "http",
+    "asgi": {"version": "3.0", "spec_version": "2.4"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/spectator/stream",
+    "raw_path": b"/spectator/stream",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [],
+    "client": (host, 50000),
+    "server": ("testserver", 80),
+  }
+
+
+async def _never_disconnect() -> dict:
+  await asyncio.Event().wait()
+  return {"type": "http.disconnect"}
+
+
+def test_caps_refuse_extra_streams_with_503(monkeypatch: pytest.MonkeyPatch):
+  response = client.get("/spectator/stream", params={"limit": 1})
+  assert response.status_code == 200
+  assert streams.connections == 0
+
+  monkeypatch.setattr(streams, "max_per_client", 0)
+  refused = client.get("/spectator/stream", params={"limit": 1})
+  assert refused.status_code == 503
+  assert refused.headers["retry-after"]
+  monkeypatch.setattr(streams, "max_per_client", 5)
+  monkeypatch.setattr(streams, "max_connections", 0)
+  assert client.get("/spectator/stream", params={"limit": 1}).status_code == 503
+  assert streams.stats()["rejected"] == {"client": 1, "worker": 1}
+
+
+def test_idle_streams_get_heartbeats_and_release_their_slot(monkeypatch: pytest.MonkeyPatch):
+  monkeypatch.setattr(streams, "heartbeat_seconds", 0.02)
+
+  async def scenario() -> list[bytes]:
+    messages: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(app(_scope(), _never_disconnect, messages.put))
+    bodies = []
+    while len(bodies) < 3:
+      message = await messages.get()
+      if message["type"] == "http.response.body":
+        bodies.append(message["body"])
+    assert streams.stats()["connections"] == 1
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+      await task
+    return bodies
+
+  bodies = asyncio.run(scenario())
+  assert bodies[0].startswith(b"id: ")
+  assert bodies[1:] == [HEARTBEAT_EVENT, HEARTBEAT_EVENT]
+  assert streams.connections == 0
+
+
+def test_stalled_reader_is_evicted(monkeypatch: pytest.MonkeyPatch):
+  monkeypatch.setattr(streams, "heartbeat_seconds", 0.01)
+  monkeypatch.setattr(streams, "send_timeout", 0.05)
+
+  async def scenario() -> None:
+    bodies = 0
+
+    async def send(message) -> None:
+      nonlocal bodies
+      if message["type"] == "http.response.body":
+        bodies += 1
+        if bodies > 1:
+          # The client's socket is full: this write never completes.
+          await asyncio.Event().wait()
+
+    await asyncio.wait_for(app(_scope(), _never_disconnect, send), 2)
+
+  asyncio.run(scenario())
+  assert streams.connections == 0
+  assert streams.stats()["evicted"] == {"stalled": 1}
+
+
+def test_outbox_evicts_a_reader_that_falls_too_far_behind():
+  async def scenario() -> None:
+    producer = SpectatorBroadcaster(SpectatorEngine(seed=1))
+    outbox = FrameOutbox(lambda frame: 100, max_bytes=250)
+    producer.subscribe(outbox)
+    producer.step()
+    producer.step()
+    assert outbox.pending_bytes == 200
+    producer.step()
+    assert outbox.overflowed
+    assert outbox.get_nowait() is None
+    producer.step()
+    assert outbox.empty()
+
+  asyncio.run(scenario())
@@ -1,25 +1,27 @@
+import asyncio
 import importlib
 from pathlib import Path
 import sys
 
 from fastapi.testclient import TestClient
+import httpx
 import pytest
+from sqlalchemy import func, select
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 if str(ROOT_DIR) not in sys.path:
   sys.path.insert(0, str(ROOT_DIR))
 
+# Reloading keeps the module objects, so these names see the reloaded engine and models.
+import app.db as app_db
+import app.main as app_main
+
 
 def _reload_app_with_db():
   """
   Reload app.db and app.main so the engine/session pick up the provided DATABASE_URL.
   """
-  import app.db as app_db
-
   importlib.reload(app_db)
-
-  import app.main as app_main
-
   importlib.reload(app_main)
   return app_main
 
@@ -31,14 +33,12 @@ def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
   monkeypatch.setenv("DATABASE_URL", db_url)
   app_module = _reload_app_with_db()
   app_module.db.reset()
+  monkeypatch.setattr(app_module.replays, "directory", tmp_path / "replays")
   with TestClient(app_module.app) as client:
     try:
       yield client
     finally:
       # Restore app modules to their defaults so other tests are unaffected.
-      import app.db as app_db
-      import app.main as app_main
-
       importlib.reload(app_db)
       importlib.reload(app_main)
 
@@ -49,7 +49,8 @@ def test_full_flow_persists_scores(client: TestClient):
   login = client.post("/auth/login", json={"username": "e2e-user", "password": "pw"})
   assert login.status_code == 200
 
-  record = client.post("/scores", json={"username": "e2e-user", "score": 15, "mode": "walls"})
+  headers = {"Authorization": f"Bearer {login.json()['token']}"}
+  record = client.post("/scores", json={"username": "e2e-user", "score": 15, "mode": "walls"}, headers=headers)
   assert record.status_code == 204
 
   leaderboard = client.get("/leaderboard")
@@ -59,3 +60,31 @@ def test_full_flow_persists_scores(client: TestClient):
   assert entry["bestScore"] == 15
   assert entry["totalRuns"] == 1
   assert entry["modeBreakdown"]["walls"] == 1
+
+
+def test_concurrent_score_submissions_are_not_lost(client: TestClient, monkeypatch: pytest.MonkeyPatch):
+  # One client firing 2000 writes at once is exactly what admission sheds; this test is about lost writes.
+  monkeypatch.setattr(app_main.admission, "enabled", False)
+  token = client.post("/auth/signup", json={"username": "swarm", "password": "pw"}).json()["token"]
+  headers = {"Authorization": f"Bearer {token}"}
+  submissions = [
+    {"username": "swarm", "score": index % 97, "mode": "walls" if index % 3 else "pass-through"}
+    for index in range(2000)
+  ]
+
+  async def fire():
+    transport = httpx.ASGITransport(app=client.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+      return await asyncio.gather(*(async_client.post("/scores", json=body, headers=headers) for body in submissions))
+
+  responses = asyncio.run(fire())
+  assert all(response.status_code == 204 for response in responses)
+
+  entry = next(row for row in client.get("/leaderboard").json() if row["player"] == "swarm")
+  assert entry["totalRuns"] == 2000
+  assert entry["bestScore"] == 96
+  assert entry["modeBreakdown"]["pass-through"] == sum(1 for body in submissions if body["mode"] == "pass-through")
+  assert entry["modeBreakdown"]["walls"] == sum(1 for body in submissions if body["mode"] == "walls")
+
+  with app_db.session_scope(app_db.SessionLocal) as session:
+    assert session.scalar(select(func.count()).select_from(app_db.Run)) == 2000